@@ -2,91 +2,243 @@
 
 """
 
-from Analytics.utils import flatten, compute_diff
+from analytics.name_matching import PlayerNameResolver
+from analytics.pipeline import DEFAULT_CACHE_DIR, Pipeline, Stage
+from api_handler import xml_soccer
+from api_handler.schema import apply_dtypes
+import instrumentation
 
+import logging
 import pandas as pd
 import numpy as np
 import typing
 
+logger = logging.getLogger(__name__)
 
-def create_feature_vector():
+
+@instrumentation.timed('features.create_feature_vector')
+def create_feature_vector(season_detail_df: pd.DataFrame, player_stats_df: pd.DataFrame = None,
+                          cache_dir: typing.Optional[str] = DEFAULT_CACHE_DIR, max_workers: int = 4,
+                          report: bool = False) -> pd.DataFrame:
     """Function to create combined dataframe to train on match outcomes.
 
-    Features are all normalised, encoded, etc.
+    Features are encoded, but not normalised; one row per team per match.
 
     Includes a number of features:
-    1. Match outcome (W / D / L)
-    2. Team points, goals for, goals against at that point in time
-    3. Opponent points, goals for, goals against
-    4. Result last time played that team
-    5. Team starting 11 player rating
-    6. Opponent starting 11 player rating
-    7. Team formation (encoded)
-    8. Opponent formation (encoded)
-    9. Team days since last match
-    10. Opponent days since last match
-    11. Match time of day
-    12. Match outcome at t-1
-    13. Match outcome at t-2
-    14. Match outcome at t-3
+    1. Match outcome (W / D / L) -> Outcome, 1 / 0 / -1
+    2. Team points, goals for, goals against at that point in time -> Table*
+    3. Opponent points, goals for, goals against -> OpponentTable*
+    4. Result last time played that team -> LastMeetingPoints
+    5. Team starting 11 player rating -> LineupRating (only with player_stats_df)
+    6. Opponent starting 11 player rating -> OpponentLineupRating
+    7. Team formation (encoded) -> Formation_*
+    8. Opponent formation (encoded) -> OpponentFormation_*
+    9. Team days since last match -> RestDays
+    10. Opponent days since last match -> OpponentRestDays
+    11. Match time of day -> KickoffHour
+    12. Match outcome at t-1 -> PointsLag1
+    13. Match outcome at t-2 -> PointsLag2
+    14. Match outcome at t-3 -> PointsLag3
+    Plus the rolling Form* means of team_form_features, for both sides.
+
+    Built as a Pipeline of cached stages (see feature_stages), so rerunning after changing one stage only
+    recomputes that stage and those downstream of it; the slow lineup rating stage is only rerun when the
+    lineups or ratings change.
+
+    :param season_detail_df: fixtures as returned by xml_soccer.get_season_matches_df, one or more seasons
+    :param player_stats_df: optional FIFA player ratings, see get_lineup_stats_vector
+    :param cache_dir: where stage outputs are cached, None to always recompute
+    :param max_workers: processes running independent stages at once
+    :param report: log per stage timings, at INFO level
+    :return: df of features, one row per team-match
     """
+    sources = {'season_detail': season_detail_df}
+    if player_stats_df is not None:
+        sources['player_stats'] = player_stats_df
+
+    pipeline = Pipeline(feature_stages(player_stats_df is not None), cache_dir=cache_dir, max_workers=max_workers)
+    features_df = pipeline.run(sources, targets=['features'])['features']
+    if report:
+        logger.info('Feature pipeline stages:\n%s', pipeline.format_report())
 
-    pass
+    return features_df
 
 
-def get_match_lineup_vector(matches_df: pd.DataFrame, season_detail_df: pd.DataFrame) -> pd.Series:
-    def _find_lineup(match_id: str, home_or_away: str) -> list:
-        lineup_s = season_detail_df[season_detail_df.Id == match_id][[f'{home_or_away}LineupGoalkeeper',
-                                                                     f'{home_or_away}LineupDefense',
-                                                                     f'{home_or_away}LineupForward',
-                                                                     f'{home_or_away}LineupMidfield']]
+LINEUP_POSITIONS = ['Goalkeeper', 'Defense', 'Forward', 'Midfield']
 
-        lineup_deep_l = [_.split(';') for _ in lineup_s.values[0]]
-        lineup_l = flatten(lineup_deep_l)
-        return [_.strip() for _ in lineup_l if _ != '']
 
-    return matches_df.apply(lambda x: _find_lineup(x.MatchId, x.HomeOrAway))
+def build_match_side_index(season_detail_df: pd.DataFrame) -> pd.DataFrame:
+    """Lineup and formation for every (match id, Home / Away) pair, ready to look up or join against.
 
+    Lineup columns hold ';' separated player names per position. These are split and flattened for all
+    matches at once, in goalkeeper, defense, forward, midfield order.
 
-def get_encoded_formation_vector(matches_df: pd.DataFrame, season_detail_df: pd.DataFrame) -> pd.Series:
-    def _find_formation(match_id: str, home_or_away: str) -> str:
-        return season_detail_df[season_detail_df.Id == match_id][f'{home_or_away}TeamFormation']
+    :param season_detail_df: fixtures as returned by xml_soccer.get_season_matches_df, one or more seasons
+    :return: df indexed by (Id, HomeOrAway) with a Lineup column of player name lists and a Formation column
+    """
+    # ids typed as at ingest, so they match the MatchId of process_season_matches rows
+    season_detail_df = apply_dtypes(season_detail_df.drop_duplicates(subset='Id'),
+                                    {'Id': xml_soccer.FIXTURE_DTYPES['Id']})
+    side_dfs = []
 
-    return matches_df.apply(lambda x: _find_formation(x.MatchId, x.HomeOrAway))
+    for side in ('Home', 'Away'):
+        lineup_s = season_detail_df[f'{side}Lineup{LINEUP_POSITIONS[0]}'].fillna('')
+        for position in LINEUP_POSITIONS[1:]:
+            lineup_s = lineup_s.str.cat(season_detail_df[f'{side}Lineup{position}'].fillna(''), sep=';')
 
+        # explode keeps each player's match position as its index, so one split rebuilds the per-match lists
+        players_s = lineup_s.reset_index(drop=True).str.split(';').explode()
+        players_s = players_s[players_s != ''].str.strip()
+        players_per_match = np.bincount(players_s.index.to_numpy(dtype=np.int64), minlength=len(lineup_s))
+        lineups = np.split(players_s.to_numpy(dtype=object), np.cumsum(players_per_match)[:-1])
 
-def get_last_played_match_vector(season_matches_dfs: typing.List[pd.DataFrame]) -> pd.Series:
+        side_dfs.append(pd.DataFrame({
+            'Id': season_detail_df.Id,
+            'HomeOrAway': side,
+            'Lineup': [lineup.tolist() for lineup in lineups],
+            'Formation': season_detail_df[f'{side}TeamFormation'],
+        }))
+
+    return pd.concat(side_dfs, ignore_index=True).set_index(['Id', 'HomeOrAway'])
+
+
+def _lookup_match_side(matches_df: pd.DataFrame, match_side_index: pd.DataFrame, column: str) -> pd.Series:
+    keys = pd.MultiIndex.from_arrays([matches_df.MatchId, matches_df.HomeOrAway])
+    return pd.Series(match_side_index[column].reindex(keys).values, index=matches_df.index)
+
+
+def get_match_lineup_vector(matches_df: pd.DataFrame, season_detail_df: pd.DataFrame,
+                            match_side_index: pd.DataFrame = None) -> pd.Series:
+    """Starting lineup (list of player names) for each team-match row of matches_df.
+
+    :param matches_df: team-match rows as returned by xml_soccer.process_season_matches
+    :param season_detail_df: fixtures the matches came from
+    :param match_side_index: optional build_match_side_index(season_detail_df), to share between features
+    :return: Series aligned with matches_df
     """
+    if match_side_index is None:
+        match_side_index = build_match_side_index(season_detail_df)
+    return _lookup_match_side(matches_df, match_side_index, 'Lineup')
+
+
+def get_encoded_formation_vector(matches_df: pd.DataFrame, season_detail_df: pd.DataFrame,
+                                 match_side_index: pd.DataFrame = None) -> pd.Series:
+    """Team formation (e.g. '4-4-2') for each team-match row of matches_df; see get_match_lineup_vector."""
+    if match_side_index is None:
+        match_side_index = build_match_side_index(season_detail_df)
+    return _lookup_match_side(matches_df, match_side_index, 'Formation')
+
 
-    :param season_matches_dfs:
-    :return:
+FORM_COLUMNS = ['TeamName', 'MatchOpponent', 'MatchDate', 'GoalsFor', 'GoalsAgainst', 'Points']
+
+
+def get_last_played_match_vector(season_matches_dfs: typing.List[pd.DataFrame]) -> pd.Series:
+    """Seconds since each team last played, across seasons; 0 for a team's first match.
+
+    :param season_matches_dfs: team-match tables as returned by xml_soccer.process_season_matches
+    :return: Series aligned with the concatenated season_matches_dfs
     """
     df_concat = pd.concat(season_matches_dfs)
+    rest_days = team_form_features(df_concat).RestDays
+
+    return (rest_days.fillna(0) * 24 * 60 * 60).rename('LastPlayedSeconds')
+
+
+def get_last_played_team_vector(matches_df: pd.DataFrame) -> pd.Series:
+    """Points from the last time each team played this opponent, NaN if they haven't met before."""
+    return team_form_features(matches_df).LastMeetingPoints
+
+
+@instrumentation.timed('features.team_form_features')
+def team_form_features(matches_df: pd.DataFrame, n_lags: int = 3, window: int = 5) -> pd.DataFrame:
+    """Rest, form and head to head features for every team-match row, from that team's earlier matches only.
+
+    Rows are grouped by team (and by team and opponent for head to head) in date order, and every feature is a
+    grouped shift or rolling window, so nothing is leaked from the match itself or later ones. A team's form
+    carries over from one season into the next.
+
+    Columns:
+    RestDays -> days since the team's previous match
+    PointsLag1 .. PointsLag<n_lags> -> points won 1 .. n_lags matches ago, i.e. the match outcome at t-1 ..
+    FormPoints, FormGoalsFor, FormGoalsAgainst -> mean over the previous window matches
+    LastMeetingPoints -> points won the last time the team played this opponent
+
+    :param matches_df: team-match rows as returned by xml_soccer.process_season_matches, one or more seasons
+    :param n_lags: number of previous match outcomes
+    :param window: number of previous matches the form means are taken over
+    :return: df aligned with matches_df
+    """
+    df = matches_df[FORM_COLUMNS].reset_index(drop=True)
+    df = df.sort_values(['TeamName', 'MatchDate'], kind='stable')
+    team_groups = df.groupby('TeamName', sort=False)
 
-    sorted_df = df_concat.sort_values(by=['TeamName', 'MatchDate'], ascending=True)
+    features_df = pd.DataFrame(index=df.index)
+    features_df['RestDays'] = team_groups.MatchDate.diff().dt.total_seconds() / (24 * 60 * 60)
 
-    date_diff_df = sorted_df.groupby('TeamName').MatchDate.diff()
+    previous_df = team_groups[['Points', 'GoalsFor', 'GoalsAgainst']].shift()
+    for lag in range(1, n_lags + 1):
+        features_df[f'PointsLag{lag}'] = previous_df.Points if lag == 1 else team_groups.Points.shift(lag)
 
-    # check we're seeing as many null values as expected (should be = n of unique teams in dataset)
-    unique_teams = df_concat.TeamNames.nunique()
-    null_vals = date_diff_df[np.isnat(date_diff_df.values)].shape[0]
+    rolling_df = previous_df.groupby(df.TeamName, sort=False).rolling(window, min_periods=1).mean()
+    rolling_df.index = rolling_df.index.get_level_values(-1)
+    for column in ('Points', 'GoalsFor', 'GoalsAgainst'):
+        features_df[f'Form{column}'] = rolling_df[column]
 
-    assert unique_teams == null_vals
+    features_df['LastMeetingPoints'] = df.groupby(['TeamName', 'MatchOpponent'], sort=False).Points.shift()
 
-    date_diff_df = date_diff_df.fillna(0)
-    return date_diff_df.dt.total_seconds()
+    features_df = features_df.sort_index()
+    features_df.index = matches_df.index
+    return features_df
 
 
-def get_last_played_team_vector():
-    pass
+class TeamFormFeatures(object):
+    """Computes team_form_features incrementally, e.g. one season at a time.
 
+    Only the new rows are computed, with just enough of the earlier matches kept to compute them: each team's
+    last max(n_lags, window) matches and the last meeting of every pairing. New rows must be played after
+    every row already added.
 
-def get_lineup_stats_vector(team_match_lineup_s: pd.Series, player_stats_df: pd.DataFrame) -> pd.Series:
+    E.g.
+    form = TeamFormFeatures()
+    for season_matches_df in seasons:
+        season_features_df = form.update(season_matches_df)
+    """
+
+    def __init__(self, n_lags: int = 3, window: int = 5):
+        self.n_lags = n_lags
+        self.window = window
+        self._context_df = None
+
+    def update(self, matches_df: pd.DataFrame) -> pd.DataFrame:
+        """Features for the rows of matches_df, aligned with it."""
+        new_df = matches_df[FORM_COLUMNS].reset_index(drop=True)
+        if self._context_df is None:
+            combined_df = new_df
+        else:
+            combined_df = pd.concat([self._context_df, new_df], ignore_index=True)
+        n_context = len(combined_df) - len(new_df)
+
+        features_df = team_form_features(combined_df, self.n_lags, self.window).iloc[n_context:]
+        features_df.index = matches_df.index
+
+        combined_df = combined_df.sort_values(['TeamName', 'MatchDate'], kind='stable')
+        keep = combined_df.groupby('TeamName').tail(max(self.n_lags, self.window)).index.union(
+            combined_df.groupby(['TeamName', 'MatchOpponent']).tail(1).index)
+        self._context_df = combined_df.loc[keep.sort_values()]
+
+        return features_df
+
+
+def get_lineup_stats_vector(team_match_lineup_s: pd.Series, player_stats_df: pd.DataFrame,
+                            resolver: PlayerNameResolver = None, store=None) -> pd.Series:
     """Finds the overall rating of a player from FIFA player statistics.
 
     1. Builds a lookup column on player and team name
-    2. Computes a difflib ratio between the lookup name and every entry in our lookup col
-    3. Returns the overall rating of the player with the highest difflib ratio
+    2. Shortlists the lookup entries sharing the most character trigrams with each distinct lineup name
+    3. Returns the overall rating of the shortlisted player with the highest difflib ratio
+
+    Each distinct name is resolved once however many lineups it appears in; see PlayerNameResolver. With a
+    fpl_db PlayerIdentityStore, names resolved on earlier runs are not matched again.
 
     WARNING: depending on the FIFA datasource used, column names may need to be modified.
 
@@ -94,18 +246,82 @@ def get_lineup_stats_vector(team_match_lineup_s: pd.Series, player_stats_df: pd.
 
     :param team_match_lineup_s: Series composed of a list of player names representing a starting lineup
     :param player_stats_df: FIFA player-based stats dataframe
+    :param resolver: optional PlayerNameResolver built on player_stats_df, to reuse its memo between calls
+    :param store: optional PlayerIdentityStore to load resolved names from and save new ones to
     :return: Series composed of a list of player overall ratings representing a starting lineup
     """
+    resolver = resolver or PlayerNameResolver(player_stats_df, store=store)
+
+    matches = resolver.resolve_many(name for lineup in team_match_lineup_s for name in lineup)
+    if resolver.store is not None:
+        resolver.save()
+    ratings = dict(zip(matches.keys(), player_stats_df.Overall.loc[[m.index for m in matches.values()]]))
+
+    return team_match_lineup_s.apply(lambda lineup: [ratings[name] for name in lineup])
+
+
+def _matches_stage(season_detail_df: pd.DataFrame) -> pd.DataFrame:
+    matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+    return matches_df.reset_index(drop=True)
+
+
+def _standings_stage(matches_df: pd.DataFrame) -> pd.DataFrame:
+    """Each team's season totals going into every match."""
+    totals_df = matches_df[['GamesPlayed', 'Points', 'GoalsFor', 'GoalsAgainst']].fillna(0)
+    season_groups = totals_df.groupby([matches_df.CompetitionSeason, matches_df.TeamName], sort=False)
+
+    standings_df = season_groups.cumsum() - totals_df
+    return standings_df.add_prefix('Table')
+
+
+def _form_stage(matches_df: pd.DataFrame, n_lags: int = 3, window: int = 5) -> pd.DataFrame:
+    return team_form_features(matches_df, n_lags, window)
+
+
+def _lineup_stage(season_detail_df: pd.DataFrame, matches_df: pd.DataFrame) -> pd.DataFrame:
+    match_side_index = build_match_side_index(season_detail_df)
+    return pd.DataFrame({'Lineup': get_match_lineup_vector(matches_df, season_detail_df, match_side_index),
+                         'Formation': get_encoded_formation_vector(matches_df, season_detail_df, match_side_index)})
+
+
+def _lineup_rating_stage(lineup_df: pd.DataFrame, player_stats_df: pd.DataFrame) -> pd.DataFrame:
+    ratings_s = get_lineup_stats_vector(lineup_df.Lineup.map(list), player_stats_df)
+    return pd.DataFrame({'LineupRating': ratings_s.map(lambda ratings: np.mean(ratings) if ratings else np.nan)})
+
+
+def _combine_stage(matches_df: pd.DataFrame, standings_df: pd.DataFrame, form_df: pd.DataFrame,
+                   lineup_df: pd.DataFrame, *rating_dfs: pd.DataFrame) -> pd.DataFrame:
+    """Joins the stages, adding every team feature a second time for the opponent."""
+    team_df = pd.concat([standings_df, form_df.drop(columns='LastMeetingPoints'),
+                         pd.get_dummies(lineup_df.Formation, prefix='Formation', dtype=float), *rating_dfs], axis=1)
+
+    opponent_side = matches_df.HomeOrAway.map({'Home': 'Away', 'Away': 'Home'})
+    team_df.index = pd.MultiIndex.from_arrays([matches_df.MatchId, matches_df.HomeOrAway])
+    opponent_df = team_df.reindex(pd.MultiIndex.from_arrays([matches_df.MatchId, opponent_side]))
+    team_df.index = opponent_df.index = matches_df.index
 
-    key_matching_col = player_stats_df.Name.str.cat(player_stats_df.Club, sep=' ')
+    features_df = matches_df[['MatchId', 'TeamName', 'MatchOpponent', 'HomeOrAway', 'MatchDate',
+                              'CompetitionSeason']].copy()
+    features_df['Outcome'] = np.sign(matches_df.GoalDiff)
+    features_df['KickoffHour'] = matches_df.MatchDate.dt.hour + matches_df.MatchDate.dt.minute / 60
+    features_df['LastMeetingPoints'] = form_df.LastMeetingPoints
 
-    def _lookup_player_name_loc(player_name):
-        return key_matching_col.apply(compute_diff, args=(player_name,)).idxmax()
+    return pd.concat([features_df, team_df, opponent_df.add_prefix('Opponent')], axis=1)
 
-    def _get_player_rating(player_name):
-        return player_stats_df.loc[_lookup_player_name_loc(player_name)].Overall
 
-    def get_player_ratings(player_name_list):
-        return [_get_player_rating(player) for player in player_name_list]
+def feature_stages(with_ratings: bool = True) -> typing.List[Stage]:
+    """Stages of create_feature_vector, taking season_detail (and player_stats) sources; 'features' is the output."""
+    stages = [
+        Stage('matches', _matches_stage, inputs=['season_detail']),
+        Stage('standings', _standings_stage, inputs=['matches']),
+        Stage('form', _form_stage, inputs=['matches'], params={'n_lags': 3, 'window': 5}),
+        Stage('lineups', _lineup_stage, inputs=['season_detail', 'matches']),
+    ]
+    if with_ratings:
+        stages.append(Stage('lineup_ratings', _lineup_rating_stage, inputs=['lineups', 'player_stats']))
+        stages.append(Stage('features', _combine_stage,
+                            inputs=['matches', 'standings', 'form', 'lineups', 'lineup_ratings']))
+    else:
+        stages.append(Stage('features', _combine_stage, inputs=['matches', 'standings', 'form', 'lineups']))
 
-    return team_match_lineup_s.apply(get_player_ratings)
+    return stages
@@ -1,22 +1,181 @@
-"""Reconstructs a football season fixture by fixture, outputting the table as it stood for every event.
+"""Predicts match outcomes with a Dixon-Coles goals model.
 
-Uses the football data API to provide raw match data.
+Each side's goals are Poisson distributed, with a rate set by the team's attack, the opponent's defence and, for
+the home side, home advantage:
+log(home rate) = intercept + home advantage + attack[home] - defence[away]
+log(away rate) = intercept + attack[away] - defence[home]
+Dixon and Coles' rho then corrects the probabilities of the 0-0, 1-0, 0-1 and 1-1 scores, which two independent
+Poissons get wrong.
 
-Documentation here: https://www.football-data.org/documentation/api
+The model is fitted to the team-match rows of xml_soccer.process_season_matches (one row per team per match,
+with GoalsFor, TeamName, MatchOpponent and HomeOrAway), optionally weighting recent matches more. The Poisson
+part is a ridge penalised GLM fitted by Newton's method over the whole design matrix at once; rho by a
+vectorised grid search. Predictions are batched: a gameweek or a whole season of fixtures is scored in one call.
 
-Key values:
-EPL competition code: 2021
-18-19 season: 151
-17-18 season: 23
-16-17 season: 256
-
-Get competitions: http://api.football-data.org/v2/competitions/
-Get competition seasons: http://api.football-data.org/v2/competitions/2021
-Get season info:
+E.g.
+matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+model = DixonColesModel(half_life_days=180).fit(matches_df)
+model.predict(fixtures_df.HomeTeam, fixtures_df.AwayTeam)[['HomeWin', 'Draw', 'AwayWin']]
 """
 
-import requests as rq
-import json
+import typing
+
+import numpy as np
 import pandas as pd
-import datetime as dt
 
+RHO_GRID = np.linspace(-0.3, 0.3, 601)
+
+
+def _poisson_pmf(rates: np.ndarray, max_goals: int) -> np.ndarray:
+    """P(goals = 0 .. max_goals) for each rate, shape (len(rates), max_goals + 1)."""
+    goals = np.arange(max_goals + 1)
+    log_factorials = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, max_goals + 1)))])
+    return np.exp(-rates[:, None] + goals * np.log(rates)[:, None] - log_factorials)
+
+
+def _low_score_tau(home_goals: np.ndarray, away_goals: np.ndarray, home_rates: np.ndarray, away_rates: np.ndarray,
+                   rho: np.ndarray) -> np.ndarray:
+    """Dixon-Coles correction factor of each match's score, for each rho; shape (len(matches), len(rho))."""
+    tau = np.ones((len(home_goals), len(rho)))
+    for x, y, correction in ((0, 0, lambda: 1 - np.outer(home_rates * away_rates, rho)),
+                             (0, 1, lambda: 1 + np.outer(home_rates, rho)),
+                             (1, 0, lambda: 1 + np.outer(away_rates, rho)),
+                             (1, 1, lambda: np.broadcast_to(1 - rho, (len(home_goals), len(rho))))):
+        score = (home_goals == x) & (away_goals == y)
+        tau[score] = correction()[score]
+    return tau
+
+
+class DixonColesModel(object):
+    """Dixon-Coles goals model; see the module docstring.
+
+    :param half_life_days: matches this many days before the latest one count half as much, None weights all equally
+    :param l2: ridge penalty on attack and defence, keeping them identifiable and shrinking teams with few matches
+    :param max_goals: goals per side considered when predicting outcome probabilities
+    :param max_iter: Newton iterations
+    :param tol: stop once no parameter moves more than this
+    """
+
+    def __init__(self, half_life_days: float = None, l2: float = 1.0, max_goals: int = 10, max_iter: int = 50,
+                 tol: float = 1e-8):
+        self.half_life_days = half_life_days
+        self.l2 = l2
+        self.max_goals = max_goals
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def _weights(self, match_dates: pd.Series) -> np.ndarray:
+        if self.half_life_days is None:
+            return np.ones(len(match_dates))
+        age_days = (match_dates.max() - match_dates).dt.total_seconds().to_numpy() / (24 * 60 * 60)
+        return 0.5 ** (age_days / self.half_life_days)
+
+    def fit(self, matches_df: pd.DataFrame) -> 'DixonColesModel':
+        """Fits attack, defence, home advantage and rho to played team-match rows; unplayed rows are ignored.
+
+        :param matches_df: team-match rows as returned by xml_soccer.process_season_matches, one or more seasons
+        :return: self
+        """
+        played_df = matches_df.dropna(subset=['GoalsFor']).reset_index(drop=True)
+        self.teams = pd.Index(sorted(set(played_df.TeamName) | set(played_df.MatchOpponent)))
+        n_teams, n_rows = len(self.teams), len(played_df)
+
+        team = self.teams.get_indexer(played_df.TeamName)
+        opponent = self.teams.get_indexer(played_df.MatchOpponent)
+        is_home = (played_df.HomeOrAway == 'Home').to_numpy(dtype=float)
+        goals = played_df.GoalsFor.to_numpy(dtype=float)
+        weights = self._weights(played_df.MatchDate)
+
+        # columns: intercept, home advantage, attack per team, defence per team
+        design = np.zeros((n_rows, 2 + 2 * n_teams))
+        design[:, 0] = 1
+        design[:, 1] = is_home
+        design[np.arange(n_rows), 2 + team] = 1
+        design[np.arange(n_rows), 2 + n_teams + opponent] = -1
+
+        penalty = np.full(design.shape[1], self.l2)
+        penalty[:2] = 0
+        params = np.zeros(design.shape[1])
+        params[0] = np.log(np.average(goals, weights=weights))
+
+        for _ in range(self.max_iter):
+            rates = np.exp(design @ params)
+            gradient = design.T @ (weights * (goals - rates)) - penalty * params
+            hessian = (design.T * (weights * rates)) @ design + np.diag(penalty)
+            step = np.linalg.solve(hessian, gradient)
+            params += step
+            if np.abs(step).max() < self.tol:
+                break
+
+        self.intercept, self.home_advantage = params[0], params[1]
+        self.attack = pd.Series(params[2:2 + n_teams], index=self.teams, name='Attack')
+        self.defence = pd.Series(params[2 + n_teams:], index=self.teams, name='Defence')
+
+        # rho from each match's home row and the matching away row
+        rates = np.exp(design @ params)
+        home = is_home == 1
+        away_position = pd.Series(np.flatnonzero(~home), index=played_df.MatchId[~home])
+        home_position = np.flatnonzero(home & played_df.MatchId.isin(away_position.index).to_numpy())
+        away_position = away_position.loc[played_df.MatchId.iloc[home_position]].to_numpy()
+
+        tau = _low_score_tau(goals[home_position], goals[away_position], rates[home_position],
+                             rates[away_position], RHO_GRID)
+        log_likelihood = np.where(tau > 0, weights[home_position, None] * np.log(np.maximum(tau, 1e-300)), -np.inf)
+        self.rho = RHO_GRID[np.argmax(log_likelihood.sum(axis=0))]
+
+        return self
+
+    def expected_goals(self, home_teams: typing.Iterable[str],
+                       away_teams: typing.Iterable[str]) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Home and away goal rates per fixture; teams the model hasn't seen are treated as average."""
+        # a trailing 0 means get_indexer's -1 for unseen teams picks an average attack / defence
+        attack = np.append(self.attack.to_numpy(), 0.0)
+        defence = np.append(self.defence.to_numpy(), 0.0)
+        home = self.teams.get_indexer(pd.Index(home_teams))
+        away = self.teams.get_indexer(pd.Index(away_teams))
+
+        home_rates = np.exp(self.intercept + self.home_advantage + attack[home] - defence[away])
+        away_rates = np.exp(self.intercept + attack[away] - defence[home])
+        return home_rates, away_rates
+
+    def score_probabilities(self, home_rates: np.ndarray, away_rates: np.ndarray) -> np.ndarray:
+        """P(home goals = i, away goals = j) per fixture, shape (n_fixtures, max_goals + 1, max_goals + 1)."""
+        scores = _poisson_pmf(home_rates, self.max_goals)[:, :, None] * \
+            _poisson_pmf(away_rates, self.max_goals)[:, None, :]
+
+        scores[:, 0, 0] *= 1 - home_rates * away_rates * self.rho
+        scores[:, 0, 1] *= 1 + home_rates * self.rho
+        scores[:, 1, 0] *= 1 + away_rates * self.rho
+        scores[:, 1, 1] *= 1 - self.rho
+        return scores
+
+    def predict(self, home_teams: typing.Iterable[str], away_teams: typing.Iterable[str],
+                batch_size: int = 20000) -> pd.DataFrame:
+        """Expected goals and home win / draw / away win probabilities for a batch of fixtures.
+
+        :param home_teams: home team name per fixture
+        :param away_teams: away team name per fixture
+        :param batch_size: fixtures whose score grids are held in memory at once
+        :return: df with one row per fixture
+        """
+        home_teams, away_teams = list(home_teams), list(away_teams)
+        home_rates, away_rates = self.expected_goals(home_teams, away_teams)
+
+        goals = np.arange(self.max_goals + 1)
+        outcome_masks = np.stack([goals[:, None] > goals, goals[:, None] == goals, goals[:, None] < goals])
+        outcomes = np.empty((len(home_rates), 3))
+        for start in range(0, len(home_rates), batch_size):
+            batch = slice(start, start + batch_size)
+            scores = self.score_probabilities(home_rates[batch], away_rates[batch])
+            outcomes[batch] = np.einsum('nij,kij->nk', scores, outcome_masks)
+        outcomes /= outcomes.sum(axis=1, keepdims=True)  # scores above max_goals are left out
+
+        return pd.DataFrame({
+            'HomeTeam': home_teams,
+            'AwayTeam': away_teams,
+            'HomeExpectedGoals': home_rates,
+            'AwayExpectedGoals': away_rates,
+            'HomeWin': outcomes[:, 0],
+            'Draw': outcomes[:, 1],
+            'AwayWin': outcomes[:, 2],
+        })
@@ -0,0 +1,138 @@
+"""Resolves lineup player names to rows of a FIFA player ratings table.
+
+Scoring every ratings row with difflib for every lineup name is what made get_lineup_stats_vector take hours.
+Here names are normalised once, a character trigram index shortlists the rows sharing the most trigrams with a
+name, and only that shortlist is scored with difflib. Resolved names are memoised across matches, and
+optionally persisted between runs through a fpl_db.player_identity.PlayerIdentityStore.
+"""
+
+import collections
+import re
+import typing
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from analytics.utils import compute_diff
+
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+
+
+class NameMatch(typing.NamedTuple):
+    index: typing.Any  # label of the matched row in the ratings table
+    score: float  # difflib ratio of the match, 0 - 1
+    margin: float  # score lead over the runner up; small margins are worth checking by hand
+
+
+def normalise_name(name: str) -> str:
+    """Lower case ASCII with accents stripped and punctuation collapsed to single spaces."""
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALPHANUMERIC.sub(' ', ascii_name.lower()).strip()
+
+
+def _ngrams(normalised_name: str, n: int) -> typing.Set[str]:
+    padded = f' {normalised_name} '
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class PlayerNameResolver(object):
+    """Matches lineup names against 'Name Club' keys of a ratings table, as get_lineup_stats_vector always has.
+
+    E.g.
+    resolver = PlayerNameResolver(player_stats_df)
+    match = resolver.resolve('Mohamed Salah')
+    player_stats_df.loc[match.index].Overall
+
+    :param player_stats_df: FIFA player-based stats dataframe, with Name and Club columns
+    :param n_candidates: rows shortlisted by the trigram index and scored with difflib
+    :param ngram: character n-gram length used for the index
+    :param store: optional PlayerIdentityStore; names it holds for this ratings source are not matched again,
+    and save() writes back the ones resolved since
+    """
+
+    def __init__(self, player_stats_df: pd.DataFrame, n_candidates: int = 25, ngram: int = 3, store=None):
+        self.n_candidates = n_candidates
+        self.ngram = ngram
+
+        self.labels = player_stats_df.index.to_numpy()
+        self.keys = player_stats_df.Name.str.cat(player_stats_df.Club, sep=' ').tolist()
+
+        self._postings = None  # trigram index, built on first use as stored names may not need it
+        self._key_norms = None
+        self._memo = dict()
+        self._unsaved = set()
+
+        self.store = store
+        if store is not None:
+            self._load_store(player_stats_df)
+
+    def _load_store(self, player_stats_df: pd.DataFrame):
+        # imported here so analytics only needs fpl_db (and SQLAlchemy) when a store is actually used
+        from fpl_db.player_identity import source_fingerprint
+
+        self.fingerprint = source_fingerprint(player_stats_df)
+        self.store.invalidate(self.fingerprint)
+
+        key_rows = dict()
+        for row, key in enumerate(self.keys):
+            key_rows.setdefault(key, row)
+
+        for name, identity in self.store.load(self.fingerprint).items():
+            if identity.fifa_key in key_rows:  # pinned keys may be missing from this ratings source
+                label = self.labels[key_rows[identity.fifa_key]]
+                self._memo[name] = NameMatch(label, identity.score, identity.margin)
+
+    def save(self):
+        """Writes names resolved since the last save to the store."""
+        from fpl_db.player_identity import StoredIdentity
+
+        label_keys = dict(zip(self.labels, self.keys))
+        self.store.save({name: StoredIdentity(label_keys[self._memo[name].index], self._memo[name].score,
+                                              self._memo[name].margin, False) for name in self._unsaved},
+                        self.fingerprint)
+        self._unsaved.clear()
+
+    def _build_index(self):
+        postings = collections.defaultdict(list)
+        key_ngram_counts = np.empty(len(self.keys))
+        for row, key in enumerate(self.keys):
+            key_ngrams = _ngrams(normalise_name(key), self.ngram)
+            key_ngram_counts[row] = len(key_ngrams)
+            for gram in key_ngrams:
+                postings[gram].append(row)
+
+        self._postings = {gram: np.array(rows, dtype=np.int64) for gram, rows in postings.items()}
+        self._key_norms = np.sqrt(np.maximum(key_ngram_counts, 1))
+
+    def shortlist(self, name: str) -> np.ndarray:
+        """Row positions sharing the most trigrams with name, relative to key length."""
+        if self._postings is None:
+            self._build_index()
+
+        name_postings = [self._postings[gram] for gram in _ngrams(normalise_name(name), self.ngram)
+                         if gram in self._postings]
+        if not name_postings:
+            return np.arange(len(self.keys))
+
+        shared = np.bincount(np.concatenate(name_postings), minlength=len(self.keys)) / self._key_norms
+        if len(shared) <= self.n_candidates:
+            return np.arange(len(self.keys))
+        return np.argpartition(-shared, self.n_candidates)[:self.n_candidates]
+
+    def resolve(self, name: str) -> NameMatch:
+        if name not in self._memo:
+            candidates = np.sort(self.shortlist(name))
+            scores = np.array([compute_diff(self.keys[row], name) for row in candidates])
+
+            order = np.argsort(-scores, kind='stable')  # ties go to the earliest row, as idxmax did
+            best = order[0]
+            runner_up = scores[order[1]] if len(order) > 1 else 0.0
+
+            self._memo[name] = NameMatch(self.labels[candidates[best]], scores[best], scores[best] - runner_up)
+            self._unsaved.add(name)
+
+        return self._memo[name]
+
+    def resolve_many(self, names: typing.Iterable[str]) -> typing.Dict[str, NameMatch]:
+        return {name: self.resolve(name) for name in set(names)}
@@ -0,0 +1,252 @@
+"""Runs a DAG of dataframe stages, caching each stage's output on disk so only stages whose inputs changed rerun.
+
+A stage's cache key hashes its name and version, its code, its params, and the keys of its inputs: a hash of the
+content for source dataframes, and the upstream stage's own key for stages. Its code is the source of the module
+defining its function and of every project module reachable from there through module globals (see
+code_modules), so editing something a stage calls invalidates it too; library code isn't hashed. Changing a source
+or a stage therefore only invalidates the stages downstream of it. Outputs are stored as Parquet files named by
+key.
+
+Stages are run a topological level at a time; independent stages that need computing run in a process pool, so
+stage functions must be module level. Cached outputs are only read when something downstream needs computing,
+or they are a requested target.
+
+E.g.
+pipeline = Pipeline([
+    Stage('matches', build_matches, inputs=['season_detail']),
+    Stage('form', build_form, inputs=['matches'], params={'window': 5}),
+], cache_dir='~/.fpl_fun/feature_cache')
+outputs = pipeline.run({'season_detail': season_detail_df}, targets=['form'])
+print(pipeline.format_report())
+"""
+
+import hashlib
+import os
+import sys
+import sysconfig
+import time
+import types
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import instrumentation
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.fpl_fun', 'feature_cache')
+
+# modules under these are library code, left out of stage code hashes
+_LIBRARY_PATHS = tuple({os.path.join(os.path.realpath(path), '') for name, path in sysconfig.get_paths().items()
+                        if name in ('stdlib', 'platstdlib', 'purelib', 'platlib')})
+
+_source_hashes = dict()  # (path, mtime, size) -> hash of a module file's source
+
+
+class Stage(typing.NamedTuple):
+    """One step of a Pipeline: func(*input dataframes, **params) -> dataframe.
+
+    :param name: name other stages refer to it by
+    :param func: module level function
+    :param inputs: names of source dataframes or other stages, passed to func positionally in this order
+    :param version: bump to invalidate cached outputs when something func calls changes outside the project, e.g.
+    a library it relies on
+    :param params: keyword arguments to func, part of the cache key
+    """
+    name: str
+    func: typing.Callable[..., pd.DataFrame]
+    inputs: typing.Sequence[str] = ()
+    version: str = '1'
+    params: typing.Optional[typing.Dict] = None
+
+
+class StageReport(typing.NamedTuple):
+    name: str
+    status: str  # 'computed', 'cached' (read from disk) or 'skipped' (cached and not needed)
+    seconds: float
+    rows: typing.Optional[int]
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """Content hash of a dataframe's values, index and column names."""
+    digest = hashlib.sha1(repr(list(df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def _project_module(module: types.ModuleType) -> bool:
+    path = getattr(module, '__file__', None)
+    return path is not None and not os.path.realpath(path).startswith(_LIBRARY_PATHS)
+
+
+def code_modules(func: typing.Callable) -> typing.List[str]:
+    """Names of the project modules func's code may depend on: its own module, and every project module reachable
+    from there through the modules, functions and classes in module globals."""
+    module = sys.modules.get(getattr(func, '__module__', None))
+    if module is None or not _project_module(module):
+        return []
+
+    modules = {module.__name__: module}
+    pending = [module]
+    while pending:
+        for value in list(vars(pending.pop()).values()):
+            if isinstance(value, types.ModuleType):
+                dependency = value
+            elif isinstance(value, (type, types.FunctionType)):
+                dependency = sys.modules.get(value.__module__)
+            else:
+                continue
+            if dependency is not None and dependency.__name__ not in modules and _project_module(dependency):
+                modules[dependency.__name__] = dependency
+                pending.append(dependency)
+    return sorted(modules)
+
+
+def _source_hash(module_name: str) -> str:
+    path = sys.modules[module_name].__file__
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return module_name
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _source_hashes:
+        with open(path, 'rb') as f:
+            _source_hashes[key] = hashlib.sha1(f.read()).hexdigest()
+    return _source_hashes[key]
+
+
+def _run_stage(func, inputs, params):
+    start = time.perf_counter()
+    output = func(*inputs, **params)
+    return output, time.perf_counter() - start
+
+
+class Pipeline(object):
+    """DAG of Stages with an on-disk Parquet cache.
+
+    :param stages: stages in any order
+    :param cache_dir: directory for cached stage outputs, None to disable caching
+    :param max_workers: processes running independent stages at once; 1 runs everything in this process
+    """
+
+    def __init__(self, stages: typing.Iterable[Stage], cache_dir: typing.Optional[str] = DEFAULT_CACHE_DIR,
+                 max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.report = []
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _code_hash(self, stage: Stage) -> str:
+        code_parts = [getattr(stage.func, '__qualname__', repr(stage.func))]
+        code_parts += [f'{name}:{_source_hash(name)}' for name in code_modules(stage.func)]
+        return hashlib.sha1('|'.join(code_parts).encode('utf-8')).hexdigest()
+
+    def _levels(self, targets: typing.Iterable[str], sources: typing.Mapping) -> typing.List[typing.List[str]]:
+        """Stages needed for targets, grouped so every stage only depends on sources and earlier levels."""
+        depth = dict()
+
+        def visit(name, path=()):
+            if name in sources:
+                return -1
+            if name not in self.stages:
+                raise KeyError(f'{name} is neither a stage nor a source')
+            if name in path:
+                raise ValueError(f'Stage cycle: {" -> ".join(path + (name,))}')
+            if name not in depth:
+                depth[name] = 1 + max([visit(i, path + (name,)) for i in self.stages[name].inputs], default=-1)
+            return depth[name]
+
+        for target in targets:
+            visit(target)
+
+        levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for name, level in depth.items():
+            levels[level].append(name)
+        return levels
+
+    def _keys(self, levels: typing.List[typing.List[str]], sources: typing.Mapping) -> typing.Dict[str, str]:
+        keys = {name: frame_hash(df) for name, df in sources.items()}
+        for level in levels:
+            for name in level:
+                stage = self.stages[name]
+                key_parts = [name, stage.version, self._code_hash(stage), repr(sorted((stage.params or {}).items()))]
+                key_parts += [keys[i] for i in stage.inputs]
+                keys[name] = hashlib.sha1('|'.join(key_parts).encode('utf-8')).hexdigest()
+        return keys
+
+    def _path(self, name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{name}-{key}.parquet')
+
+    def _is_cached(self, name: str, key: str) -> bool:
+        return self.cache_dir is not None and os.path.exists(self._path(name, key))
+
+    def _store(self, name: str, key: str, df: pd.DataFrame):
+        if self.cache_dir is None:
+            return
+        path = self._path(name, key)
+        df.to_parquet(path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def run(self, sources: typing.Mapping[str, pd.DataFrame],
+            targets: typing.Iterable[str] = None) -> typing.Dict[str, pd.DataFrame]:
+        """Brings targets (by default every stage) up to date, returning their outputs.
+
+        :param sources: dataframes stages can take as inputs, by name
+        :param targets: stage names to return
+        :return: dict of target name -> output dataframe
+        """
+        targets = list(targets or self.stages)
+        levels = self._levels(targets, sources)
+        keys = self._keys(levels, sources)
+        needed = {name for level in levels for name in level}
+
+        # a cached stage only has to be read if it is a target or feeds a stage that has to be computed
+        to_compute = {name for name in needed if not self._is_cached(name, keys[name])}
+        to_read = {i for name in to_compute for i in self.stages[name].inputs if i in self.stages} | set(targets)
+
+        outputs = dict(sources)
+        timings = dict()
+        self.report = []
+
+        with instrumentation.span('pipeline.run', targets=targets) as s:
+            executor = ProcessPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+            try:
+                for level in levels:
+                    futures = dict()
+                    for name in level:
+                        if name in to_compute:
+                            stage = self.stages[name]
+                            args = (stage.func, [outputs[i] for i in stage.inputs], stage.params or {})
+                            parallel = executor is not None and len(to_compute.intersection(level)) > 1
+                            futures[name] = executor.submit(_run_stage, *args) if parallel else _run_stage(*args)
+                        elif name in to_read:
+                            start = time.perf_counter()
+                            outputs[name] = pd.read_parquet(self._path(name, keys[name]))
+                            timings[name] = ('cached', time.perf_counter() - start)
+                        else:
+                            timings[name] = ('skipped', 0.0)
+
+                    for name, future in futures.items():
+                        outputs[name], seconds = future if isinstance(future, tuple) else future.result()
+                        timings[name] = ('computed', seconds)
+                        self._store(name, keys[name], outputs[name])
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+
+            for level in levels:
+                for name in sorted(level):
+                    status, seconds = timings[name]
+                    rows = len(outputs[name]) if name in outputs else None
+                    self.report.append(StageReport(name, status, seconds, rows))
+                    instrumentation.add_span('pipeline.stage', seconds, rows=rows, stage=name, status=status)
+            s.record(rows=sum(len(outputs[name]) for name in targets))
+
+        return {name: outputs[name] for name in targets}
+
+    def format_report(self) -> str:
+        """Per stage timings of the last run, one line each."""
+        return '\n'.join(f'{r.name:<20} {r.status:<9} {r.seconds:8.3f}s' + (f'  {r.rows} rows' if r.rows else '')
+                         for r in self.report)
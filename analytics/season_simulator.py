@@ -0,0 +1,107 @@
+"""Simulates the rest of a season many times over to estimate each team's chance of finishing in each position.
+
+Takes the table as it stands, e.g. LeagueTable.standings(), and the fixtures left to play with home win / draw /
+away win probabilities, e.g. from DixonColesModel.predict. Every simulated season draws an outcome for each
+remaining fixture and adds the points to the current table. Teams level on points are separated by their current
+goal difference, then goals scored, then at random: goals aren't simulated, only outcomes.
+
+Simulations are vectorised in chunks of chunk_size seasons, one (seasons x fixtures) array at a time, and chunks
+are shared out over a process pool. Each chunk draws from its own child of one SeedSequence, so results only
+depend on the seed, not on how many processes ran them.
+
+E.g.
+model = DixonColesModel().fit(matches_df)
+fixtures_df = model.predict(remaining_df.HomeTeam, remaining_df.AwayTeam)
+positions_df = simulate_season(league_table.standings(), fixtures_df, n_sims=100000)
+positions_df[1]  # chance of each team winning the league
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from api_handler.league_table import TableColumns, XML_SOCCER_COLUMNS
+
+HOME_POINTS = np.array([3.0, 1.0, 0.0])
+AWAY_POINTS = np.array([0.0, 1.0, 3.0])
+
+
+def _tiebreak_ranks(standings_df: pd.DataFrame, columns: TableColumns) -> np.ndarray:
+    """Each team's rank by current goal difference then goals scored, 0 the worst; equal teams share a rank."""
+    keys = standings_df[[columns.goal_diff, columns.goals_for]].to_numpy(dtype=float)
+    order = np.lexsort(keys.T[::-1])
+    is_new = np.r_[True, (np.diff(keys[order], axis=0) != 0).any(axis=1)]
+
+    ranks = np.empty(len(keys), dtype=np.int64)
+    ranks[order] = np.maximum.accumulate(np.where(is_new, np.arange(len(keys)), 0))
+    return ranks
+
+
+def _simulate_chunk(points: np.ndarray, tiebreak_ranks: np.ndarray, home: np.ndarray, away: np.ndarray,
+                    thresholds: np.ndarray, n_sims: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Finishing position counts of n_sims simulated seasons, shape (n_teams, n_teams)."""
+    rng = np.random.default_rng(seed)
+    n_teams = len(points)
+
+    draws = rng.random((n_sims, len(home)))
+    outcomes = (draws >= thresholds[:, 0]).astype(np.int8) + (draws >= thresholds[:, 1])  # 0 home win .. 2 away win
+
+    # fixture -> team one-hot matrices turn summing each team's points into two matrix products
+    home_teams = np.zeros((len(home), n_teams))
+    home_teams[np.arange(len(home)), home] = 1
+    away_teams = np.zeros((len(away), n_teams))
+    away_teams[np.arange(len(away)), away] = 1
+    final_points = points + HOME_POINTS[outcomes] @ home_teams + AWAY_POINTS[outcomes] @ away_teams
+
+    # the tie break term stays below 1, so it only separates teams on equal points
+    sort_key = final_points + (tiebreak_ranks + rng.random((n_sims, n_teams))) / (n_teams + 1)
+    positions = np.empty((n_sims, n_teams), dtype=np.int64)
+    np.put_along_axis(positions, np.argsort(-sort_key, axis=1), np.arange(n_teams), axis=1)
+
+    return np.bincount((np.arange(n_teams) * n_teams + positions).ravel(),
+                       minlength=n_teams * n_teams).reshape(n_teams, n_teams)
+
+
+def simulate_season(standings_df: pd.DataFrame, fixtures_df: pd.DataFrame, n_sims: int = 100000, seed: int = 0,
+                    max_workers: int = None, chunk_size: int = 5000,
+                    columns: TableColumns = XML_SOCCER_COLUMNS) -> pd.DataFrame:
+    """Probability of each team finishing in each position.
+
+    :param standings_df: current table, one row per team indexed by team name, with points, goal difference and
+    goals for columns named as in columns
+    :param fixtures_df: remaining fixtures with HomeTeam, AwayTeam, HomeWin, Draw and AwayWin columns; teams
+    missing from standings_df start on zero
+    :param n_sims: seasons to simulate
+    :param seed: seeds the SeedSequence every chunk's generator is spawned from
+    :param max_workers: processes to simulate chunks in, by default one per CPU; 1 runs in this process
+    :param chunk_size: seasons simulated per vectorised step; memory use is about 30 bytes x chunk_size x fixtures
+    :param columns: column naming of standings_df
+    :return: df indexed by team, ordered by expected position, with a column per position from 1
+    """
+    teams = standings_df.index.append(pd.Index(fixtures_df.HomeTeam).append(pd.Index(fixtures_df.AwayTeam)))\
+        .unique()
+    standings_df = standings_df.reindex(teams).fillna(0)
+
+    points = standings_df[columns.points].to_numpy(dtype=float)
+    tiebreak_ranks = _tiebreak_ranks(standings_df, columns)
+    home = teams.get_indexer(fixtures_df.HomeTeam)
+    away = teams.get_indexer(fixtures_df.AwayTeam)
+    probabilities = fixtures_df[['HomeWin', 'Draw', 'AwayWin']].to_numpy(dtype=float)
+    thresholds = np.cumsum(probabilities / probabilities.sum(axis=1, keepdims=True), axis=1)[:, :2]
+
+    chunk_sizes = [chunk_size] * (n_sims // chunk_size) + ([n_sims % chunk_size] if n_sims % chunk_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    args = [(points, tiebreak_ranks, home, away, thresholds, size, chunk_seed)
+            for size, chunk_seed in zip(chunk_sizes, seeds)]
+
+    if max_workers == 1 or len(args) == 1:
+        counts = sum(_simulate_chunk(*chunk_args) for chunk_args in args)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            counts = sum(executor.map(_simulate_chunk, *zip(*args)))
+
+    positions_df = pd.DataFrame(counts / n_sims, index=teams, columns=np.arange(1, len(teams) + 1))
+    positions_df.index.name = columns.team
+    expected_position = positions_df.to_numpy() @ positions_df.columns.to_numpy()
+    return positions_df.iloc[np.argsort(expected_position, kind='stable')]
@@ -0,0 +1,539 @@
+"""Picks the FPL squad and starting XI with the most expected points, under the game's squad rules.
+
+A squad is 2 goalkeepers, 5 defenders, 5 midfielders and 3 forwards costing at most the budget (now_cost units,
+1000 = 100.0m), with at most 3 players from any club. The starting XI is 1 goalkeeper, 3-5 defenders, 2-5
+midfielders and 1-3 forwards, and its captain scores double. A squad's value is its starting XI's expected points,
+plus the captain's again, plus bench_weight times the bench's.
+
+The solver is exact:
+1. Dominated players are dropped: a player is never needed if enough players of the same position are at least
+as cheap and expected to score at least as much that one of them could always take his place, however the rest
+of the squad's clubs fill up.
+2. Without the club limit the problem is a knapsack per position, solved by DP over (starters, bench, captain,
+cost), and the four positions are combined by max-plus convolution over cost.
+3. A branch and bound restores the club limit: while the best squad has more than 3 players from a club, the
+problem is split on which of those players is the first left out. Each branch is bounded by the lower of its DP
+optimum and a Lagrangian bound, the DP optimum with each player's points cut by a per-club penalty; penalties are
+fitted once, by subgradient descent, so that over-picked clubs lose their appeal. The search starts from the best
+squad ignoring the club limit, greedily repaired to keep to it.
+
+Given a time limit, the branch and bound stops when it runs out and returns the best squad found so far, which
+may fall short of the best there is. Squads with several strong clubs to choose between take the longest.
+
+Batch mode solves one squad per row of a (scenarios x players) matrix of projected points, over a process pool.
+
+E.g.
+players_df = snapshot_table(bootstrap_static, 'players', snapshot_time)
+squad = optimise_squad(players_df, points='ep_next')
+squad.starting, squad.captain, squad.expected_points
+squads = optimise_scenarios(players_df, sampled_points, max_workers=4)
+"""
+
+import collections
+import heapq
+import itertools
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BUDGET = 1000
+MAX_PER_CLUB = 3
+SQUAD_QUOTAS = {1: 2, 2: 5, 3: 5, 4: 3}  # element_type -> players in the squad, GKP / DEF / MID / FWD
+STARTING_RANGES = {1: (1, 1), 2: (3, 5), 3: (2, 5), 4: (1, 3)}  # element_type -> (min, max) starters
+STARTING_SIZE = 11
+
+# added to a forced player's points so that the DP takes him whenever it can
+_FORCED_BONUS = 1e4
+_PENALTY_ITERATIONS = 15
+_MAX_TABLES = 256  # position DP tables cached per solve
+_TOLERANCE = 1e-6
+
+
+class Squad(typing.NamedTuple):
+    players: typing.Tuple[int, ...]  # player ids, by position
+    starting: typing.Tuple[int, ...]
+    captain: typing.Optional[int]
+    cost: int
+    expected_points: float  # starting XI + captain + bench_weight x bench
+
+
+class _Problem(typing.NamedTuple):
+    teams: np.ndarray
+    positions: np.ndarray
+    costs: np.ndarray
+    budget: int
+    bench_weight: float
+    captain: bool
+    time_limit: typing.Optional[float] = None
+
+
+def _undominated(teams: np.ndarray, costs: np.ndarray, points: np.ndarray, quota: int) -> np.ndarray:
+    """Mask of the players of one position that some optimal squad may need.
+
+    A player is dropped if he has enough dominators, players as cheap and as good (ties broken by cost, points,
+    then order), that one is always free to replace him: at least 3 from his own club, which his squad mates can't
+    fill, or at least quota not counting those of the 4 other clubs that 14 squad mates could fill.
+    """
+    n_players = len(costs)
+    order = np.empty(n_players, dtype=np.int64)
+    order[np.lexsort((-points, costs))] = np.arange(n_players)
+    dominates = (costs[:, None] <= costs) & (points[:, None] >= points) & (order[:, None] < order)
+
+    clubs, club = np.unique(teams, return_inverse=True)
+    club_dominators = dominates.T.astype(np.int64) @ (club[:, None] == np.arange(len(clubs)))
+    same_club = club_dominators[np.arange(n_players), club]
+    club_dominators[np.arange(n_players), club] = 0
+
+    full_clubs = (sum(SQUAD_QUOTAS.values()) - 1) // MAX_PER_CLUB
+    other_clubs = np.sort(club_dominators, axis=1)[:, :-full_clubs].sum(axis=1)
+    return (same_club + other_clubs < quota) & (same_club < min(quota, MAX_PER_CLUB))
+
+
+def _empty_values(quota: int, starting_range: typing.Tuple[int, int], width: int) -> np.ndarray:
+    """One position's DP before any player: (starters, bench, captain, cost) -> best value, -inf if impossible."""
+    low, high = starting_range
+    values = np.full((high + 1, quota - low + 1, 2, width), -np.inf)
+    values[0, 0, 0, 0] = 0
+    return values
+
+
+def _knapsack(values: np.ndarray, costs: np.ndarray, points: np.ndarray, bonus: np.ndarray, bench_weight: float,
+              captain: bool) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Extends a position's DP by players one at a time, each skipped, started, captained or benched.
+
+    bonus is added to a player's value once, in whatever role he is picked. Players costing the DP's width or
+    more are never picked.
+
+    :return: (new values, the DP's choice per player and state: 0 skipped, 1 starts, 2 captain, 3 bench)
+    """
+    width = values.shape[3]
+    choices = np.zeros((len(costs),) + values.shape, dtype=np.int8)
+    for i, (cost, player_points, player_bonus) in enumerate(zip(costs, points, bonus)):
+        if cost >= width:
+            continue
+        moves = [(np.s_[1:, :, :, cost:], values[:-1, :, :, :width - cost] + player_points + player_bonus),
+                 (np.s_[1:, :, 1, cost:], values[:-1, :, 0, :width - cost] + 2 * player_points + player_bonus),
+                 (np.s_[:, 1:, :, cost:], values[:, :-1, :, :width - cost] + bench_weight * player_points +
+                  player_bonus)]
+        new_values = values.copy()
+        for choice, (target, candidates) in enumerate(moves, start=1):
+            if choice == 2 and not captain:
+                continue
+            better = candidates > new_values[target]
+            np.copyto(new_values[target], candidates, where=better)
+            np.copyto(choices[i][target], choice, where=better)
+        values = new_values
+    return values, choices
+
+
+def _table(values: np.ndarray, quota: int, starting_range: typing.Tuple[int, int]) -> np.ndarray:
+    """Best value of exactly quota players by starters, captain and cost, shape (max starters + 1, 2, width)."""
+    low, high = starting_range
+    table = np.full((high + 1,) + values.shape[2:], -np.inf)
+    for n_starting in range(low, high + 1):
+        table[n_starting] = values[n_starting, quota - n_starting]
+    return table
+
+
+def _merge(a: np.ndarray, b: np.ndarray, width: int) -> np.ndarray:
+    """Max-plus convolution of two (starters, captain, cost) tables, keeping costs below width.
+
+    States of a no better than a cheaper one with the same starters and captain are skipped: whatever they add up
+    to with b, that cheaper state adds up to at least as much for less. So the merged value at a cost may fall short
+    of the best there, but never short of the best at that cost or less, which is all the solver looks for.
+    """
+    merged = np.full((a.shape[0] + b.shape[0] - 1, 2, width), -np.inf)
+    for n_starting, captains in itertools.product(range(a.shape[0]), range(2)):
+        row = a[n_starting, captains, :width]
+        best_cheaper = np.concatenate([[-np.inf], np.maximum.accumulate(row)[:-1]])
+        for cost in np.flatnonzero(row > best_cheaper):
+            n_costs = min(b.shape[2], width - cost)
+            target = merged[n_starting:n_starting + b.shape[0], captains:, cost:cost + n_costs]
+            np.maximum(target, row[cost] + b[:, :2 - captains, :n_costs], out=target)
+    return merged
+
+
+def _split(a: np.ndarray, b: np.ndarray,
+           state: typing.Tuple[int, int, int]) -> typing.Tuple[typing.Tuple, typing.Tuple]:
+    """States of a and b whose values add up to the best value of state in _merge(a, b)."""
+    n_starting, captains, cost = state
+    best, best_states = -np.inf, None
+    for a_starting, a_captains in itertools.product(range(a.shape[0]), range(captains + 1)):
+        b_starting = n_starting - a_starting
+        if not 0 <= b_starting < b.shape[0]:
+            continue
+        a_costs = np.arange(max(0, cost - b.shape[2] + 1), min(cost, a.shape[2] - 1) + 1)
+        totals = a[a_starting, a_captains, a_costs] + b[b_starting, captains - a_captains, cost - a_costs]
+        if len(totals) and totals.max() > best:
+            a_cost = a_costs[np.argmax(totals)]
+            best = totals.max()
+            best_states = (a_starting, a_captains, a_cost), (b_starting, captains - a_captains, cost - a_cost)
+    return best_states
+
+
+def _backtrack(choices: np.ndarray, costs: np.ndarray, quota: int,
+               state: typing.Tuple[int, int, int]) -> typing.Tuple[typing.List[int], typing.List[int], int]:
+    """Indexes of the players, starters and captain (-1 if none) behind the final state of a position's DP."""
+    n_starting, captains, cost = state
+    n_bench = quota - n_starting
+    picked, starting, captain = [], [], -1
+    for i in range(len(costs) - 1, -1, -1):
+        choice = choices[i, n_starting, n_bench, captains, cost]
+        if choice == 0:
+            continue
+        picked.append(i)
+        cost -= costs[i]
+        if choice == 3:
+            n_bench -= 1
+            continue
+        starting.append(i)
+        n_starting -= 1
+        if choice == 2:
+            captain, captains = i, 0
+    return picked, starting, captain
+
+
+class _Relaxed(typing.NamedTuple):
+    bound: float  # no squad keeping to the club limit and the node's forced / excluded players scores more
+    value: float  # expected points of this squad
+    players: typing.List[int]
+    starting: typing.List[int]
+    captain: int
+
+
+class _Solver(object):
+    """Branch and bound for one problem and one projection of points; see the module docstring.
+
+    Players of heavy clubs, the ones the bound has had to branch on or penalise, come last in each position's DP,
+    so the DP over everyone else is only run once.
+    """
+
+    def __init__(self, problem: _Problem, points: np.ndarray, pools: typing.Dict[int, np.ndarray]):
+        self.problem = problem
+        self.points = points
+        self.pools = pools
+        _, self.clubs = np.unique(problem.teams, return_inverse=True)
+        self.n_clubs = self.clubs.max() + 1
+        self.heavy = frozenset()
+        self.prefixes = dict()
+        self.tables = dict()
+        self.merges = dict()  # (key of one position's table, key of another's) -> their _merge
+        self.deadline = None  # perf_counter time the search stops at, with a time limit
+
+        # each position's cost can't take up what the cheapest players of the other positions need
+        cheapest = {position: np.sort(problem.costs[pool])[:SQUAD_QUOTAS[position]].sum()
+                    for position, pool in pools.items()}
+        self.widths = {position: min(problem.budget - sum(cheapest.values()) + cheapest[position],
+                                     np.sort(problem.costs[pool])[-SQUAD_QUOTAS[position]:].sum()) + 1
+                       for position, pool in pools.items()}
+
+    def _add_heavy(self, clubs: typing.Iterable[int]):
+        heavy = self.heavy.union(int(club) for club in clubs)
+        if heavy != self.heavy:
+            self.heavy = heavy
+            self.tables.clear()
+            self.merges.clear()
+
+    def _position(self, position: int, forced: typing.FrozenSet[int], excluded: typing.FrozenSet[int],
+                  penalties: np.ndarray) -> typing.Tuple[typing.Tuple, np.ndarray, np.ndarray, np.ndarray]:
+        """(key, table, players in DP order, choices) of a position; tables with the same key are the same."""
+        problem, pool = self.problem, self.pools[position]
+        quota, starting_range, width = SQUAD_QUOTAS[position], STARTING_RANGES[position], self.widths[position]
+
+        if (position, self.heavy) not in self.prefixes:
+            is_heavy = np.isin(self.clubs[pool], list(self.heavy))
+            light = pool[~is_heavy]
+            values, choices = _knapsack(_empty_values(quota, starting_range, width), problem.costs[light],
+                                        self.points[light], np.zeros(len(light)), problem.bench_weight,
+                                        problem.captain)
+            self.prefixes[position, self.heavy] = np.concatenate([light, pool[is_heavy]]), values, choices
+        order, values, prefix_choices = self.prefixes[position, self.heavy]
+
+        heavy = order[len(prefix_choices):]
+        key = (position, forced.intersection(heavy.tolist()), excluded.intersection(heavy.tolist()),
+               penalties[self.clubs[heavy]].tobytes())
+        if key not in self.tables:
+            if len(self.tables) > _MAX_TABLES:
+                self.tables.clear()
+                self.merges.clear()
+            costs = np.where(np.isin(heavy, list(excluded)), width, problem.costs[heavy])
+            bonus = np.where(np.isin(heavy, list(forced)), _FORCED_BONUS, 0) - penalties[self.clubs[heavy]]
+            values, choices = _knapsack(values, costs, self.points[heavy], bonus, problem.bench_weight,
+                                        problem.captain)
+            self.tables[key] = _table(values, quota, starting_range), np.concatenate([prefix_choices, choices])
+        return (key, self.tables[key][0], order, self.tables[key][1])
+
+    def _merged(self, a: tuple, b: tuple) -> np.ndarray:
+        """_merge of two positions' tables, as returned by _position, cached by their keys."""
+        key = (a[0], b[0])
+        if key not in self.merges:
+            self.merges[key] = _merge(a[1], b[1], self.problem.budget + 1)
+        return self.merges[key]
+
+    def relaxed(self, forced: typing.FrozenSet[int], excluded: typing.FrozenSet[int],
+                penalties: np.ndarray) -> typing.Optional[_Relaxed]:
+        """Best squad ignoring the club limit, with forced players in, excluded players out, and each player
+        penalised by his club's penalty; None if no squad fits the budget."""
+        problem = self.problem
+        positions = {position: self._position(position, forced, excluded, penalties) for position in self.pools}
+        goalkeepers_forwards = self._merged(positions[1], positions[4])
+        outfield = self._merged(positions[2], positions[3])
+
+        # best split of the starters, captain and budget between the two halves
+        captains = int(problem.captain)
+        best_outfield = np.maximum.accumulate(outfield, axis=2)
+        best, best_state = -np.inf, None
+        for n_starting, a_captains in itertools.product(range(goalkeepers_forwards.shape[0]), range(captains + 1)):
+            b_starting = STARTING_SIZE - n_starting
+            if not 0 <= b_starting < outfield.shape[0]:
+                continue
+            totals = goalkeepers_forwards[n_starting, a_captains] + \
+                best_outfield[b_starting, captains - a_captains, ::-1][:goalkeepers_forwards.shape[2]]
+            if totals.max() > best:
+                best, best_state = totals.max(), (n_starting, a_captains, int(np.argmax(totals)))
+
+        best -= _FORCED_BONUS * len(forced)
+        if not np.isfinite(best) or best < -_FORCED_BONUS / 2:
+            return None
+
+        n_starting, a_captains, a_cost = best_state
+        b_state = (STARTING_SIZE - n_starting, captains - a_captains)
+        b_cost = int(np.flatnonzero(outfield[b_state] == best_outfield[b_state][problem.budget - a_cost])[0])
+
+        players, starting, captain = [], [], -1
+        for (a, b), state in (((1, 4), best_state), ((2, 3), b_state + (b_cost,))):
+            for position, position_state in zip((a, b), _split(positions[a][1], positions[b][1], state)):
+                _, _, order, choices = positions[position]
+                picked, position_starting, position_captain = _backtrack(choices, problem.costs[order],
+                                                                         SQUAD_QUOTAS[position], position_state)
+                players += order[picked].tolist()
+                starting += order[position_starting].tolist()
+                captain = order[position_captain] if position_captain >= 0 else captain
+
+        # every squad keeping to the club limit gets back at least MAX_PER_CLUB x each club's penalty
+        return _Relaxed(bound=best + MAX_PER_CLUB * penalties.sum(), value=best + penalties[self.clubs[players]].sum(),
+                        players=players, starting=starting, captain=captain)
+
+    def _excess(self, squad: _Relaxed) -> np.ndarray:
+        return np.bincount(self.clubs[squad.players], minlength=self.n_clubs) - MAX_PER_CLUB
+
+    def _repaired(self, squad: _Relaxed) -> typing.Optional[_Relaxed]:
+        """squad made to keep to the club limit greedily, by swapping players of over-picked clubs, one at a time, for
+        players of the same position, the swap costing the fewest points in the player's role first; then the best of
+        each position start, in the same formation, and the best starter captains. None if no swap is possible.
+        """
+        problem, points = self.problem, self.points
+        players, starting = list(squad.players), set(squad.starting)
+        spare = problem.budget - problem.costs[players].sum()
+        counts = np.bincount(self.clubs[players], minlength=self.n_clubs)
+        while counts.max() > MAX_PER_CLUB:
+            best_swap = None
+            for i in players:
+                if counts[self.clubs[i]] <= MAX_PER_CLUB:
+                    continue
+                pool = self.pools[problem.positions[i]]
+                pool = pool[(counts[self.clubs[pool]] < MAX_PER_CLUB) & ~np.isin(pool, players) &
+                            (problem.costs[pool] <= problem.costs[i] + spare)]
+                if not len(pool):
+                    continue
+                replacement = pool[np.argmax(points[pool])]
+                weight = 2 if i == squad.captain else 1 if i in starting else problem.bench_weight
+                loss = weight * (points[i] - points[replacement])
+                if best_swap is None or loss < best_swap[0]:
+                    best_swap = loss, i, replacement
+            if best_swap is None:
+                return None
+
+            _, i, replacement = best_swap
+            players[players.index(i)] = replacement
+            spare += problem.costs[i] - problem.costs[replacement]
+            counts[self.clubs[i]] -= 1
+            counts[self.clubs[replacement]] += 1
+
+        formation = collections.Counter(problem.positions[list(starting)].tolist())
+        new_starting = []
+        for position, n_starting in formation.items():
+            members = [i for i in players if problem.positions[i] == position]
+            new_starting += sorted(members, key=lambda i: -points[i])[:n_starting]
+        captain = max(new_starting, key=lambda i: points[i]) if squad.captain >= 0 else -1
+        bench = [i for i in players if i not in new_starting]
+        value = points[new_starting].sum() + problem.bench_weight * points[bench].sum() + \
+            (points[captain] if captain >= 0 else 0)
+        return _Relaxed(bound=squad.bound, value=value, players=players, starting=new_starting, captain=captain)
+
+    def _out_of_time(self) -> bool:
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def _penalties(self, root: _Relaxed,
+                   incumbent: typing.Optional[_Relaxed]) -> typing.Tuple[np.ndarray, typing.Optional[_Relaxed]]:
+        """Club penalties that (about) minimise the bound, by subgradient descent with Polyak steps, and the best
+        squad keeping to the club limit seen along the way, or incumbent if none is better."""
+        penalties = best_penalties = np.zeros(self.n_clubs)
+        squad, best_bound = root, root.bound
+        step_scale, stalled = 1.0, 0
+        for _ in range(_PENALTY_ITERATIONS):
+            if self._out_of_time():
+                break
+            excess = self._excess(squad)
+            if excess.max() <= 0 and (incumbent is None or squad.value > incumbent.value):
+                incumbent = squad
+            excess[(penalties <= 0) & (excess < 0)] = 0
+            target = incumbent.value if incumbent is not None else squad.bound - 0.05 * abs(squad.bound)
+            if not excess.any() or best_bound - target < _TOLERANCE:
+                break
+
+            penalties = np.maximum(0, penalties + step_scale * (squad.bound - target) / (excess @ excess) * excess)
+            self._add_heavy(np.flatnonzero(penalties))
+            squad = self.relaxed(frozenset(), frozenset(), penalties)
+            if squad.bound < best_bound - _TOLERANCE:
+                best_bound, best_penalties, stalled = squad.bound, penalties, 0
+            else:
+                stalled += 1
+                if stalled == 2:
+                    step_scale, stalled = step_scale / 2, 0
+        return best_penalties, incumbent
+
+    def solve(self) -> typing.Optional[_Relaxed]:
+        if self.problem.time_limit is not None:
+            self.deadline = time.perf_counter() + self.problem.time_limit
+        no_penalties = np.zeros(self.n_clubs)
+        root = self.relaxed(frozenset(), frozenset(), no_penalties)
+        if root is None or self._excess(root).max() <= 0:
+            return root
+
+        self._add_heavy(np.flatnonzero(self._excess(root) > 0))
+        penalties, incumbent = self._penalties(root, self._repaired(root))
+
+        # best first over nodes, each bounded by the lower of the plain and penalised relaxations
+        heap, counter = [], itertools.count()
+
+        def push(forced, excluded):
+            nonlocal incumbent
+            squad = self.relaxed(forced, excluded, no_penalties)
+            if squad is None:
+                return
+            if self._excess(squad).max() <= 0:
+                if incumbent is None or squad.value > incumbent.value:
+                    incumbent = squad
+                return
+            # the penalised relaxation is only worth running on nodes the plain one leaves open
+            if incumbent is not None and squad.bound <= incumbent.value + _TOLERANCE:
+                return
+            penalised = self.relaxed(forced, excluded, penalties)
+            if self._excess(penalised).max() <= 0 and (incumbent is None or penalised.value > incumbent.value):
+                incumbent = penalised
+            bound = min(squad.bound, penalised.bound)
+            if incumbent is None or bound > incumbent.value + _TOLERANCE:
+                heapq.heappush(heap, (-bound, next(counter), forced, excluded, squad))
+
+        push(frozenset(), frozenset())
+        while heap:
+            negative_bound, _, forced, excluded, squad = heapq.heappop(heap)
+            if incumbent is not None and (-negative_bound <= incumbent.value + _TOLERANCE or self._out_of_time()):
+                break
+
+            # at most MAX_PER_CLUB of the club's players can be picked: branch on the first one left out
+            excess = self._excess(squad)
+            club = int(np.argmax(excess))
+            self._add_heavy([club])
+            members = sorted((i for i in squad.players if self.clubs[i] == club),
+                             key=lambda i: (i not in forced, -self.points[i]))
+            for n_in in range(MAX_PER_CLUB + 1):
+                if members[n_in] in forced:
+                    continue
+                child_forced = forced.union(members[:n_in])
+                child_excluded = excluded.union([members[n_in]])
+                if sum(self.clubs[i] == club for i in child_forced) == MAX_PER_CLUB:
+                    child_excluded = child_excluded.union(set(np.flatnonzero(self.clubs == club).tolist()) -
+                                                          child_forced)
+                push(child_forced, child_excluded)
+        return incumbent
+
+
+def _solve(problem: _Problem, points: np.ndarray) -> typing.Optional[_Relaxed]:
+    """Best squad with the club limit, as indexes into the problem's players; None if no squad is possible."""
+    pools = dict()
+    for position, quota in SQUAD_QUOTAS.items():
+        pool = np.flatnonzero((problem.positions == position) & ~np.isnan(points))
+        pools[position] = pool[_undominated(problem.teams[pool], problem.costs[pool], points[pool], quota)]
+        if len(pools[position]) < quota:
+            return None
+
+    cheapest = sum(np.sort(problem.costs[pool])[:SQUAD_QUOTAS[position]].sum() for position, pool in pools.items())
+    if cheapest > problem.budget:
+        return None
+    return _Solver(problem, points, pools).solve()
+
+
+def _problem(players_df: pd.DataFrame, budget: int, bench_weight: float, captain: bool,
+             time_limit: typing.Optional[float]) -> _Problem:
+    return _Problem(teams=players_df.team.to_numpy(dtype=np.int64),
+                    positions=players_df.element_type.to_numpy(dtype=np.int64),
+                    costs=players_df.now_cost.to_numpy(dtype=np.int64),
+                    budget=budget, bench_weight=bench_weight, captain=captain, time_limit=time_limit)
+
+
+def _squad(ids: np.ndarray, problem: _Problem, solution: _Relaxed) -> Squad:
+    players = sorted(solution.players, key=lambda i: problem.positions[i])
+    starting = sorted(solution.starting, key=lambda i: problem.positions[i])
+    return Squad(players=tuple(ids[players].tolist()), starting=tuple(ids[starting].tolist()),
+                 captain=int(ids[solution.captain]) if solution.captain >= 0 else None,
+                 cost=int(problem.costs[solution.players].sum()), expected_points=float(solution.value))
+
+
+def optimise_squad(players_df: pd.DataFrame, points: str = 'ep_next', budget: int = BUDGET,
+                   bench_weight: float = 0.1, captain: bool = True,
+                   time_limit: typing.Optional[float] = None) -> typing.Optional[Squad]:
+    """Squad and starting XI with the most expected points.
+
+    :param players_df: one row per player with id, team, element_type and now_cost columns, e.g. the players
+    snapshot table or bootstrap-static elements
+    :param points: column of expected points, e.g. ep_next or form; players without a value aren't picked
+    :param budget: most the squad can cost, in now_cost units
+    :param bench_weight: worth of a bench player's expected points relative to a starter's
+    :param captain: whether the best starter's points count twice
+    :param time_limit: seconds to search for, after which the best squad found so far is returned; None to search
+    until the best squad is found. The search carries on past the limit until it has found some squad
+    :return: the best squad, or None if no squad fits the budget
+    """
+    problem = _problem(players_df, budget, bench_weight, captain, time_limit)
+    solution = _solve(problem, pd.to_numeric(players_df[points], errors='coerce').to_numpy(dtype=float))
+    return None if solution is None else _squad(players_df.id.to_numpy(), problem, solution)
+
+
+def _solve_chunk(problem: _Problem, scenario_points: np.ndarray) -> typing.List:
+    return [_solve(problem, points) for points in scenario_points]
+
+
+def optimise_scenarios(players_df: pd.DataFrame, scenario_points: np.ndarray, budget: int = BUDGET,
+                       bench_weight: float = 0.1, captain: bool = True, max_workers: int = None,
+                       chunk_size: int = 50, time_limit: typing.Optional[float] = None
+                       ) -> typing.List[typing.Optional[Squad]]:
+    """Best squad for each of many projections of players' points, e.g. draws from a points model.
+
+    :param players_df: as for optimise_squad
+    :param scenario_points: (scenarios x players) expected points, columns in players_df's row order
+    :param budget: as for optimise_squad
+    :param bench_weight: as for optimise_squad
+    :param captain: as for optimise_squad
+    :param max_workers: processes to solve chunks of scenarios in, by default one per CPU; 1 runs in this process
+    :param chunk_size: scenarios sent to a process at a time
+    :param time_limit: as for optimise_squad, per scenario
+    :return: best squad per scenario, in order
+    """
+    problem = _problem(players_df, budget, bench_weight, captain, time_limit)
+    scenario_points = np.asarray(scenario_points, dtype=float)
+    chunks = [scenario_points[start:start + chunk_size] for start in range(0, len(scenario_points), chunk_size)]
+
+    if max_workers == 1 or len(chunks) <= 1:
+        solutions = [_solve_chunk(problem, chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            solutions = list(executor.map(_solve_chunk, itertools.repeat(problem), chunks))
+
+    ids = players_df.id.to_numpy()
+    return [None if solution is None else _squad(ids, problem, solution)
+            for solution in itertools.chain.from_iterable(solutions)]
@@ -0,0 +1,310 @@
+"""Plans FPL transfers over the next few gameweeks, trading free transfers and -4 hits against projected points.
+
+Players' points are projected per gameweek from a fixture neutral rate, e.g. form, scaled by the difficulty of
+each of their team's fixtures that gameweek: (own strength / opponent's strength) ** difficulty_weight, using
+the teams' attack and defence strengths at the right grounds. Goalkeepers and defenders are scored on their
+team's defence against the opponent's attack, midfielders and forwards the other way round. Teams without a
+fixture score nothing, teams with two score twice.
+
+The planner searches transfer sequences depth first, memoising the best plan from each (squad, bank, free
+transfers, gameweek) state, so orders of transfers that end up in the same place are only searched once. Each
+state only tries rolling the transfer and its beam_width most promising moves of up to max_transfers transfers,
+ranked by the points the players in and out are projected to score over the rest of the horizon, less hits.
+Beams are widened from 1 up to beam_width until the time budget runs out, and the best plan of the widest search
+that finished is returned; the first gameweek's moves can be searched over a process pool.
+
+Prices are now_cost; the lower selling price of players that have risen since they were bought is ignored.
+
+E.g.
+points_df = project_points(players_df, teams_df, fixtures_df, events=range(5, 11))
+planner = TransferPlanner(players_df, points_df, beam_width=8, time_budget=2.0)
+plan = planner.plan(squad_ids, bank=5, free_transfers=1)
+plan.transfers  # (out id, in id) pairs per gameweek
+"""
+
+import itertools
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analytics.squad_optimizer import MAX_PER_CLUB, SQUAD_QUOTAS, STARTING_RANGES, STARTING_SIZE
+
+HIT_COST = 4
+MAX_FREE_TRANSFERS = 2
+
+# starters per position of each valid formation, columns in element_type order
+FORMATIONS = np.array([counts for counts in itertools.product(*[range(low, high + 1)
+                                                                for low, high in STARTING_RANGES.values()])
+                       if sum(counts) == STARTING_SIZE])
+
+_DEFENDING_POSITIONS = (1, 2)
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class Plan(typing.NamedTuple):
+    transfers: typing.List[typing.List[typing.Tuple[int, int]]]  # (out id, in id) pairs, per gameweek
+    expected_points: float  # lineup points over the horizon, less hits
+    gameweek_points: typing.List[float]  # lineup points per gameweek, before hits
+    hit_points: int  # points spent on hits
+    beam_width: int  # widest beam whose search finished within the time budget; 0 if none did
+
+
+def fixture_multipliers(teams_df: pd.DataFrame, fixtures_df: pd.DataFrame, events: typing.Iterable[int],
+                        difficulty_weight: float = 1.0) -> typing.Dict[str, pd.DataFrame]:
+    """Summed attack and defence multipliers of each team's fixtures in each event.
+
+    :param teams_df: FPL teams with id and strength_{attack, defence}_{home, away} columns
+    :param fixtures_df: FPL fixtures with event, team_h and team_a columns
+    :param events: gameweeks, in order
+    :param difficulty_weight: 0 ignores difficulty, so a fixture is worth 1 whoever it's against
+    :return: {'attack': df, 'defence': df}, each indexed by team id with a column per event; 0 without a fixture
+    """
+    events = list(events)
+    strengths = teams_df.set_index('id')
+    fixtures_df = fixtures_df[fixtures_df.event.isin(events)]
+    multipliers = dict()
+    for aspect, opposite in (('attack', 'defence'), ('defence', 'attack')):
+        sides = []
+        for team, opponent, ground, opponent_ground in (('team_h', 'team_a', 'home', 'away'),
+                                                        ('team_a', 'team_h', 'away', 'home')):
+            own = strengths[f'strength_{aspect}_{ground}'].reindex(fixtures_df[team]).to_numpy(dtype=float)
+            against = strengths[f'strength_{opposite}_{opponent_ground}'].reindex(fixtures_df[opponent])\
+                .to_numpy(dtype=float)
+            sides.append(pd.DataFrame({'team': fixtures_df[team].to_numpy(), 'event': fixtures_df.event.to_numpy(),
+                                       'multiplier': (own / against) ** difficulty_weight}))
+        multipliers[aspect] = pd.concat(sides).pivot_table(index='team', columns='event', values='multiplier',
+                                                           aggfunc='sum')\
+            .reindex(index=strengths.index, columns=events, fill_value=0).fillna(0)
+    return multipliers
+
+
+def project_points(players_df: pd.DataFrame, teams_df: pd.DataFrame, fixtures_df: pd.DataFrame,
+                   events: typing.Iterable[int], points: str = 'form', difficulty_weight: float = 1.0
+                   ) -> pd.DataFrame:
+    """Projected points of each player in each event: points per fixture x fixture multipliers.
+
+    :param players_df: FPL players with id, team and element_type columns
+    :param teams_df: as for fixture_multipliers
+    :param fixtures_df: as for fixture_multipliers
+    :param events: as for fixture_multipliers
+    :param points: fixture neutral points per match column, e.g. form or points_per_game
+    :param difficulty_weight: as for fixture_multipliers
+    :return: df indexed by player id with a column per event
+    """
+    multipliers = fixture_multipliers(teams_df, fixtures_df, events, difficulty_weight)
+    is_defending = players_df.element_type.isin(_DEFENDING_POSITIONS).to_numpy()[:, None]
+    team_multipliers = np.where(is_defending, multipliers['defence'].reindex(players_df.team).to_numpy(),
+                                multipliers['attack'].reindex(players_df.team).to_numpy())
+    rates = pd.to_numeric(players_df[points], errors='coerce').fillna(0).to_numpy(dtype=float)
+    return pd.DataFrame(rates[:, None] * team_multipliers, index=players_df.id.to_numpy(),
+                        columns=multipliers['attack'].columns)
+
+
+def lineup_points(squad_points: np.ndarray, bench_weight: float = 0.1) -> np.ndarray:
+    """Best starting XI's points plus the captain's again plus bench_weight x the bench's, for many squads.
+
+    :param squad_points: (squads x 15) points, columns grouped by position as in SQUAD_QUOTAS
+    :param bench_weight: as for squad_optimizer.optimise_squad
+    :return: points per squad
+    """
+    column = 0
+    by_position = []
+    for quota in SQUAD_QUOTAS.values():
+        block = -np.sort(-squad_points[:, column:column + quota], axis=1)
+        by_position.append(np.concatenate([np.zeros((len(block), 1)), np.cumsum(block, axis=1)], axis=1))
+        column += quota
+    starters = np.max(sum(position_sums[:, FORMATIONS[:, i]] for i, position_sums in enumerate(by_position)),
+                      axis=1)
+    # every position has a starter, so the best player in the squad always starts and is captain
+    return (1 - bench_weight) * starters + bench_weight * squad_points.sum(axis=1) + squad_points.max(axis=1)
+
+
+class TransferPlanner(object):
+    """Beam searched, memoised transfer planning; see the module docstring.
+
+    :param players_df: FPL players with id, team, element_type and now_cost columns
+    :param points_df: projected points indexed by player id with a column per gameweek, e.g. from project_points;
+    players missing from it are never bought
+    :param beam_width: moves besides rolling tried from each state, at the widest
+    :param max_transfers: most transfers made in one gameweek, 1 or 2
+    :param n_candidates: players per position considered for buying, the best projected over the rest of the horizon
+    :param bench_weight: as for squad_optimizer.optimise_squad
+    :param time_budget: seconds plan may take, roughly
+    :param max_workers: processes searching the first gameweek's moves; 1 searches in this process
+    """
+
+    def __init__(self, players_df: pd.DataFrame, points_df: pd.DataFrame, beam_width: int = 8,
+                 max_transfers: int = 2, n_candidates: int = 15, bench_weight: float = 0.1,
+                 time_budget: float = 1.0, max_workers: int = 1):
+        self.beam_width = beam_width
+        self.max_transfers = max_transfers
+        self.bench_weight = bench_weight
+        self.time_budget = time_budget
+        self.max_workers = max_workers
+
+        # players ordered by position, so a squad's sorted indexes are grouped by position
+        players_df = players_df[players_df.element_type.isin(SQUAD_QUOTAS)].sort_values(['element_type', 'id'])
+        self.ids = players_df.id.to_numpy()
+        self.positions = players_df.element_type.to_numpy()
+        _, self.clubs = np.unique(players_df.team.to_numpy(), return_inverse=True)
+        self.n_clubs = self.clubs.max() + 1
+        self.costs = players_df.now_cost.to_numpy(dtype=np.int64)
+        self.points = points_df.reindex(self.ids).fillna(0).to_numpy(dtype=float)
+        self.events = list(points_df.columns)
+
+        # points still to come from each gameweek on, and the players worth buying in each gameweek
+        self.remaining = np.cumsum(self.points[:, ::-1], axis=1)[:, ::-1]
+        buyable = np.isin(self.ids, points_df.index)
+        self.candidates = [{position: np.flatnonzero(buyable & (self.positions == position))[
+                               np.argsort(-self.remaining[buyable & (self.positions == position), gameweek],
+                                          kind='stable')[:n_candidates]]
+                            for position in SQUAD_QUOTAS}
+                           for gameweek in range(len(self.events))]
+
+    def _moves(self, squad: typing.Tuple[int, ...], bank: int, free_transfers: int, gameweek: int,
+               width: int) -> typing.List[typing.Tuple[typing.Tuple[int, ...], typing.Tuple[int, ...]]]:
+        """The width most promising (players out, players in) moves of 1 to max_transfers transfers."""
+        squad_array = np.array(squad)
+        club_counts = np.bincount(self.clubs[squad_array], minlength=self.n_clubs)
+        remaining = self.remaining[:, gameweek]
+
+        # every swap of a squad player for a candidate of the same position that the bank and club limit allow
+        outs, ins = [], []
+        for position, candidates in self.candidates[gameweek].items():
+            position_outs = squad_array[self.positions[squad_array] == position]
+            outs.append(np.repeat(position_outs, len(candidates)))
+            ins.append(np.tile(candidates, len(position_outs)))
+        outs, ins = np.concatenate(outs), np.concatenate(ins)
+        allowed = ~np.isin(ins, squad_array) & (self.costs[ins] <= bank + self.costs[outs]) & \
+            ((self.clubs[ins] == self.clubs[outs]) | (club_counts[self.clubs[ins]] < MAX_PER_CLUB))
+        gains = remaining[ins[allowed]] - remaining[outs[allowed]]
+        best = np.argsort(-gains, kind='stable')[:2 * width]
+        outs, ins, gains = outs[allowed][best], ins[allowed][best], gains[best]
+
+        moves = [((out,), (player,)) for out, player in zip(outs.tolist(), ins.tolist())]
+        scores = [gains - HIT_COST * max(0, 1 - free_transfers)]
+        if self.max_transfers >= 2:
+            a, b = np.triu_indices(len(outs), 1)
+            allowed = (outs[a] != outs[b]) & (ins[a] != ins[b]) & \
+                (self.costs[ins[a]] + self.costs[ins[b]] <= bank + self.costs[outs[a]] + self.costs[outs[b]])
+            for club in (self.clubs[ins[a]], self.clubs[ins[b]]):
+                allowed &= club_counts[club] + (self.clubs[ins[a]] == club) + (self.clubs[ins[b]] == club) - \
+                    (self.clubs[outs[a]] == club) - (self.clubs[outs[b]] == club) <= MAX_PER_CLUB
+            a, b = a[allowed], b[allowed]
+            moves += [((out_a, out_b), (in_a, in_b)) for out_a, out_b, in_a, in_b in
+                      zip(outs[a].tolist(), outs[b].tolist(), ins[a].tolist(), ins[b].tolist())]
+            scores.append(gains[a] + gains[b] - HIT_COST * max(0, 2 - free_transfers))
+
+        best = np.argsort(-np.concatenate(scores), kind='stable')[:width]
+        return [moves[i] for i in best]
+
+    def _search(self, squad: typing.Tuple[int, ...], bank: int, free_transfers: int, gameweek: int, width: int,
+                memo: typing.Dict, deadline: float) -> typing.Tuple[float, typing.Tuple]:
+        """Best (points, moves) from a state to the end of the horizon; moves is one (outs, ins) pair per week."""
+        if gameweek == len(self.events):
+            return 0.0, ()
+        key = (squad, bank, free_transfers, gameweek)
+        if key in memo:
+            return memo[key]
+        if time.monotonic() > deadline:
+            raise _OutOfTime()
+
+        options = [((), ())] + self._moves(squad, bank, free_transfers, gameweek, width)
+        squads = [tuple(sorted(set(squad).difference(outs).union(ins))) for outs, ins in options]
+        week_points = lineup_points(self.points[np.array(squads), gameweek], self.bench_weight)
+
+        best = (-np.inf, ())
+        for (outs, ins), new_squad, points in zip(options, squads, week_points):
+            n_transfers = len(outs)
+            new_bank = bank + int(self.costs[list(outs)].sum() - self.costs[list(ins)].sum())
+            next_free = min(MAX_FREE_TRANSFERS, max(0, free_transfers - n_transfers) + 1)
+            future, future_moves = self._search(new_squad, new_bank, next_free, gameweek + 1, width, memo, deadline)
+            total = points - HIT_COST * max(0, n_transfers - free_transfers) + future
+            if total > best[0]:
+                best = (total, ((outs, ins),) + future_moves)
+        memo[key] = best
+        return best
+
+    def _widen(self, squad: typing.Tuple[int, ...], bank: int, free_transfers: int, gameweek: int,
+               deadline: float) -> typing.Tuple[typing.Optional[typing.Tuple[float, typing.Tuple]], int]:
+        """Best (points, moves) of the widest beam searched from a state before the deadline, and its width."""
+        best, best_width = None, 0
+        width = 1
+        while True:
+            try:
+                best = self._search(squad, bank, free_transfers, gameweek, width, dict(), deadline)
+                best_width = width
+            except _OutOfTime:
+                break
+            if width >= self.beam_width:
+                break
+            width = min(2 * width, self.beam_width)
+        return best, best_width
+
+    def _plan(self, squad: typing.Tuple[int, ...], free_transfers: int, moves: typing.Sequence,
+              beam_width: int) -> Plan:
+        transfers, gameweek_points, hit_points = [], [], 0
+        for gameweek, (outs, ins) in enumerate(moves):
+            squad = tuple(sorted(set(squad).difference(outs).union(ins)))
+            transfers.append([(int(self.ids[out]), int(self.ids[player])) for out, player in zip(outs, ins)])
+            gameweek_points.append(float(lineup_points(self.points[np.array([squad]), gameweek],
+                                                       self.bench_weight)[0]))
+            hit_points += HIT_COST * max(0, len(outs) - free_transfers)
+            free_transfers = min(MAX_FREE_TRANSFERS, max(0, free_transfers - len(outs)) + 1)
+        return Plan(transfers=transfers, expected_points=sum(gameweek_points) - hit_points,
+                    gameweek_points=gameweek_points, hit_points=hit_points, beam_width=beam_width)
+
+    def plan(self, squad_ids: typing.Iterable[int], bank: int, free_transfers: int = 1) -> Plan:
+        """Best transfer plan found within the time budget; rolling every transfer if no search finished.
+
+        :param squad_ids: ids of the 15 players in the squad now
+        :param bank: money in the bank, in now_cost units
+        :param free_transfers: free transfers available for the first gameweek
+        :return: the plan
+        """
+        deadline = time.monotonic() + self.time_budget
+        squad_ids = list(squad_ids)
+        squad = tuple(sorted(pd.Index(self.ids).get_indexer(squad_ids).tolist()))
+        if min(squad) < 0 or [self.positions[list(squad)].tolist().count(p) for p in SQUAD_QUOTAS] != \
+                list(SQUAD_QUOTAS.values()):
+            raise ValueError(f'Not a squad of known players: {squad_ids}')
+        hold = tuple(((), ()) for _ in self.events)
+
+        if self.max_workers == 1:
+            best, width = self._widen(squad, bank, free_transfers, 0, deadline)
+            return self._plan(squad, free_transfers, best[1] if best else hold, width)
+
+        # each of the first gameweek's moves is searched, beam widening and all, in its own process
+        options = [((), ())] + self._moves(squad, bank, free_transfers, 0, self.beam_width)
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(_search_move, self, squad, bank, free_transfers, outs, ins, deadline)
+                       for outs, ins in options]
+            results = [future.result() for future in futures]
+
+        finished = [(total, moves, width) for total, moves, width in results if moves is not None]
+        if not finished:
+            return self._plan(squad, free_transfers, hold, 0)
+        _, moves, _ = max(finished, key=lambda result: result[0])
+        return self._plan(squad, free_transfers, moves, min(width for _, _, width in finished))
+
+
+def _search_move(planner: TransferPlanner, squad: typing.Tuple[int, ...], bank: int, free_transfers: int,
+                 outs: typing.Tuple[int, ...], ins: typing.Tuple[int, ...], deadline: float):
+    """(points, moves, beam width) of the best plan starting with one first gameweek move; moves is None if no
+    search finished in time."""
+    new_squad = tuple(sorted(set(squad).difference(outs).union(ins)))
+    new_bank = bank + int(planner.costs[list(outs)].sum() - planner.costs[list(ins)].sum())
+    next_free = min(MAX_FREE_TRANSFERS, max(0, free_transfers - len(outs)) + 1)
+    week_points = lineup_points(planner.points[np.array([new_squad]), 0], planner.bench_weight)[0]
+
+    best, width = planner._widen(new_squad, new_bank, next_free, 1, deadline)
+    if best is None:
+        return -np.inf, None, 0
+    total = week_points - HIT_COST * max(0, len(outs) - free_transfers) + best[0]
+    return total, ((outs, ins),) + best[1], width
@@ -19,14 +19,50 @@ Get competition seasons: http://api.football-data.org/v2/competitions/2021
 Get season info:
 """
 
-import requests as rq
 import pandas as pd
 import os
-
-FOOTBALL_DATA_API_KEY = os.environ['FOOTBALL_DATA_API_KEY']
-
-
-def get_season_matches(competition_code, year_start, year_end, season_name):
+import datetime as dt
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_handler.http_cache import cached_get, season_ttl, ResponseCache
+from api_handler.league_table import build_team_match_table, cumulative_table, FOOTBALL_DATA_COLUMNS
+from api_handler.rate_limit import RateLimitedSession, TokenBucket
+from api_handler.schema import apply_dtypes
+import instrumentation
+
+# only needed when requests actually go out, so offline backfills from a cache can run without it
+FOOTBALL_DATA_API_KEY = os.environ.get('FOOTBALL_DATA_API_KEY')
+FOOTBALL_DATA_API_URL = 'http://api.football-data.org/v2/'
+FOOTBALL_DATA_REQUESTS_PER_MINUTE = 10  # free tier quota
+
+
+# dtypes of process_season_matches' match and team-match tables
+MATCH_DTYPES = {
+    'awayTeamName': 'category',
+    'homeTeamName': 'category',
+    'matchId': 'int64',
+    'matchDateTime': 'datetime64[ns]',
+    'homeScore': 'int8',
+    'awayScore': 'int8',
+    'matchDay': 'int8',
+    'season': 'category',
+    'competition': 'category',
+}
+MATCH_COLUMN_DTYPES = {column: MATCH_DTYPES[column] for column in ('matchDay', 'matchId', 'season', 'competition')}
+
+
+class SeasonJob(typing.NamedTuple):
+    """Arguments to get_season_matches for one competition season, e.g. SeasonJob(2021, 2017, 2018, '17-18')."""
+    competition_code: int
+    year_start: int
+    year_end: int
+    season_name: str
+
+
+@instrumentation.timed('football_data.get_season_matches')
+def get_season_matches(competition_code, year_start, year_end, season_name, cache: ResponseCache = None,
+                       offline: bool = False, session: RateLimitedSession = None):
     """Downloads matches from a particular competition and season into a dataframe.
 
     # Common competition codes
@@ -45,14 +81,21 @@ def get_season_matches(competition_code, year_start, year_end, season_name):
     :param year_start: int
     :param year_end: int
     :param season_name: str
+    :param cache: optional ResponseCache; finished seasons are cached forever, the live one for an hour
+    :param offline: serve only from cache, raising ConnectionError for anything not cached
+    :param session: optional (rate limited) session to send the request with, for connection reuse
     :return: df containing all of the competition season match information
     """
-    season_matches_r = rq.get(f'http://api.football-data.org/v2/competitions/{competition_code}/matches/',
-                             params={
-                                 'dateFrom': f'{year_start}-08-01',
-                                 'dateTo': f'{year_end}-05-30'
-                             },
-                             headers={'X-Auth-Token': FOOTBALL_DATA_API_KEY})
+    season_matches_r = cached_get(f'{FOOTBALL_DATA_API_URL}competitions/{competition_code}/matches/',
+                                  params={
+                                      'dateFrom': f'{year_start}-08-01',
+                                      'dateTo': f'{year_end}-05-30'
+                                  },
+                                  headers={'X-Auth-Token': FOOTBALL_DATA_API_KEY},
+                                  cache=cache,
+                                  ttl=season_ttl(dt.date(year_end, 5, 30)),
+                                  offline=offline,
+                                  session=session)
 
     if season_matches_r.status_code != 200:
         print('\n')
@@ -68,6 +111,50 @@ def get_season_matches(competition_code, year_start, year_end, season_name):
     return season_matches_df
 
 
+def football_data_session(requests_per_minute: int = FOOTBALL_DATA_REQUESTS_PER_MINUTE,
+                          pool_size: int = 8) -> RateLimitedSession:
+    """Pooled session that keeps within the football-data per-minute quota and retries 429 / 5xx responses."""
+    return RateLimitedSession(limiter=TokenBucket(requests_per_minute - 1, capacity=1), pool_size=pool_size)
+
+
+def iter_season_matches(jobs: typing.Iterable[SeasonJob], cache: ResponseCache = None, max_workers: int = 4,
+                        session: RateLimitedSession = None) -> typing.Iterator[typing.Tuple[SeasonJob, pd.DataFrame]]:
+    """Downloads many competition seasons concurrently, yielding each one as soon as it has arrived.
+
+    Requests share one pooled, rate limited session, so running more workers than the quota allows only
+    overlaps network latency rather than breaking the quota. Seasons are yielded in completion order.
+
+    E.g. for every Premier League and Champions League season since 2015:
+    jobs = [SeasonJob(c, y, y + 1, f'{y % 100}-{(y + 1) % 100}') for c in (2021, 2001) for y in range(2015, 2019)]
+    for job, season_matches_df in iter_season_matches(jobs, cache=DiskResponseCache('~/.fpl_fun/http_cache')):
+        ...
+
+    :param jobs: SeasonJob (or equivalent tuples) to download
+    :param cache: optional ResponseCache, shared by every job
+    :param max_workers: number of requests in flight at once
+    :param session: session to share, defaults to football_data_session()
+    :return: iterator of (job, season matches df) tuples
+    """
+    session = session or football_data_session(pool_size=max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(get_season_matches, *job, cache=cache, session=session): SeasonJob(*job)
+                   for job in jobs}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def get_seasons_matches(jobs: typing.Iterable[SeasonJob], **kwargs) -> pd.DataFrame:
+    """Downloads many competition seasons concurrently into one dataframe; see iter_season_matches."""
+    return pd.concat([season_matches_df for _, season_matches_df in iter_season_matches(jobs, **kwargs)],
+                     ignore_index=True, sort=False)
+
+
+@instrumentation.timed('football_data.process_season_matches')
 def process_season_matches(season_matches_df):
     """Processes raw season match data into parsable match and table data.
 
@@ -76,80 +163,29 @@ def process_season_matches(season_matches_df):
     with a view of the league table week on week through the season
     """
 
-    def expand_raw_fields(row):
-        row_data = dict()
-        row_data['awayTeamName'] = row.awayTeam['name']
-        row_data['homeTeamName'] = row.homeTeam['name']
-        row_data['matchId'] = row.id
-        row_data['matchDateTime'] = row.utcDate
-        row_data['homeScore'] = row.score['fullTime']['homeTeam']
-        row_data['awayScore'] = row.score['fullTime']['awayTeam']
-        row_data['matchDay'] = row.matchday
-        row_data['season'] = row.season
-        row_data['competition'] = row.competitionName
-
-        return row_data
-
-    def create_table_records(row):
-        home_row_data = dict()
-        home_row_data['teamName'] = row.homeTeamName
-        home_row_data['homeOrAway'] = 'home'
-        home_row_data['goalsFor'] = row.homeScore
-        home_row_data['goalsAgainst'] = row.awayScore
-        home_row_data['matchDay'] = row.matchDay
-        home_row_data['matchId'] = row.matchId
-        home_row_data['goalDiff'] = row.homeScore - row.awayScore
-        home_row_data['played'] = 1
-        home_row_data['season'] = row.season
-        home_row_data['competition'] = row.competitionName
-
-        if home_row_data['goalDiff'] > 0:
-            points = 3
-            home_row_data['gamesWon'] = 1
-        elif home_row_data['goalDiff'] == 0:
-            points = 1
-            home_row_data['gamesDrawn'] = 1
-        else:
-            points = 0
-            home_row_data['gamesLost'] = 1
-
-        home_row_data['points'] = points
-
-        # repeat for away team
-        away_row_data = dict()
-        away_row_data['teamName'] = row.awayTeamName
-        away_row_data['homeOrAway'] = 'away'
-        away_row_data['goalsFor'] = row.awayScore
-        away_row_data['goalsAgainst'] = row.homeScore
-        away_row_data['matchDay'] = row.matchDay
-        away_row_data['matchId'] = row.matchId
-        away_row_data['goalDiff'] = row.awayScore - row.homeScore
-        away_row_data['played'] = 1
-        away_row_data['season'] = row.season
-        away_row_data['competition'] = row.competitionName
-
-        if away_row_data['goalDiff'] > 0:
-            points = 3
-            away_row_data['gamesWon'] = 1
-        elif away_row_data['goalDiff'] == 0:
-            points = 1
-            away_row_data['gamesDrawn'] = 1
-        else:
-            points = 0
-            away_row_data['gamesLost'] = 1
-
-        away_row_data['points'] = points
-
-        return [home_row_data, away_row_data]
-
-    expanded_df_dict = season_matches_df.apply(expand_raw_fields, axis=1)
-    expanded_df = pd.DataFrame.from_records(expanded_df_dict)
-    expanded_df['matchDateTime'] = pd.to_datetime(expanded_df.matchDateTime)
-
-    table_df_deep_list = expanded_df.apply(create_table_records, axis=1)
-    table_df_flat_list = [l for sublist in table_df_deep_list for l in sublist]
-    table_df = pd.DataFrame.from_records(table_df_flat_list)
-
-    grouped_table_df = table_df.groupby(['matchDay', 'teamName']).max().groupby('teamName').cumsum()
+    expanded_df = apply_dtypes(pd.DataFrame({
+        'awayTeamName': season_matches_df.awayTeam.str.get('name'),
+        'homeTeamName': season_matches_df.homeTeam.str.get('name'),
+        'matchId': season_matches_df.id,
+        'matchDateTime': season_matches_df.utcDate,
+        'homeScore': season_matches_df.score.str.get('fullTime').str.get('homeTeam'),
+        'awayScore': season_matches_df.score.str.get('fullTime').str.get('awayTeam'),
+        'matchDay': season_matches_df.matchday,
+        'season': season_matches_df.season,
+        'competition': season_matches_df.competitionName,
+    }).reset_index(drop=True), MATCH_DTYPES)
+
+    table_df = build_team_match_table(expanded_df.homeTeamName, expanded_df.awayTeamName,
+                                      expanded_df.homeScore, expanded_df.awayScore,
+                                      columns=FOOTBALL_DATA_COLUMNS,
+                                      match_columns={
+                                          'matchDay': expanded_df.matchDay,
+                                          'matchId': expanded_df.matchId,
+                                          'season': expanded_df.season,
+                                          'competition': expanded_df.competition,
+                                      },
+                                      match_dtypes=MATCH_COLUMN_DTYPES)
+
+    grouped_table_df = cumulative_table(table_df, 'matchDay', 'teamName', agg='max', columns=FOOTBALL_DATA_COLUMNS)
 
     return expanded_df, table_df, grouped_table_df
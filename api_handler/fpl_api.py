@@ -1,2 +1,106 @@
-import requests as rq
+"""Client for the (undocumented) Fantasy Premier League API.
 
+Endpoints used:
+bootstrap-static/ -> teams, players (elements), events and positions (element_types) as they stand now
+fixtures/?event=n -> every fixture, or those of one event
+element-summary/{id}/ -> one player's fixtures to come, and match by match history this season and past ones
+event/{id}/live/ -> every player's stats in an event, updated as it is played
+
+Every request goes through one pooled session and a response cache. Cached responses are revalidated with their
+ETag on every call (ttl=0), so unchanged payloads come back as an empty 304 rather than being downloaded again.
+
+E.g.
+client = FplClient()
+players_df = client.bootstrap_static()['elements']
+history_df = client.element_summaries(players_df.id)['history']
+"""
+
+import os
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from api_handler.http_cache import cached_get, MemoryResponseCache, ResponseCache
+from api_handler.rate_limit import RateLimitedSession
+from api_handler.schema import apply_dtypes, FPL_DTYPES
+import instrumentation
+
+FPL_API_URL = os.environ.get('FPL_API_URL', 'https://fantasy.premierleague.com/api/')
+
+ELEMENT_SUMMARY_TABLES = {'history': 'history', 'history_past': 'history_past', 'fixtures': 'element_fixtures'}
+
+
+@instrumentation.timed('fpl_api.typed_frame')
+def typed_frame(records: typing.List[typing.Dict], dtypes: typing.Dict[str, str]) -> pd.DataFrame:
+    """Builds a dataframe from API records, coercing the columns in dtypes that are present; see schema.apply_dtypes."""
+    return apply_dtypes(pd.DataFrame.from_records(records), dtypes)
+
+
+class FplClient(object):
+    """Pooled, conditional and concurrent requests to the FPL API, returning typed dataframes.
+
+    :param base_url: API root, overridable for tests
+    :param cache: ResponseCache holding the last payload and ETag of each endpoint
+    :param session: session to share, defaults to a pooled, retrying RateLimitedSession without a rate limit
+    :param max_workers: element-summary requests in flight at once
+    :param ttl: seconds a payload is used without revalidating it; 0 revalidates every call
+    """
+
+    def __init__(self, base_url: str = FPL_API_URL, cache: ResponseCache = None, session=None,
+                 max_workers: int = 8, ttl: float = 0):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.cache = cache if cache is not None else MemoryResponseCache(max_entries=2048)
+        self.session = session or RateLimitedSession(pool_size=max_workers)
+        self.max_workers = max_workers
+        self.ttl = ttl
+
+    def get_json(self, path: str, params: typing.Mapping = None) -> typing.Any:
+        """JSON payload of one endpoint, e.g. get_json('event/1/live/')."""
+        with instrumentation.span('fpl_api.get_json', path=path) as s:
+            response = cached_get(self.base_url + path, params=params, cache=self.cache, ttl=self.ttl,
+                                  session=self.session)
+            if response.status_code != 200:
+                raise ConnectionError(f'{response.url} returned HTTP status {response.status_code}')
+            s.record(bytes=len(response.content))
+            return response.json()
+
+    def bootstrap_static(self) -> typing.Dict[str, pd.DataFrame]:
+        """teams, elements, events and element_types tables."""
+        payload = self.get_json('bootstrap-static/')
+        return {key: typed_frame(payload[key], FPL_DTYPES[key]) for key in ('teams', 'elements', 'events',
+                                                                            'element_types')}
+
+    def fixtures(self, event: int = None) -> pd.DataFrame:
+        params = {'event': event} if event is not None else None
+        return typed_frame(self.get_json('fixtures/', params), FPL_DTYPES['fixtures'])
+
+    def event_live(self, event: int) -> pd.DataFrame:
+        """Every player's stats in an event, one row per player id."""
+        elements = self.get_json(f'event/{event}/live/')['elements']
+        return typed_frame([dict(element['stats'], id=element['id']) for element in elements], FPL_DTYPES['live'])
+
+    def element_summary(self, element_id: int) -> typing.Dict[str, pd.DataFrame]:
+        """history, history_past and fixtures tables of one player."""
+        return self.element_summaries([element_id], max_workers=1)
+
+    def element_summaries(self, element_ids: typing.Iterable[int] = None,
+                          max_workers: int = None) -> typing.Dict[str, pd.DataFrame]:
+        """history, history_past and fixtures tables of many players, each with an element column.
+
+        :param element_ids: players to fetch, by default every player in bootstrap-static
+        :param max_workers: requests in flight at once, by default the client's max_workers
+        """
+        if element_ids is None:
+            element_ids = self.bootstrap_static()['elements'].id
+        element_ids = [int(element_id) for element_id in element_ids]
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            payloads = executor.map(lambda element_id: self.get_json(f'element-summary/{element_id}/'), element_ids)
+
+            records = {key: [] for key in ELEMENT_SUMMARY_TABLES}
+            for element_id, payload in zip(element_ids, payloads):
+                for key in ELEMENT_SUMMARY_TABLES:
+                    records[key].extend(dict(record, element=element_id) for record in payload.get(key, []))
+
+        return {key: typed_frame(records[key], FPL_DTYPES[table]) for key, table in ELEMENT_SUMMARY_TABLES.items()}
@@ -0,0 +1,235 @@
+"""Pluggable HTTP response cache for the football-data and XMLSoccer clients.
+
+Responses are keyed by URL and query params (API keys excluded), so historical seasons are downloaded once and
+then served from the cache. Entries either live forever (finished seasons) or for a TTL, after which they are
+revalidated with If-None-Match / If-Modified-Since where the API returned an ETag or Last-Modified header.
+
+E.g. to backfill from a local cache, without touching the network:
+cache = DiskResponseCache('~/.fpl_fun/http_cache')
+response = cached_get(url, params, cache=cache, offline=True)
+"""
+
+import collections
+import datetime as dt
+import hashlib
+import json
+import os
+import threading
+import time
+import typing
+from io import BytesIO
+from urllib.parse import urlencode
+
+import requests as rq
+from requests.structures import CaseInsensitiveDict
+
+# params that identify the caller rather than the resource, and so never form part of a cache key
+IGNORED_PARAMS = ('ApiKey',)
+
+DEFAULT_LIVE_TTL = 60 * 60
+
+
+class CacheEntry(typing.NamedTuple):
+    url: str
+    status_code: int
+    headers: typing.Dict[str, str]
+    content: bytes
+    stored_at: float
+    ttl: typing.Optional[float]  # seconds, None never expires
+
+    def is_fresh(self, now: float) -> bool:
+        return self.ttl is None or now - self.stored_at < self.ttl
+
+
+class ResponseCache(object):
+    """Base class for response caches, keeping hit / miss / revalidation counters.
+
+    Subclasses implement _load and _store.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.RLock()
+
+    def load(self, key: str) -> typing.Optional[CacheEntry]:
+        with self._lock:
+            return self._load(key)
+
+    def store(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._store(key, entry)
+
+    def record(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'revalidations': self.revalidations}
+
+    def _load(self, key: str) -> typing.Optional[CacheEntry]:
+        raise NotImplementedError
+
+    def _store(self, key: str, entry: CacheEntry):
+        raise NotImplementedError
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process cache holding at most max_entries responses, evicting the least recently used."""
+
+    def __init__(self, max_entries: int = 1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+
+    def _load(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class DiskResponseCache(ResponseCache):
+    """On-disk cache bounded to max_bytes of response bodies, evicting the least recently used.
+
+    Each entry is a <key>.body file plus a <key>.json metadata file. Recency is tracked through the body
+    file's mtime, so it survives between runs.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 ** 2):
+        super().__init__()
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        bodies = [f for f in os.listdir(self.cache_dir) if f.endswith('.body')]
+        stats = {f[:-len('.body')]: os.stat(os.path.join(self.cache_dir, f)) for f in bodies}
+
+        self._sizes = collections.OrderedDict(
+            (key, stat.st_size) for key, stat in sorted(stats.items(), key=lambda kv: kv[1].st_mtime))
+        self.size_bytes = sum(self._sizes.values())
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _load(self, key):
+        if key not in self._sizes:
+            return None
+
+        with open(self._path(key, '.json')) as f:
+            meta = json.load(f)
+        with open(self._path(key, '.body'), 'rb') as f:
+            content = f.read()
+
+        os.utime(self._path(key, '.body'))
+        self._sizes.move_to_end(key)
+
+        return CacheEntry(content=content, **meta)
+
+    def _store(self, key, entry):
+        meta = entry._asdict()
+        del meta['content']
+
+        for suffix, data, mode in (('.body', entry.content, 'wb'), ('.json', json.dumps(meta), 'w')):
+            tmp_path = self._path(key, suffix + '.tmp')
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key, suffix))
+
+        self.size_bytes += len(entry.content) - self._sizes.pop(key, 0)
+        self._sizes[key] = len(entry.content)
+        self._evict()
+
+    def _evict(self):
+        while self.size_bytes > self.max_bytes and len(self._sizes) > 1:
+            key, size = self._sizes.popitem(last=False)
+            for suffix in ('.body', '.json'):
+                os.remove(self._path(key, suffix))
+            self.size_bytes -= size
+
+
+def cache_key(url: str, params: typing.Mapping = None) -> str:
+    key_params = sorted((k, str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+    return hashlib.sha256(f'{url}?{urlencode(key_params)}'.encode('utf-8')).hexdigest()
+
+
+def season_ttl(season_end: dt.date, live_ttl: float = DEFAULT_LIVE_TTL) -> typing.Optional[float]:
+    """Finished seasons never change, so are cached forever; live ones expire after live_ttl seconds."""
+    return None if dt.date.today() > season_end else live_ttl
+
+
+def _to_response(entry: CacheEntry) -> rq.Response:
+    response = rq.Response()
+    response.status_code = entry.status_code
+    response.url = entry.url
+    response.headers = CaseInsensitiveDict(entry.headers)
+    response.encoding = rq.utils.get_encoding_from_headers(response.headers)
+    response._content = entry.content
+    response.raw = BytesIO(entry.content)
+    return response
+
+
+def cached_get(url: str, params: typing.Mapping = None, headers: typing.Mapping = None,
+               cache: ResponseCache = None, ttl: typing.Optional[float] = DEFAULT_LIVE_TTL,
+               offline: bool = False, session: rq.Session = None, stream: bool = False) -> rq.Response:
+    """GETs a URL through a response cache.
+
+    Fresh entries are returned without a request. Stale entries are revalidated with a conditional request if
+    the API sent an ETag or Last-Modified header, and refetched otherwise. Only 200 responses are cached.
+
+    :param url: URL to request
+    :param params: query params, which form part of the cache key
+    :param headers: request headers, which do not
+    :param cache: ResponseCache to use, or None to always request
+    :param ttl: seconds a new entry stays fresh for, None to keep it forever
+    :param offline: never touch the network, serving stale entries and raising ConnectionError on a miss
+    :param session: requests Session to send requests with, for connection reuse
+    :param stream: leave the body unread on response.raw when not caching; cached bodies are always read
+    :return: requests Response
+    """
+    getter = session or rq
+
+    if cache is None:
+        return getter.get(url, params=params, headers=headers, stream=stream)
+
+    key = cache_key(url, params)
+    entry = cache.load(key)
+
+    if entry is not None and (offline or entry.is_fresh(time.time())):
+        cache.record('hits')
+        return _to_response(entry)
+
+    if offline:
+        cache.record('misses')
+        raise ConnectionError(f'{url} {dict(params or {})} is not cached and offline mode is on')
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        if 'ETag' in entry.headers:
+            request_headers['If-None-Match'] = entry.headers['ETag']
+        if 'Last-Modified' in entry.headers:
+            request_headers['If-Modified-Since'] = entry.headers['Last-Modified']
+
+    response = getter.get(url, params=params, headers=request_headers)
+
+    if response.status_code == 304 and entry is not None:
+        cache.record('revalidations')
+        entry = entry._replace(stored_at=time.time(), ttl=ttl)
+        cache.store(key, entry)
+        return _to_response(entry)
+
+    cache.record('misses')
+    if response.status_code == 200:
+        kept_headers = {h: response.headers[h] for h in ('Content-Type', 'ETag', 'Last-Modified')
+                        if h in response.headers}
+        cache.store(key, CacheEntry(url=response.url, status_code=200, headers=kept_headers,
+                                    content=response.content, stored_at=time.time(), ttl=ttl))
+
+    return response
@@ -0,0 +1,351 @@
+"""Columnar league table engine shared by the football-data and XMLSoccer handlers.
+
+Turns one row per match into one row per team per match (home row followed by away row), computing
+goal difference, points and win / draw / loss flags with vectorised masks rather than per-match dicts.
+
+Each API handler keeps its own column naming via a TableColumns instance. Outputs are typed compactly (see
+api_handler.schema): categorical team names, int8 per-match counts and int16 running totals.
+"""
+
+import typing
+
+import numpy as np
+import pandas as pd
+
+from api_handler.schema import apply_dtypes
+
+
+class TableColumns(typing.NamedTuple):
+    """Output column names (and home / away labels) for a team-match table."""
+    team: str
+    home_or_away: str
+    goals_for: str
+    goals_against: str
+    goal_diff: str
+    played: str
+    won: str
+    drawn: str
+    lost: str
+    points: str
+    home_label: str = 'home'
+    away_label: str = 'away'
+    opponent: typing.Optional[str] = None
+
+
+FOOTBALL_DATA_COLUMNS = TableColumns(team='teamName', home_or_away='homeOrAway', goals_for='goalsFor',
+                                     goals_against='goalsAgainst', goal_diff='goalDiff', played='played',
+                                     won='gamesWon', drawn='gamesDrawn', lost='gamesLost', points='points')
+
+XML_SOCCER_COLUMNS = TableColumns(team='TeamName', home_or_away='HomeOrAway', goals_for='GoalsFor',
+                                  goals_against='GoalsAgainst', goal_diff='GoalDiff', played='GamesPlayed',
+                                  won='GamesWon', drawn='GamesDrawn', lost='GamesLost', points='Points',
+                                  home_label='Home', away_label='Away', opponent='MatchOpponent')
+
+
+def team_match_dtypes(columns: TableColumns, match_dtypes: typing.Mapping[str, str] = None) -> typing.Dict[str, str]:
+    """Dtypes of build_team_match_table output, plus match_dtypes for its match_columns."""
+    dtypes = {columns.team: 'category', columns.home_or_away: 'category'}
+    if columns.opponent is not None:
+        dtypes[columns.opponent] = 'category'
+    for column in (columns.goals_for, columns.goals_against, columns.goal_diff, columns.played, columns.won,
+                   columns.drawn, columns.lost, columns.points):
+        dtypes[column] = 'int8'
+    dtypes.update(match_dtypes or {})
+    return dtypes
+
+
+def standings_dtypes(columns: TableColumns) -> typing.Dict[str, str]:
+    """Dtypes of running totals, as returned by cumulative_table or LeagueTable."""
+    return {column: 'int16' for column in (columns.goals_for, columns.goals_against, columns.goal_diff,
+                                           columns.played, columns.won, columns.drawn, columns.lost,
+                                           columns.points)}
+
+
+
+def _small_counts(values: np.ndarray) -> typing.Union[np.ndarray, pd.arrays.IntegerArray]:
+    """Float counts as int8, or as nullable Int8 if some are NaN, e.g. the goals of unplayed matches."""
+    missing = np.isnan(values)
+    if missing.any():
+        return pd.arrays.IntegerArray(np.where(missing, 0, values).astype(np.int8), missing)
+    return values.astype(np.int8)
+
+
+def _as_float(values) -> np.ndarray:
+    """Numeric array-like as a float array with NaN for missing values, including NA in nullable integers."""
+    if isinstance(values, (pd.Series, pd.Index)):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    return np.asarray(values, dtype=float)
+
+
+def _interleave(home, away) -> np.ndarray:
+    """Merges two equal length arrays as [home_0, away_0, home_1, away_1, ...]."""
+    home = np.asarray(home)
+    away = np.asarray(away)
+
+    out = np.empty(home.shape[0] * 2, dtype=np.result_type(home, away))
+    out[0::2] = home
+    out[1::2] = away
+    return out
+
+
+def build_team_match_table(home_team, away_team, home_goals, away_goals, columns: TableColumns,
+                           match_columns: typing.Mapping[str, typing.Any] = None,
+                           match_dtypes: typing.Mapping[str, str] = None) -> pd.DataFrame:
+    """Builds a table with one row per team per match from match-level columns.
+
+    Rows are ordered home, away for each match in turn, matching the old row-wise record builder.
+    Outcome columns follow the old conventions too: games won / drawn / lost hold 1 or NA, and any
+    match without a positive or level goal difference (including unplayed, NaN-scored ones) counts as lost.
+
+    :param home_team: array-like of home team names
+    :param away_team: array-like of away team names
+    :param home_goals: array-like of home goals scored, already numeric, NaN or NA if unplayed
+    :param away_goals: array-like of away goals scored, already numeric, NaN or NA if unplayed
+    :param columns: output column naming
+    :param match_columns: mapping of output column name -> match-level values, repeated on both team rows
+    :param match_dtypes: dtypes of match_columns, see schema.apply_dtypes
+    :return: team-match table dataframe
+    """
+    home_goals = _as_float(home_goals)
+    away_goals = _as_float(away_goals)
+    n_matches = home_goals.shape[0]
+
+    goals_for = _interleave(home_goals, away_goals)
+    goals_against = _interleave(away_goals, home_goals)
+    goal_diff = goals_for - goals_against
+
+    won = goal_diff > 0
+    drawn = goal_diff == 0
+    lost = ~(won | drawn)
+
+    table = dict()
+    table[columns.team] = pd.Categorical(_interleave(home_team, away_team))
+    table[columns.home_or_away] = pd.Categorical.from_codes(np.tile([0, 1], n_matches),
+                                                            categories=[columns.home_label, columns.away_label])
+    if columns.opponent is not None:
+        table[columns.opponent] = pd.Categorical(_interleave(away_team, home_team))
+    table[columns.goals_for] = _small_counts(goals_for)
+    table[columns.goals_against] = _small_counts(goals_against)
+
+    rows = np.repeat(np.arange(n_matches), 2)
+    for column_name, values in (match_columns or {}).items():
+        # taking from the pandas array keeps categoricals and nullable integers as they are
+        table[column_name] = values.array.take(rows) if isinstance(values, pd.Series) else np.asarray(values)[rows]
+
+    table[columns.goal_diff] = _small_counts(goal_diff)
+    table[columns.played] = np.ones(n_matches * 2, dtype=np.int8)
+    for column, outcome in ((columns.won, won), (columns.drawn, drawn), (columns.lost, lost)):
+        table[column] = pd.arrays.IntegerArray(np.ones(n_matches * 2, dtype=np.int8), ~outcome)
+    table[columns.points] = np.where(won, 3, np.where(drawn, 1, 0)).astype(np.int8)
+
+    return apply_dtypes(pd.DataFrame(table), team_match_dtypes(columns, match_dtypes))
+
+
+def cumulative_table(table_df: pd.DataFrame, matchday_col: str, team_col: str, agg: str = 'sum',
+                     columns: TableColumns = None) -> pd.DataFrame:
+    """Aggregates a team-match table per matchday and team, then accumulates it through the season.
+
+    Only numeric columns are carried through, as the cumulative sum is meaningless for anything else. They are
+    widened first so small per-match integers can't overflow. Given columns, only the stat columns are kept,
+    narrowed to standings_dtypes.
+
+    :param table_df: dataframe as returned by build_team_match_table
+    :param matchday_col: name of the matchday column
+    :param team_col: name of the team column
+    :param agg: aggregation applied when a team has several rows on one matchday
+    :param columns: column naming of table_df, to keep and type just the stat columns; by default every numeric
+    column is kept, widened
+    :return: dataframe indexed by (matchday, team) holding running totals
+    """
+    numeric_df = table_df.select_dtypes(include='number')
+    numeric_df = numeric_df.astype({column: 'float64' if numeric_df[column].hasnans else 'int64'
+                                    for column in numeric_df.columns
+                                    if pd.api.types.is_integer_dtype(numeric_df[column])})
+    numeric_df = numeric_df.assign(**{team_col: table_df[team_col]})
+
+    # sorted explicitly: before pandas 2, observed=True leaves categorical keys in order of appearance
+    cumulative_df = numeric_df.groupby([matchday_col, team_col], observed=True).agg(agg).sort_index()\
+        .groupby(team_col, observed=True).cumsum()
+    if columns is None:
+        return cumulative_df
+    stat_dtypes = standings_dtypes(columns)
+    return apply_dtypes(cumulative_df[list(stat_dtypes)], stat_dtypes)
+
+
+def rank_standings(table_df: pd.DataFrame, matchday_col: str, columns: TableColumns) -> np.ndarray:
+    """League position of each row of a cumulative table among the rows of the same matchday.
+
+    Teams are ordered by points, then goal difference, then goals for; teams level on all three are listed by
+    name, so every position is taken exactly once. One lexsort over the whole table does every matchday at once.
+
+    :param table_df: running totals as returned by cumulative_table, matchday and team in the index or columns
+    :param matchday_col: name of the matchday index level or column
+    :param columns: column naming of table_df
+    :return: positions from 1, in table_df's row order
+    """
+    def values(name):
+        return table_df[name].to_numpy() if name in table_df.columns else \
+            table_df.index.get_level_values(name).to_numpy()
+
+    matchdays = values(matchday_col)
+    team_codes = pd.factorize(values(columns.team), sort=True)[0]
+
+    # np.lexsort sorts by its last key first
+    order = np.lexsort((team_codes,
+                        -values(columns.goals_for).astype(float),
+                        -values(columns.goal_diff).astype(float),
+                        -values(columns.points).astype(float),
+                        matchdays))
+
+    sorted_matchdays = matchdays[order]
+    is_first = np.r_[True, sorted_matchdays[1:] != sorted_matchdays[:-1]]
+    group_starts = np.maximum.accumulate(np.where(is_first, np.arange(len(order)), 0))
+
+    positions = np.empty(len(order), dtype=np.int64)
+    positions[order] = np.arange(len(order)) - group_starts + 1
+    return positions
+
+
+class _TeamHistory(object):
+    """Per-matchday totals and running totals for one team, kept sorted by matchday."""
+
+    def __init__(self, n_stats: int):
+        self.matchdays = np.empty(0)
+        self.n_matches = np.empty(0, dtype=np.int64)
+        self.totals = np.empty((0, n_stats))
+        self.cumulative = np.empty((0, n_stats))
+
+    def add(self, matchday, stats: np.ndarray):
+        pos = int(np.searchsorted(self.matchdays, matchday))
+
+        if pos == len(self.matchdays) or self.matchdays[pos] != matchday:
+            self.matchdays = np.insert(self.matchdays, pos, matchday)
+            self.n_matches = np.insert(self.n_matches, pos, 0)
+            self.totals = np.insert(self.totals, pos, 0, axis=0)
+            self.cumulative = np.insert(self.cumulative, pos, 0, axis=0)
+
+        self.n_matches[pos] += 1
+        self.totals[pos] += stats
+
+    def subtract(self, matchday, stats: np.ndarray):
+        pos = int(np.searchsorted(self.matchdays, matchday))
+
+        self.n_matches[pos] -= 1
+        self.totals[pos] -= stats
+
+        if self.n_matches[pos] == 0:
+            self.matchdays = np.delete(self.matchdays, pos)
+            self.n_matches = np.delete(self.n_matches, pos)
+            self.totals = np.delete(self.totals, pos, axis=0)
+            self.cumulative = np.delete(self.cumulative, pos, axis=0)
+
+    def refresh(self, from_matchday):
+        """Recomputes running totals from the given matchday onwards; earlier rows are untouched."""
+        pos = int(np.searchsorted(self.matchdays, from_matchday))
+        if pos == len(self.matchdays):
+            return
+
+        start = self.cumulative[pos - 1] if pos > 0 else 0
+        self.cumulative[pos:] = start + np.cumsum(self.totals[pos:], axis=0)
+
+
+class LeagueTable(object):
+    """Cumulative league table that is updated in place as matches are added, corrected or removed.
+
+    Holds the same information as cumulative_table(table_df, matchday_col, team_col, columns=columns) but only
+    recomputes the running totals of teams touched by an update, from the earliest matchday the update touched.
+    During a live season new results land on the latest matchday, so an update costs about as much as the number
+    of results in it.
+
+    E.g. for an hourly refresh:
+    league_table = LeagueTable.from_matches(matches_df, XML_SOCCER_COLUMNS, 'MatchDay', 'MatchId')
+    league_table.update(new_matches_df)  # new results, or corrected scores for known match ids
+    league_table.remove(postponed_match_ids)
+    table_df = league_table.to_frame()
+    """
+
+    def __init__(self, columns: TableColumns, matchday_col: str, match_id_col: str):
+        self.columns = columns
+        self.matchday_col = matchday_col
+        self.match_id_col = match_id_col
+        self.stat_cols = [columns.goals_for, columns.goals_against, columns.goal_diff, columns.played,
+                          columns.won, columns.drawn, columns.lost, columns.points]
+
+        self._teams = dict()
+        self._matches = dict()
+
+    @classmethod
+    def from_matches(cls, table_df: pd.DataFrame, columns: TableColumns, matchday_col: str,
+                     match_id_col: str) -> 'LeagueTable':
+        league_table = cls(columns, matchday_col, match_id_col)
+        league_table.update(table_df)
+        return league_table
+
+    def update(self, table_df: pd.DataFrame):
+        """Adds a batch of team-match rows, replacing any rows already held for the same match ids.
+
+        :param table_df: team-match rows as returned by build_team_match_table, for new or corrected matches
+        """
+        match_ids = table_df[self.match_id_col].to_numpy()
+        teams = table_df[self.columns.team].to_numpy()
+        matchdays = table_df[self.matchday_col].to_numpy()
+        stats = np.nan_to_num(table_df[self.stat_cols].to_numpy(dtype=float, na_value=np.nan))
+
+        dirty = self._discard(set(match_ids) & self._matches.keys())
+
+        for match_id, team, matchday, team_stats in zip(match_ids, teams, matchdays, stats):
+            if team not in self._teams:
+                self._teams[team] = _TeamHistory(len(self.stat_cols))
+            self._teams[team].add(matchday, team_stats)
+            self._matches.setdefault(match_id, []).append((team, matchday, team_stats))
+            dirty[team] = min(dirty.get(team, matchday), matchday)
+
+        self._refresh(dirty)
+
+    def remove(self, match_ids: typing.Iterable):
+        """Drops matches from the table, e.g. fixtures that were postponed after being counted."""
+        self._refresh(self._discard(set(match_ids) & self._matches.keys()))
+
+    def _discard(self, match_ids: typing.Iterable) -> typing.Dict:
+        dirty = dict()
+        for match_id in match_ids:
+            for team, matchday, team_stats in self._matches.pop(match_id):
+                self._teams[team].subtract(matchday, team_stats)
+                dirty[team] = min(dirty.get(team, matchday), matchday)
+        return dirty
+
+    def _refresh(self, dirty: typing.Dict):
+        for team, matchday in dirty.items():
+            self._teams[team].refresh(matchday)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Running totals indexed by (matchday, team), as cumulative_table would return them."""
+        matchdays, teams, cumulative = [], [], []
+        for team, history in self._teams.items():
+            matchdays.append(history.matchdays)
+            teams.append(np.full(len(history.matchdays), team, dtype=object))
+            cumulative.append(history.cumulative)
+
+        if not cumulative:
+            return pd.DataFrame(columns=self.stat_cols)
+
+        index = pd.MultiIndex.from_arrays([np.concatenate(matchdays), pd.Categorical(np.concatenate(teams))],
+                                          names=[self.matchday_col, self.columns.team])
+        table_df = pd.DataFrame(np.concatenate(cumulative), index=index, columns=self.stat_cols)
+
+        return apply_dtypes(table_df, standings_dtypes(self.columns)).sort_index()
+
+    def standings(self, matchday=None) -> pd.DataFrame:
+        """Latest running totals for every team as of a matchday (default: the latest), one row per team."""
+        rows = dict()
+        for team, history in self._teams.items():
+            pos = len(history.matchdays) if matchday is None else int(
+                np.searchsorted(history.matchdays, matchday, side='right'))
+            if pos > 0:
+                rows[team] = history.cumulative[pos - 1]
+
+        standings_df = pd.DataFrame.from_dict(rows, orient='index', columns=self.stat_cols)
+        standings_df.index.name = self.columns.team
+
+        return apply_dtypes(standings_df, standings_dtypes(self.columns)).sort_values(
+            by=[self.columns.points, self.columns.goal_diff, self.columns.goals_for], ascending=False)
@@ -0,0 +1,100 @@
+"""Rate limiting and retries for API clients that share one pooled requests Session across threads."""
+
+import threading
+import time
+import typing
+
+import requests as rq
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket: tokens refill at rate_per_minute, up to capacity.
+
+    In any 60 second window at most capacity + rate_per_minute requests get through, so to stay inside a quota
+    of N requests per minute use rate_per_minute=N - capacity.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: int = 1, clock: typing.Callable[[], float] = time.monotonic,
+                 sleep: typing.Callable[[float], None] = time.sleep):
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate_per_second)
+
+            self._sleep(wait)
+
+    def pause(self, seconds: float):
+        """Holds back every caller for a while, e.g. after the API says we have run over quota."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens = 0
+            self._paused_until = max(self._paused_until, now + seconds)
+
+
+class RateLimitedSession(object):
+    """Pooled requests Session that waits on a TokenBucket before each request and retries 429 / 5xx responses.
+
+    Retries back off exponentially, or wait as long as a Retry-After header asks. A 429 pauses the whole bucket,
+    as every thread sharing it is over quota too. Exposes get() only, so it can be passed anywhere a Session is.
+    """
+
+    def __init__(self, limiter: TokenBucket = None, session: rq.Session = None, max_retries: int = 4,
+                 backoff: float = 2.0, pool_size: int = 8):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        if session is None:
+            session = rq.Session()
+            adapter = rq.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def get(self, url: str, **kwargs) -> rq.Response:
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+
+            response = self.session.get(url, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+
+            delay = self._retry_delay(response, attempt)
+            if response.status_code == 429 and self.limiter is not None:
+                self.limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+        return response
+
+    def _retry_delay(self, response: rq.Response, attempt: int) -> float:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2 ** attempt
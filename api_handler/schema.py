@@ -0,0 +1,82 @@
+"""Compact column dtypes for match, team-match, standings and FPL API tables, applied once as data comes in.
+
+Strings that repeat on every row (team, competition and season names) become categoricals, counts become the
+smallest integer that holds them and dates become datetimes. Integer columns with missing values, e.g. the goals
+of unplayed fixtures, use pandas' nullable integer of the same width (Int8 for int8) rather than float.
+
+The dtypes of team-match rows and standings are defined next to their builders, in league_table. Those of FPL API
+tables are defined here, in FPL_DTYPES, as both fpl_api and the snapshot tables written by the gcp functions use them.
+
+E.g.
+matches_df = apply_dtypes(raw_df, xml_soccer.FIXTURE_DTYPES)
+memory_report({'matches': matches_df, 'table': table_df})
+"""
+
+import typing
+
+import pandas as pd
+
+# FPL API table -> columns coerced to a fixed dtype; FPL sends many numbers as strings
+FPL_DTYPES = {
+    'teams': {'id': 'int64', 'code': 'int64', 'strength': 'int64'},
+    'elements': {'id': 'int64', 'team': 'int64', 'element_type': 'int64', 'now_cost': 'int64',
+                 'total_points': 'int64', 'minutes': 'int64', 'form': 'float64', 'points_per_game': 'float64',
+                 'selected_by_percent': 'float64', 'ep_next': 'float64', 'ep_this': 'float64',
+                 'chance_of_playing_next_round': 'float64', 'status': 'category'},
+    'events': {'id': 'int64', 'deadline_time': 'datetime64[ns]'},
+    'element_types': {'id': 'int64'},
+    'fixtures': {'id': 'int64', 'event': 'float64', 'team_h': 'int64', 'team_a': 'int64', 'team_h_score': 'float64',
+                 'team_a_score': 'float64', 'kickoff_time': 'datetime64[ns]'},
+    'history': {'element': 'int64', 'fixture': 'int64', 'opponent_team': 'int64', 'round': 'int64',
+                'total_points': 'int64', 'minutes': 'int64', 'value': 'int64', 'selected': 'int64',
+                'influence': 'float64', 'creativity': 'float64', 'threat': 'float64', 'ict_index': 'float64',
+                'kickoff_time': 'datetime64[ns]'},
+    'history_past': {'element': 'int64', 'start_cost': 'int64', 'end_cost': 'int64', 'total_points': 'int64'},
+    'live': {'id': 'int64', 'minutes': 'int64', 'total_points': 'int64', 'bonus': 'int64', 'bps': 'int64',
+             'influence': 'float64', 'creativity': 'float64', 'threat': 'float64', 'ict_index': 'float64'},
+}
+FPL_DTYPES['element_fixtures'] = dict(FPL_DTYPES['fixtures'], element='int64')
+
+
+def _nullable(dtype: str) -> str:
+    """int8 -> Int8, uint16 -> UInt16; other dtypes are returned unchanged."""
+    if dtype.startswith('uint'):
+        return 'UInt' + dtype[4:]
+    return 'Int' + dtype[3:] if dtype.startswith('int') else dtype
+
+
+def apply_dtypes(df: pd.DataFrame, dtypes: typing.Mapping[str, str]) -> pd.DataFrame:
+    """Copy of df with the columns in dtypes that it has converted; columns already of the right dtype are kept.
+
+    :param df: dataframe, typically of API strings
+    :param dtypes: column -> dtype ('int8', 'float32', 'datetime64[ns]', 'category', ...)
+    :return: typed dataframe
+    """
+    converted = dict()
+    for column, dtype in dtypes.items():
+        if column not in df or df[column].dtype in (dtype, _nullable(dtype)):
+            continue
+        values = df[column]
+        if dtype.startswith('datetime'):
+            # timezone aware values are converted to UTC, as naive datetimes
+            converted[column] = pd.to_datetime(values, errors='coerce', utc=True).dt.tz_localize(None).astype(dtype)
+        elif dtype.startswith(('int', 'uint')):
+            values = pd.to_numeric(values, errors='coerce')
+            converted[column] = values.astype(_nullable(dtype) if values.isna().any() else dtype)
+        elif dtype.startswith('float'):
+            converted[column] = pd.to_numeric(values, errors='coerce').astype(dtype)
+        else:
+            converted[column] = values.astype(dtype)
+
+    return df.assign(**converted) if converted else df
+
+
+def memory_report(frames: typing.Mapping[str, pd.DataFrame]) -> pd.DataFrame:
+    """Rows, columns and deep memory use in MB of each dataframe, with a total row."""
+    report_df = pd.DataFrame({
+        'rows': [len(df) for df in frames.values()],
+        'columns': [df.shape[1] for df in frames.values()],
+        'MB': [df.memory_usage(deep=True).sum() / 1e6 for df in frames.values()],
+    }, index=list(frames))
+    report_df.loc['total'] = report_df.sum()
+    return report_df
@@ -20,22 +20,132 @@ import pandas as pd
 import os
 from lxml import etree
 import typing
+import datetime as dt
+import collections
+from io import BytesIO
+
+from api_handler.http_cache import cached_get, season_ttl, ResponseCache, DEFAULT_LIVE_TTL
+from api_handler.league_table import build_team_match_table, cumulative_table, rank_standings, XML_SOCCER_COLUMNS
+from api_handler.schema import apply_dtypes
+import instrumentation
+
+# column dtypes for GetFixturesByLeagueAndSeason and friends; any other column is left as a string
+FIXTURE_DTYPES = {
+    'Id': 'int64',
+    'FixtureMatch_Id': 'int64',
+    'Date': 'datetime64[ns]',
+    'Round': 'int8',
+    'League': 'category',
+    'HomeTeam': 'category',
+    'AwayTeam': 'category',
+    'Spectators': 'int32',
+    'HomeTeam_Id': 'int32',
+    'AwayTeam_Id': 'int32',
+    'HomeGoals': 'int8',
+    'AwayGoals': 'int8',
+    'HomeHalfTimeGoals': 'int8',
+    'AwayHalfTimeGoals': 'int8',
+    'HomeShots': 'int8',
+    'AwayShots': 'int8',
+    'HomeShotsOnTarget': 'int8',
+    'AwayShotsOnTarget': 'int8',
+    'HomeCorners': 'int8',
+    'AwayCorners': 'int8',
+    'HomeFouls': 'int8',
+    'AwayFouls': 'int8',
+    'HomeYellowCards': 'int8',
+    'AwayYellowCards': 'int8',
+    'HomeRedCards': 'int8',
+    'AwayRedCards': 'int8',
+    'MatchDate': 'datetime64[ns]',
+    'CompetitionSeason': 'category',
+    'CompetitionName': 'category',
+}
+
+# dtypes of the match level columns process_season_matches carries onto team-match rows
+MATCH_COLUMN_DTYPES = {
+    'MatchDay': 'int8',
+    'MatchId': 'int64',
+    'CompetitionSeason': 'category',
+    'CompetitionName': 'category',
+    'MatchDate': 'datetime64[ns]',
+}
 
 
 class XmlSoccerRequest(object):
-    def __init__(self):
-        self.api_key = os.environ['XML_SOCCER_API_KEY']
+    def __init__(self, cache: ResponseCache = None, offline: bool = False):
+        """
+        :param cache: optional ResponseCache; finished seasons are cached forever, anything else for an hour
+        :param offline: serve only from cache, raising ConnectionError for anything not cached
+        """
+        self.api_key = os.environ.get('XML_SOCCER_API_KEY')
         self.api_url = 'http://www.xmlsoccer.com/FootballData.asmx/'
         self.base_params = {'ApiKey': self.api_key}
+        self.cache = cache
+        self.offline = offline
 
     def get(self, method:str='GetAllLeagues', **kwargs) -> typing.List[typing.Dict]:
-        r = rq.get(self.api_url + method,
-                   params={**self.base_params, **kwargs})
+        return self._process_xml(self._request(method, stream=False, **kwargs))
+
+    def iter_records(self, method: str = 'GetAllLeagues', **kwargs) -> typing.Iterator[typing.Dict]:
+        """Streaming version of get: parses the response as it arrives, yielding one record at a time.
+
+        Peak memory is one record rather than the full response text plus its tree plus the list of dicts.
+        """
+        return self._iter_xml(self._request(method, stream=True, **kwargs))
+
+    def get_frame(self, method: str = 'GetAllLeagues', dtypes: typing.Dict[str, str] = None,
+                  **kwargs) -> pd.DataFrame:
+        """Streams a response straight into per-column lists and builds one typed DataFrame from them.
+
+        :param method: API method
+        :param dtypes: column -> dtype ('int64', 'float64', 'datetime64[ns]', 'category', ...) for any
+        column that should not stay a string, defaulting to FIXTURE_DTYPES; see schema.apply_dtypes
+        :return: dataframe with one row per record
+        """
+        dtypes = FIXTURE_DTYPES if dtypes is None else dtypes
+        columns = collections.OrderedDict()
+        n_records = 0
+
+        with instrumentation.span('xml_soccer.parse', method=method) as s:
+            for record in self.iter_records(method, **kwargs):
+                for tag, text in record.items():
+                    if tag not in columns:
+                        columns[tag] = [None] * n_records  # tag first seen part way through the response
+                    columns[tag].append(text)
+                n_records += 1
+                for values in columns.values():
+                    if len(values) < n_records:
+                        values.append(None)
+            s.record(rows=n_records)
+
+        with instrumentation.span('xml_soccer.build_frame', method=method) as s:
+            df = apply_dtypes(pd.DataFrame(columns), dtypes)
+            s.record(rows=len(df))
+        return df
+
+    def _request(self, method: str, stream: bool, **kwargs) -> rq.Response:
+        r = cached_get(self.api_url + method,
+                       params={**self.base_params, **kwargs},
+                       cache=self.cache,
+                       ttl=self._ttl(kwargs),
+                       offline=self.offline,
+                       stream=stream)
 
         if r.status_code != 200:
             raise ConnectionError(r.text)
-        else:
-            return self._process_xml(r)
+        return r
+
+    @staticmethod
+    def _ttl(params: typing.Dict) -> typing.Optional[float]:
+        """Season date strings look like '1718'; those seasons are over by July of the second year."""
+        season_date_string = params.get('seasonDateString')
+        if season_date_string is None:
+            return DEFAULT_LIVE_TTL
+
+        start_year = int(season_date_string[:2])
+        start_year += 1900 if start_year > 50 else 2000
+        return season_ttl(dt.date(start_year + 1, 7, 1))
 
     @staticmethod
     def _process_xml(response: rq.Response) -> typing.List[typing.Dict]:
@@ -56,8 +166,40 @@ class XmlSoccerRequest(object):
 
         return data
 
+    @staticmethod
+    def _iter_xml(response: rq.Response) -> typing.Iterator[typing.Dict]:
+        """Incrementally parses the raw response body, clearing each record's elements once yielded."""
+        if response._content_consumed:  # body already read, e.g. to store it in a response cache
+            body = BytesIO(response.content)
+        else:
+            body = response.raw
+            body.decode_content = True
+
+        n_records = 0
+        depth = 0
+        try:
+            for event, element in etree.iterparse(body, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    continue
+
+                depth -= 1
+                if depth == 1:  # direct children of the root are records
+                    yield {child.tag: child.text for child in element}
+                    n_records += 1
+
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del element.getparent()[0]
+        except etree.XMLSyntaxError as e:
+            raise SyntaxError(str(e))
+
+        if n_records == 0:
+            raise ConnectionError(element.text)
 
-def get_season_matches(league_code: str, season_date_string: str):
+
+def get_season_matches(league_code: str, season_date_string: str, cache: ResponseCache = None,
+                       offline: bool = False):
     """Downloads matches from a particular competition and season into a dataframe.
 
     # Common competition codes
@@ -69,11 +211,13 @@ def get_season_matches(league_code: str, season_date_string: str):
 
     :param league_code: int
     :param season_date_string: str
+    :param cache: optional ResponseCache, see XmlSoccerRequest
+    :param offline: serve only from cache
     :return: df containing all of the competition season match information
     """
-    season_matches_raw = XmlSoccerRequest().get('GetFixturesByLeagueAndSeason',
-                                                league=league_code,
-                                                seasonDateString=season_date_string)
+    season_matches_raw = XmlSoccerRequest(cache=cache, offline=offline).get('GetFixturesByLeagueAndSeason',
+                                                                            league=league_code,
+                                                                            seasonDateString=season_date_string)
 
     # season_detail_df = pd.DataFrame.from_records(season_matches_raw)
     # season_detail_df['MatchDate'] = pd.to_datetime(season_detail_df.Date)
@@ -84,78 +228,57 @@ def get_season_matches(league_code: str, season_date_string: str):
     return season_matches_raw
 
 
+def get_season_matches_df(league_code: str, season_date_string: str, cache: ResponseCache = None,
+                          offline: bool = False) -> pd.DataFrame:
+    """Streams matches from a particular competition and season into a typed dataframe.
+
+    Output is ready for process_season_matches.
+
+    :param league_code: int
+    :param season_date_string: str
+    :param cache: optional ResponseCache, see XmlSoccerRequest
+    :param offline: serve only from cache
+    :return: df containing all of the competition season match information
+    """
+    season_detail_df = XmlSoccerRequest(cache=cache, offline=offline).get_frame('GetFixturesByLeagueAndSeason',
+                                                                                league=league_code,
+                                                                                seasonDateString=season_date_string)
+    season_detail_df['MatchDate'] = season_detail_df.Date
+    season_detail_df['CompetitionSeason'] = season_date_string
+    season_detail_df['CompetitionName'] = season_detail_df.League.iloc[0]
+
+    return apply_dtypes(season_detail_df, FIXTURE_DTYPES)
+
+
+@instrumentation.timed('xml_soccer.process_season_matches')
 def process_season_matches(season_detail_df: pd.DataFrame):
     """Processes raw season match data into parsable match and table data.
 
     :param season_detail_df: Dataframe as returned by get_season_matches function
     :return: 3 dataframes: expanded_df with match info, table_df with match outcome info, and grouped_table_df
-    with a view of the league table week on week through the season
+    with a view of the league table week on week through the season, including each team's league Position
     """
 
-    def create_table_records(row):
-        # TODO handle null values better (don't contaminate df)
-        home_row_data = dict()
-        home_row_data['TeamName'] = row.HomeTeam
-        home_row_data['HomeOrAway'] = 'Home'
-        home_row_data['MatchOpponent'] = row.AwayTeam
-        home_row_data['GoalsFor'] = float(row.HomeGoals)
-        home_row_data['GoalsAgainst'] = float(row.AwayGoals)
-        home_row_data['MatchDay'] = float(row.Round)
-        home_row_data['MatchId'] = row.Id
-        home_row_data['GoalDiff'] = float(row.HomeGoals) - float(row.AwayGoals)
-        home_row_data['GamesPlayed'] = 1
-        home_row_data['CompetitionSeason'] = row.CompetitionSeason
-        home_row_data['CompetitionName'] = row.CompetitionName
-        home_row_data['MatchDate'] = row.MatchDate
-
-        if home_row_data['GoalDiff'] > 0:
-            points = 3
-            home_row_data['GamesWon'] = 1
-        elif home_row_data['GoalDiff'] == 0:
-            points = 1
-            home_row_data['GamesDrawn'] = 1
-        else:
-            points = 0
-            home_row_data['GamesLost'] = 1
-
-        home_row_data['Points'] = points
-
-        # repeat for away team
-        away_row_data = dict()
-        away_row_data['TeamName'] = row.AwayTeam
-        away_row_data['HomeOrAway'] = 'Away'
-        away_row_data['MatchOpponent'] = row.HomeTeam
-        away_row_data['GoalsFor'] = float(row.AwayGoals)
-        away_row_data['GoalsAgainst'] = float(row.HomeGoals)
-        away_row_data['MatchDay'] = float(row.Round)
-        away_row_data['MatchId'] = row.Id
-        away_row_data['GoalDiff'] = float(row.AwayGoals) - float(row.HomeGoals)
-        away_row_data['GamesPlayed'] = 1
-        away_row_data['CompetitionSeason'] = row.CompetitionSeason
-        away_row_data['CompetitionName'] = row.CompetitionName
-        away_row_data['MatchDate'] = row.MatchDate
-
-        if away_row_data['GoalDiff'] > 0:
-            points = 3
-            away_row_data['GamesWon'] = 1
-        elif away_row_data['GoalDiff'] == 0:
-            points = 1
-            away_row_data['GamesDrawn'] = 1
-        else:
-            points = 0
-            away_row_data['GamesLost'] = 1
-
-        away_row_data['Points'] = points
-
-        return [home_row_data, away_row_data]
-
     season_dropped_df = season_detail_df.dropna(thresh=10)  # drop only records that are substantively blank
-    matches_records = season_dropped_df.apply(create_table_records, axis=1)
-    table_df_flat_list = [l for sublist in matches_records for l in sublist]
-    matches_df = pd.DataFrame.from_records(table_df_flat_list)
-
-    table_df = matches_df.groupby(['MatchDay', 'TeamName']).sum().groupby('TeamName').cumsum()\
-        .sort_values(by=['MatchDay', 'Points', 'GoalDiff'])
-    table_df = table_df.join(table_df.groupby('MatchDay').rank('average'), rsuffix='_Rank') # add relative ranking
+    # a no-op for get_season_matches_df output, which is typed already
+    season_dropped_df = apply_dtypes(season_dropped_df, {column: FIXTURE_DTYPES[column] for column in (
+        'Id', 'Round', 'HomeTeam', 'AwayTeam', 'HomeGoals', 'AwayGoals', 'MatchDate', 'CompetitionSeason',
+        'CompetitionName')})
+
+    matches_df = build_team_match_table(season_dropped_df.HomeTeam, season_dropped_df.AwayTeam,
+                                        season_dropped_df.HomeGoals, season_dropped_df.AwayGoals,
+                                        columns=XML_SOCCER_COLUMNS,
+                                        match_columns={
+                                            'MatchDay': season_dropped_df.Round,
+                                            'MatchId': season_dropped_df.Id,
+                                            'CompetitionSeason': season_dropped_df.CompetitionSeason,
+                                            'CompetitionName': season_dropped_df.CompetitionName,
+                                            'MatchDate': season_dropped_df.MatchDate,
+                                        },
+                                        match_dtypes=MATCH_COLUMN_DTYPES)
+
+    table_df = cumulative_table(matches_df, 'MatchDay', 'TeamName', columns=XML_SOCCER_COLUMNS)
+    table_df['Position'] = rank_standings(table_df, 'MatchDay', XML_SOCCER_COLUMNS)
+    table_df = table_df.sort_values(by=['MatchDay', 'Position'])
 
     return matches_df, table_df
@@ -0,0 +1,119 @@
+"""Cold start of each Cloud Function entry point: importing gcp.main, the first invocation and a warm one, each
+entry point in a fresh interpreter, as on a new instance.
+
+Runs locally: get_fpl_data fetches a synthetic bootstrap-static payload from a local HTTP server, both functions
+read and write blobs in a temporary directory, and write_gcp_tables_pubsub writes tables to an in-memory SQLite
+database. Creating and authenticating the Cloud Storage client isn't measured, though importing gcloud is, as
+part of the first invocation.
+
+Usage: python -m benchmarks.bench_cold_start
+"""
+
+import datetime as dt
+import gzip
+import http.server
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ENTRY_POINTS = ('get_fpl_data', 'write_gcp_tables_pubsub')
+WATCHED_MODULES = ('requests', 'gcloud', 'pandas', 'flask')
+PAYLOAD_FILE = 'bootstrap-static.json'
+
+
+def _serve(payload: bytes) -> http.server.HTTPServer:
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _loaded() -> list:
+    return [module for module in WATCHED_MODULES if module in sys.modules]
+
+
+def _child(entry_point: str, data_dir: str):
+    """Runs in a fresh interpreter: imports gcp.main, swaps in local backends, invokes entry_point twice."""
+    if entry_point == 'get_fpl_data':
+        with open(os.path.join(data_dir, PAYLOAD_FILE), 'rb') as f:
+            server = _serve(f.read())
+        os.environ['FPL_BOOTSTRAP_URL'] = f'http://127.0.0.1:{server.server_port}/api/bootstrap-static/'
+
+    start = time.perf_counter()
+    from gcp import main
+    import_s = time.perf_counter() - start
+    loaded_on_import = _loaded()
+
+    from gcp.storage_backends import LocalFileBackend
+
+    def storage_client():
+        from gcloud import storage  # imported, but a client needs credentials
+        return storage
+
+    main._storage_client = storage_client
+    main.GcsBackend = lambda bucket_name, client: LocalFileBackend(data_dir)
+    if entry_point == 'write_gcp_tables_pubsub':
+        def snapshot_writer():
+            from fpl_db.db import get_engine
+            from gcp.snapshot_tables import SnapshotWriter, SqliteTableBackend
+            return SnapshotWriter(SqliteTableBackend(get_engine(':memory:')))
+        main._snapshot_writer = snapshot_writer
+        raw_blobs = sorted(name for name in os.listdir(data_dir) if name.startswith(main.RAW_BLOB_PREFIX))
+
+    invocations_s = []
+    for invocation in range(2):
+        start = time.perf_counter()
+        if entry_point == 'get_fpl_data':
+            main.get_fpl_data(None)
+        else:
+            main.write_gcp_tables_pubsub({'bucket': main.FPL_BUCKET_NAME, 'name': raw_blobs[invocation]}, None)
+        invocations_s.append(time.perf_counter() - start)
+
+    print(json.dumps({'import': import_s, 'first': invocations_s[0], 'warm': invocations_s[1],
+                      'loaded_on_import': loaded_on_import, 'loaded_after': _loaded()}))
+
+
+def main():
+    from benchmarks import synthetic
+
+    print('seconds per entry point, each in a new interpreter')
+    for entry_point in ENTRY_POINTS:
+        with tempfile.TemporaryDirectory() as data_dir:
+            with open(os.path.join(data_dir, PAYLOAD_FILE), 'wb') as f:
+                f.write(json.dumps(synthetic.fpl_bootstrap_static()).encode('utf-8'))
+            for hour, (_, snapshot) in enumerate(synthetic.fpl_snapshots(2)):
+                blob_name = f'fpl_data_{dt.datetime(2019, 8, 1, hour).isoformat()}.json.gz'
+                with open(os.path.join(data_dir, blob_name), 'wb') as f:
+                    f.write(gzip.compress(json.dumps(snapshot).encode('utf-8')))
+
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_cold_start', entry_point, data_dir],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+
+        print(f'  {entry_point:<24} import {result["import"]:6.3f}s, first call {result["first"]:6.3f}s, '
+              f'warm call {result["warm"]:6.3f}s')
+        print(f'  {"":<24} loaded on import: {", ".join(result["loaded_on_import"]) or "none"}; '
+              f'after calls: {", ".join(result["loaded_after"]) or "none"}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        _child(*sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,39 @@
+"""Times create_feature_vector's stage pipeline cold, fully cached, and after changing one cheap stage.
+
+Usage: python -m benchmarks.bench_feature_pipeline [n_seasons]
+"""
+
+import sys
+import tempfile
+import time
+
+from analytics import features
+from analytics.pipeline import Pipeline
+from benchmarks import synthetic
+
+
+def main(n_seasons: int = 5):
+    season_detail_df = synthetic.xml_soccer_seasons(n_seasons, lineups=True)
+    sources = {'season_detail': season_detail_df, 'player_stats': synthetic.fifa_ratings()}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stages = features.feature_stages()
+        for run in ('cold', 'cached'):
+            pipeline = Pipeline(stages, cache_dir=cache_dir)
+            start = time.perf_counter()
+            pipeline.run(sources, targets=['features'])
+            print(f'{run} run: {time.perf_counter() - start:.2f}s')
+            print(pipeline.format_report())
+
+        # iterating on one feature: a different form window only reruns form and the final join
+        stages = [stage._replace(params={'n_lags': 3, 'window': 3}) if stage.name == 'form' else stage
+                  for stage in stages]
+        pipeline = Pipeline(stages, cache_dir=cache_dir)
+        start = time.perf_counter()
+        pipeline.run(sources, targets=['features'])
+        print(f'changed form window: {time.perf_counter() - start:.2f}s')
+        print(pipeline.format_report())
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
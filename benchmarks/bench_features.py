@@ -0,0 +1,61 @@
+"""Times the indexed lineup / formation lookups against the old per-row boolean mask, over 1, 5 and 20 seasons.
+
+Usage: python -m benchmarks.bench_features
+"""
+
+import time
+
+import pandas as pd
+
+from analytics import features
+from analytics.utils import flatten
+from api_handler import xml_soccer
+from benchmarks import synthetic
+
+
+def _legacy_lineup_vector(matches_df: pd.DataFrame, season_detail_df: pd.DataFrame) -> pd.Series:
+    """The boolean mask lookup get_match_lineup_vector used to run for every row of matches_df."""
+    def _find_lineup(match_id, home_or_away):
+        lineup_s = season_detail_df[season_detail_df.Id == match_id][
+            [f'{home_or_away}Lineup{position}' for position in features.LINEUP_POSITIONS]]
+
+        lineup_l = flatten([_.split(';') for _ in lineup_s.values[0]])
+        return [_.strip() for _ in lineup_l if _ != '']
+
+    return matches_df.apply(lambda x: _find_lineup(x.MatchId, x.HomeOrAway), axis=1)
+
+
+def _legacy_formation_vector(matches_df: pd.DataFrame, season_detail_df: pd.DataFrame) -> pd.Series:
+    return matches_df.apply(
+        lambda x: season_detail_df[season_detail_df.Id == x.MatchId][f'{x.HomeOrAway}TeamFormation'].values[0],
+        axis=1)
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(season_counts=(1, 5, 20)):
+    for n_seasons in season_counts:
+        season_detail_df = synthetic.xml_soccer_seasons(n_seasons, lineups=True)
+        matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+
+        legacy_lineups, legacy_lineup_s = _timed(_legacy_lineup_vector, matches_df, season_detail_df)
+        lineups, lineup_s = _timed(features.get_match_lineup_vector, matches_df, season_detail_df)
+        legacy_formations, legacy_formation_s = _timed(_legacy_formation_vector, matches_df, season_detail_df)
+        formations, formation_s = _timed(features.get_encoded_formation_vector, matches_df, season_detail_df)
+
+        assert legacy_lineups.tolist() == lineups.tolist()
+        assert legacy_formations.tolist() == formations.tolist()
+
+        print(f'{n_seasons:>2} seasons, {len(matches_df)} team-match rows')
+        print(f'  lineups:    mask {legacy_lineup_s:8.3f}s  indexed {lineup_s:8.3f}s  '
+              f'({legacy_lineup_s / lineup_s:.0f}x)')
+        print(f'  formations: mask {legacy_formation_s:8.3f}s  indexed {formation_s:8.3f}s  '
+              f'({legacy_formation_s / formation_s:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Times team_form_features against a per-row loop over each team's earlier matches, and adding one season
+incrementally with TeamFormFeatures against recomputing every season.
+
+Usage: python -m benchmarks.bench_form_features
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics import features
+from api_handler import xml_soccer
+from benchmarks import synthetic
+
+
+def _loop_form_features(matches_df: pd.DataFrame, n_lags: int = 3, window: int = 5) -> pd.DataFrame:
+    """The obvious implementation: for every row, filter the team's earlier matches and summarise them."""
+    rows = []
+    for _, match in matches_df.iterrows():
+        earlier_df = matches_df[(matches_df.TeamName == match.TeamName) & (matches_df.MatchDate < match.MatchDate)]
+        earlier_df = earlier_df.sort_values('MatchDate')
+        meetings_df = earlier_df[earlier_df.MatchOpponent == match.MatchOpponent]
+        recent_df = earlier_df.tail(window)
+
+        row = {'RestDays': (match.MatchDate - earlier_df.MatchDate.iloc[-1]).total_seconds() / 86400
+               if len(earlier_df) else np.nan}
+        for lag in range(1, n_lags + 1):
+            row[f'PointsLag{lag}'] = earlier_df.Points.iloc[-lag] if len(earlier_df) >= lag else np.nan
+        for column in ('Points', 'GoalsFor', 'GoalsAgainst'):
+            row[f'Form{column}'] = recent_df[column].mean() if len(recent_df) else np.nan
+        row['LastMeetingPoints'] = meetings_df.Points.iloc[-1] if len(meetings_df) else np.nan
+        rows.append(row)
+
+    return pd.DataFrame(rows, index=matches_df.index)
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(season_counts=(1, 5, 20)):
+    for n_seasons in season_counts:
+        season_detail_df = synthetic.xml_soccer_seasons(n_seasons)
+        matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+        matches_df = matches_df.reset_index(drop=True)
+
+        vectorised_df, vectorised_s = _timed(features.team_form_features, matches_df)
+        if n_seasons <= 5:
+            loop_df, loop_s = _timed(_loop_form_features, matches_df)
+            pd.testing.assert_frame_equal(loop_df, vectorised_df, check_dtype=False)
+            loop = f'loop {loop_s:8.3f}s  '
+            speedup = f'  ({loop_s / vectorised_s:.0f}x)'
+        else:
+            loop = speedup = ''
+
+        last_season = matches_df.CompetitionSeason == matches_df.CompetitionSeason.iloc[-1]
+        form = features.TeamFormFeatures()
+        form.update(matches_df[~last_season])
+        incremental_df, incremental_s = _timed(form.update, matches_df[last_season])
+        pd.testing.assert_frame_equal(incremental_df, vectorised_df[last_season])
+
+        print(f'{n_seasons:>2} seasons, {len(matches_df)} team-match rows')
+        print(f'  all rows:        {loop}vectorised {vectorised_s:8.3f}s{speedup}')
+        print(f'  add last season: incremental {incremental_s:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
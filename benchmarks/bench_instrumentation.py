@@ -0,0 +1,61 @@
+"""What instrumentation costs: per span while disabled and enabled, and on a run of SnapshotWriter writes with
+recording off, on, and on with tracemalloc.
+
+Usage: python -m benchmarks.bench_instrumentation [n_snapshots]
+"""
+
+import sys
+import time
+
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+import instrumentation
+from gcp.snapshot_tables import SnapshotWriter, SqliteTableBackend
+
+
+@instrumentation.timed('bench.noop')
+def _noop():
+    return None
+
+
+def _per_call_ns(n_calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        with instrumentation.span('bench.span', table='players') as s:
+            s.record(rows=1)
+        _noop()
+    return (time.perf_counter() - start) / n_calls * 1e9
+
+
+def _write_seconds(snapshots) -> float:
+    writer = SnapshotWriter(SqliteTableBackend(get_engine(':memory:')))
+    start = time.perf_counter()
+    for snapshot_time, snapshot in snapshots:
+        writer.write(snapshot, snapshot_time)
+    return time.perf_counter() - start
+
+
+def main(n_snapshots: int = 24, n_calls: int = 100000):
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        _noop.__wrapped__()
+    baseline_ns = (time.perf_counter() - start) / n_calls * 1e9
+
+    print(f'a span and a timed call per iteration, {n_calls} iterations (bare call {baseline_ns:.0f}ns)')
+    print(f'  disabled: {_per_call_ns(n_calls):8.0f}ns')
+    with instrumentation.recording():
+        print(f'  enabled:  {_per_call_ns(n_calls // 10):8.0f}ns')
+
+    snapshots = list(synthetic.fpl_snapshots(n_snapshots))
+    print(f'{n_snapshots} SnapshotWriter writes of 600 players')
+    _write_seconds(snapshots[:2])  # warm up
+    disabled_s = _write_seconds(snapshots)
+    print(f'  disabled:             {disabled_s:7.3f}s')
+    for label, kwargs in (('enabled', {}), ('enabled, tracemalloc', {'trace_memory': True})):
+        with instrumentation.recording(**kwargs) as recorder:
+            seconds = _write_seconds(snapshots)
+        print(f'  {label + ":":<21} {seconds:7.3f}s ({seconds / disabled_s - 1:+.1%}, {len(recorder.spans)} spans)')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,96 @@
+"""Compares the columnar league table engine with the old row-wise apply on a synthetic 50-season dataset.
+
+Usage: python -m benchmarks.bench_league_table [n_seasons]
+"""
+
+import sys
+import time
+
+import pandas as pd
+
+from api_handler import xml_soccer
+from benchmarks import synthetic
+
+
+def _legacy_process_season_matches(season_detail_df: pd.DataFrame):
+    """The row-wise implementation process_season_matches used before the columnar engine."""
+
+    def create_table_records(row):
+        records = []
+        for team, opponent, home_or_away, goals_for, goals_against in (
+                (row.HomeTeam, row.AwayTeam, 'Home', row.HomeGoals, row.AwayGoals),
+                (row.AwayTeam, row.HomeTeam, 'Away', row.AwayGoals, row.HomeGoals)):
+            row_data = dict()
+            row_data['TeamName'] = team
+            row_data['HomeOrAway'] = home_or_away
+            row_data['MatchOpponent'] = opponent
+            row_data['GoalsFor'] = float(goals_for)
+            row_data['GoalsAgainst'] = float(goals_against)
+            row_data['MatchDay'] = float(row.Round)
+            row_data['MatchId'] = row.Id
+            row_data['GoalDiff'] = float(goals_for) - float(goals_against)
+            row_data['GamesPlayed'] = 1
+            row_data['CompetitionSeason'] = row.CompetitionSeason
+            row_data['CompetitionName'] = row.CompetitionName
+            row_data['MatchDate'] = row.MatchDate
+
+            if row_data['GoalDiff'] > 0:
+                points = 3
+                row_data['GamesWon'] = 1
+            elif row_data['GoalDiff'] == 0:
+                points = 1
+                row_data['GamesDrawn'] = 1
+            else:
+                points = 0
+                row_data['GamesLost'] = 1
+
+            row_data['Points'] = points
+            records.append(row_data)
+
+        return records
+
+    season_dropped_df = season_detail_df.dropna(thresh=10)
+    matches_records = season_dropped_df.apply(create_table_records, axis=1)
+    matches_df = pd.DataFrame.from_records([l for sublist in matches_records for l in sublist])
+
+    numeric_cols = ['GoalsFor', 'GoalsAgainst', 'GoalDiff', 'GamesPlayed', 'GamesWon', 'GamesDrawn', 'GamesLost',
+                    'Points']
+    table_df = matches_df.groupby(['MatchDay', 'TeamName'])[numeric_cols].sum().groupby('TeamName').cumsum()\
+        .sort_values(by=['MatchDay', 'Points', 'GoalDiff'])
+    table_df = table_df.join(table_df.groupby('MatchDay').rank('average'), rsuffix='_Rank')
+
+    return matches_df, table_df
+
+
+def _time_seasons(process_func, seasons) -> float:
+    start = time.perf_counter()
+    for season_df in seasons:
+        process_func(season_df)
+    return time.perf_counter() - start
+
+
+def main(n_seasons: int = 50):
+    seasons = [synthetic.xml_soccer_season(1970 + s) for s in range(n_seasons)]
+    n_matches = sum(len(s) for s in seasons)
+
+    # both implementations must agree before their timings mean anything
+    legacy_matches_df, legacy_table_df = _legacy_process_season_matches(seasons[0])
+    matches_df, table_df = xml_soccer.process_season_matches(seasons[0])
+    # the columnar engine returns compact dtypes, so compare values in the legacy dtypes
+    matches_df = matches_df[legacy_matches_df.columns].astype(legacy_matches_df.dtypes.to_dict())
+    pd.testing.assert_frame_equal(legacy_matches_df, matches_df)
+    legacy_table_df = legacy_table_df[[c for c in legacy_table_df.columns if not c.endswith('_Rank')]].reset_index()
+    table_df = table_df.reset_index()[legacy_table_df.columns].astype(legacy_table_df.dtypes.to_dict())
+    pd.testing.assert_frame_equal(legacy_table_df.sort_values(['MatchDay', 'TeamName'], ignore_index=True),
+                                  table_df.sort_values(['MatchDay', 'TeamName'], ignore_index=True))
+
+    legacy_s = _time_seasons(_legacy_process_season_matches, seasons)
+    columnar_s = _time_seasons(xml_soccer.process_season_matches, seasons)
+
+    print(f'{n_seasons} seasons, {n_matches} matches')
+    print(f'row-wise apply:  {legacy_s:8.3f}s')
+    print(f'columnar engine: {columnar_s:8.3f}s  ({legacy_s / columnar_s:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,48 @@
+"""Times fitting DixonColesModel against the number of seasons, and batched prediction against predicting one
+fixture at a time.
+
+Usage: python -m benchmarks.bench_match_predictor
+"""
+
+import time
+
+import numpy as np
+
+from analytics.fpl_match_predictor import DixonColesModel
+from api_handler import xml_soccer
+from benchmarks import synthetic
+
+
+def main(season_counts=(1, 5, 20), n_fixtures=200000, n_looped=2000):
+    for n_seasons in season_counts:
+        season_detail_df = synthetic.xml_soccer_seasons(n_seasons, team_strength=0.3)
+        matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+
+        start = time.perf_counter()
+        model = DixonColesModel(half_life_days=365).fit(matches_df)
+        fit_s = time.perf_counter() - start
+
+        attack, _ = synthetic.team_strengths(len(model.teams), spread=0.3)
+        print(f'{n_seasons:>2} seasons, {len(matches_df)} team-match rows: fit {fit_s:7.3f}s, '
+              f'attack correlation {np.corrcoef(attack, model.attack)[0, 1]:.3f}')
+
+    rng = np.random.RandomState(0)
+    home_teams = model.teams[rng.randint(len(model.teams), size=n_fixtures)]
+    away_teams = model.teams[rng.randint(len(model.teams), size=n_fixtures)]
+
+    start = time.perf_counter()
+    batch_df = model.predict(home_teams, away_teams)
+    batch_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for home_team, away_team in zip(home_teams[:n_looped], away_teams[:n_looped]):
+        model.predict([home_team], [away_team])
+    loop_s = time.perf_counter() - start
+
+    assert np.allclose(batch_df[['HomeWin', 'Draw', 'AwayWin']].sum(axis=1), 1)
+    print(f'predict batched:    {n_fixtures / batch_s:12,.0f} fixtures/s')
+    print(f'predict one by one: {n_looped / loop_s:12,.0f} fixtures/s  ({loop_s / n_looped * n_fixtures / batch_s:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
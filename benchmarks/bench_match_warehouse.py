@@ -0,0 +1,85 @@
+"""Times ingesting 20 seasons of fixtures, lineups and standings into a SQLite MatchWarehouse, against adding the
+same matches and lineups as ORM objects, and times its loaders.
+
+Usage: python -m benchmarks.bench_match_warehouse [n_seasons]
+"""
+
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import Session
+
+from api_handler import xml_soccer
+from api_handler.schema import apply_dtypes
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+from fpl_db.match_warehouse import _epoch_seconds, _lineup_rows, MatchWarehouse
+from fpl_db.schemas import LineupPlayer, Match
+
+
+def _orm_ingest(engine, season_detail_df, season_id=1):
+    """The per-object way: one Match and one LineupPlayer object per row, added to a session."""
+    fixtures_df = apply_dtypes(season_detail_df, xml_soccer.FIXTURE_DTYPES)
+    team_ids = {name: i for i, name in enumerate(sorted(fixtures_df.HomeTeam.astype(str).unique()), start=1)}
+    match_dates = _epoch_seconds(fixtures_df.MatchDate)
+
+    with Session(engine) as session:
+        for fixture, match_date in zip(fixtures_df.itertuples(), match_dates):
+            session.add(Match(match_id=int(fixture.Id), season_id=season_id, matchday=int(fixture.Round),
+                              match_date=int(match_date), home_team_id=team_ids[fixture.HomeTeam],
+                              away_team_id=team_ids[fixture.AwayTeam], home_goals=int(fixture.HomeGoals),
+                              away_goals=int(fixture.AwayGoals), home_formation=fixture.HomeTeamFormation,
+                              away_formation=fixture.AwayTeamFormation))
+        for player in _lineup_rows(fixtures_df).itertuples():
+            session.add(LineupPlayer(match_id=int(player.match_id), home_or_away=player.home_or_away,
+                                     slot=int(player.slot), position=player.position,
+                                     player_name=player.player_name))
+        session.commit()
+
+
+def _timed(func, *args, repeat=1):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main(n_seasons: int = 20):
+    season_detail_df = synthetic.xml_soccer_seasons(n_seasons, lineups=True)
+    seasons = season_detail_df.CompetitionSeason.unique()
+    tables = {season: xml_soccer.process_season_matches(season_detail_df[season_detail_df.CompetitionSeason ==
+                                                                         season])[1] for season in seasons}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        warehouse = MatchWarehouse(get_engine(os.path.join(tmp_dir, 'warehouse.db')))
+        _, ingest_s = _timed(warehouse.upsert_fixtures, season_detail_df)
+        _, reingest_s = _timed(warehouse.upsert_fixtures, season_detail_df)
+        _, standings_s = _timed(lambda: [warehouse.upsert_standings(table_df, 'Synthetic League', season)
+                                         for season, table_df in tables.items()])
+        _, orm_s = _timed(_orm_ingest, get_engine(os.path.join(tmp_dir, 'orm.db')), season_detail_df)
+        db_mb = os.path.getsize(os.path.join(tmp_dir, 'warehouse.db')) / 1e6
+
+        print(f'{n_seasons} seasons, {len(season_detail_df)} fixtures, {db_mb:.1f}MB database')
+        print(f'  ORM objects, matches and lineups:  {orm_s:8.3f}s')
+        print(f'  bulk upsert, matches and lineups:  {ingest_s:8.3f}s  ({orm_s / ingest_s:.1f}x faster)')
+        print(f'  bulk upsert again, updating:       {reingest_s:8.3f}s')
+        print(f'  bulk upsert, {n_seasons} seasons standings: {standings_s:8.3f}s')
+
+        season_df, season_s = _timed(warehouse.matches, 'Synthetic League', seasons[-1], repeat=5)
+        lineups_df, lineups_s = _timed(lambda: warehouse.matches('Synthetic League', seasons[-1],
+                                                                 with_lineups=True), repeat=5)
+        team_df, team_s = _timed(lambda: warehouse.matches(team='Team 07', start=dt.datetime(1980, 1, 1)), repeat=5)
+        standings_df, table_s = _timed(warehouse.standings, 'Synthetic League', seasons[-1], 19, repeat=5)
+        print(f'  one season:                {season_s * 1000:8.1f}ms, {len(season_df)} rows')
+        print(f'  one season with lineups:   {lineups_s * 1000:8.1f}ms, {len(lineups_df)} rows')
+        print(f'  one team since 1980:       {team_s * 1000:8.1f}ms, {len(team_df)} rows')
+        print(f'  standings after matchday:  {table_s * 1000:8.1f}ms, {len(standings_df)} rows')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,68 @@
+"""Accuracy vs speed of PlayerNameResolver against the brute-force difflib scan over every ratings row.
+
+Brute force is slow enough that it only runs on a sample of distinct lineup names.
+
+Usage: python -m benchmarks.bench_name_matching [n_sample_names]
+"""
+
+import sys
+import time
+
+from analytics import features
+from analytics.name_matching import PlayerNameResolver
+from analytics.utils import compute_diff
+from api_handler import xml_soccer
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+from fpl_db.player_identity import PlayerIdentityStore
+
+
+def main(n_sample_names: int = 100):
+    season_detail_df = synthetic.xml_soccer_season(2018, lineups=True)
+    matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+    lineup_s = features.get_match_lineup_vector(matches_df, season_detail_df)
+    player_stats_df = synthetic.fifa_ratings()
+
+    names = sorted({name for lineup in lineup_s for name in lineup})
+    sample = names[:n_sample_names]
+    print(f'{len(player_stats_df)} ratings rows, {len(lineup_s)} lineups, {len(names)} distinct names')
+
+    key_matching_col = player_stats_df.Name.str.cat(player_stats_df.Club, sep=' ')
+    start = time.perf_counter()
+    brute_force = {name: key_matching_col.apply(compute_diff, args=(name,)).idxmax() for name in sample}
+    brute_force_s = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    resolver = PlayerNameResolver(player_stats_df)
+    resolver.shortlist('')
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    resolved = resolver.resolve_many(names)
+    resolve_s = (time.perf_counter() - start) / len(names)
+
+    start = time.perf_counter()
+    features.get_lineup_stats_vector(lineup_s, player_stats_df, resolver)
+    season_s = time.perf_counter() - start
+
+    agreement = sum(resolved[name].index == brute_force[name] for name in sample) / len(sample)
+    correct = sum(player_stats_df.FullName.loc[resolved[name].index] == name for name in names) / len(names)
+    brute_force_correct = sum(player_stats_df.FullName.loc[brute_force[name]] == name for name in sample) / len(sample)
+    low_confidence = sum(match.margin < 0.05 for match in resolved.values())
+
+    print(f'brute force:  {1000 * brute_force_s:8.2f}ms per name, {brute_force_correct:.1%} correct')
+    print(f'resolver:     {1000 * resolve_s:8.2f}ms per name, {correct:.1%} correct, '
+          f'{agreement:.1%} agree with brute force ({1000 * build_s:.0f}ms index build)')
+    print(f'{brute_force_s / resolve_s:.0f}x faster per name; {low_confidence} matches with margin < 0.05')
+    print(f'full season of lineup ratings with a warm resolver: {season_s:.3f}s, '
+          f'estimated brute force {brute_force_s * len(names):.0f}s')
+
+    store = PlayerIdentityStore(get_engine(':memory:'))
+    for run in ('first', 'second'):
+        start = time.perf_counter()
+        features.get_lineup_stats_vector(lineup_s, player_stats_df, store=store)
+        print(f'{run} run with a player identity store: {time.perf_counter() - start:.3f}s')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
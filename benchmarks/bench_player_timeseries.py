@@ -0,0 +1,84 @@
+"""A season of hourly snapshots in PlayerTimeSeriesStore vs the players.<year>_event_<n> table per event layout.
+
+The per-event layout (written here to SQLite, as write_gcp_tables_pubsub wrote to BigQuery) keeps only the
+last snapshot of each event, and a player's history means unioning every table. The store keeps every change.
+As every write replaced the event's table, only the last snapshot of each event is written to it here.
+
+Usage: python -m benchmarks.bench_player_timeseries [n_snapshots] [n_players]
+"""
+
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+from fpl_db.player_timeseries import PlayerTimeSeriesStore
+
+
+def _timed(f, repeat: int = 20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = f()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(n_snapshots: int = 38 * 7 * 24, n_players: int = 600):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_engine = get_engine(os.path.join(tmp_dir, 'legacy.db'))
+        store = PlayerTimeSeriesStore(get_engine(os.path.join(tmp_dir, 'timeseries.db')))
+
+        def legacy_write(snapshot):
+            players_df = pd.DataFrame.from_records(snapshot['elements'])
+            players_df.to_sql(f"players_event_{snapshot['current-event']}", legacy_engine, if_exists='replace',
+                              index=False)
+
+        store_s = 0.0
+        times = []
+        previous = None
+        for snapshot_time, snapshot in synthetic.fpl_snapshots(n_snapshots, n_players):
+            times.append(snapshot_time)
+            if previous is not None and previous['current-event'] != snapshot['current-event']:
+                legacy_write(previous)
+            previous = snapshot
+
+            start = time.perf_counter()
+            store.append_snapshot(snapshot, snapshot_time)
+            store_s += time.perf_counter() - start
+        legacy_write(previous)
+
+        n_rows = pd.read_sql('SELECT COUNT(*) AS n FROM player_snapshots', store.engine).n[0]
+        tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'players_event_%'",
+                             legacy_engine).name
+
+        def legacy_history():
+            union = ' UNION ALL '.join(f'SELECT id, now_cost, selected_by_percent, {i} AS event FROM {table} '
+                                       f'WHERE id = 191' for i, table in enumerate(tables))
+            return pd.read_sql(union, legacy_engine)
+
+        mid_season = times[len(times) // 2] + dt.timedelta(minutes=30)
+        legacy_history_df, legacy_history_s = _timed(legacy_history)
+        history_df, history_s = _timed(lambda: store.history(element_ids=[191]))
+        _, season_history_s = _timed(lambda: store.history(team=5, start=times[0], end=times[-1]), repeat=5)
+        as_of_df, as_of_s = _timed(lambda: store.as_of(mid_season))
+        _, team_as_of_s = _timed(lambda: store.as_of(mid_season, team=5))
+
+        legacy_mb = os.path.getsize(os.path.join(tmp_dir, 'legacy.db')) / 1e6
+        store_mb = os.path.getsize(os.path.join(tmp_dir, 'timeseries.db')) / 1e6
+
+    print(f'{n_snapshots} hourly snapshots of {n_players} players ({len(tables)} events)')
+    print(f'per event tables: {legacy_mb:6.1f}MB, {len(legacy_history_df)} points of one player history in '
+          f'{1000 * legacy_history_s:.1f}ms')
+    print(f'time series:      {store_mb:6.1f}MB, {n_rows} rows written in {store_s:.1f}s '
+          f'({1000 * store_s / n_snapshots:.1f}ms per snapshot), {len(history_df)} points of one player history in '
+          f'{1000 * history_s:.1f}ms')
+    print(f'one team over the season: {1000 * season_history_s:.1f}ms; as of lookup of all {len(as_of_df)} players: '
+          f'{1000 * as_of_s:.1f}ms, of one team: {1000 * team_as_of_s:.1f}ms')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,55 @@
+"""Compares rank_standings with the groupby rank and join process_season_matches used to add ranks to its table.
+
+Usage: python -m benchmarks.bench_rank_standings [n_seasons]
+"""
+
+import sys
+import time
+
+from api_handler import league_table, xml_soccer
+from api_handler.league_table import XML_SOCCER_COLUMNS
+from benchmarks import synthetic
+
+
+def _rank_and_join(table_df):
+    table_df = table_df.sort_values(by=['MatchDay', 'Points', 'GoalDiff'])
+    return table_df.join(table_df.groupby('MatchDay').rank('average'), rsuffix='_Rank')
+
+
+def _rank_standings(table_df):
+    table_df = table_df.assign(Position=league_table.rank_standings(table_df, 'MatchDay', XML_SOCCER_COLUMNS))
+    return table_df.sort_values(by=['MatchDay', 'Position'])
+
+
+def _timed(func, tables, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(table_df) for table_df in tables]
+        best = min(best, time.perf_counter() - start)
+    return sum(df.memory_usage(deep=True).sum() for df in results) / 1e6, results[0].shape[1], best
+
+
+def main(n_seasons: int = 50):
+    season_detail_df = synthetic.xml_soccer_seasons(n_seasons)
+    matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+
+    # one table per season, as process_season_matches builds them, and one table over every season's rows
+    seasons = [matches_df[matches_df.CompetitionSeason == season] for season in matches_df.CompetitionSeason.unique()]
+    season_tables = [league_table.cumulative_table(df, 'MatchDay', 'TeamName', columns=XML_SOCCER_COLUMNS)
+                     for df in seasons]
+    matches_df = matches_df.assign(MatchDay=matches_df.MatchDay + 100 * matches_df.CompetitionSeason.factorize()[0])
+    all_seasons_table = league_table.cumulative_table(matches_df, 'MatchDay', 'TeamName', columns=XML_SOCCER_COLUMNS)
+
+    for label, tables in ((f'{n_seasons} season tables', season_tables),
+                          (f'one {len(all_seasons_table)} row table', [all_seasons_table])):
+        join_mb, join_columns, join_s = _timed(_rank_and_join, tables)
+        rank_mb, rank_columns, rank_s = _timed(_rank_standings, tables)
+        print(f'{label}:')
+        print(f'  rank and join:  {join_s:8.3f}s, {join_columns} columns, {join_mb:6.2f}MB')
+        print(f'  rank_standings: {rank_s:8.3f}s, {rank_columns} columns, {rank_mb:6.2f}MB  '
+              f'({join_s / rank_s:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
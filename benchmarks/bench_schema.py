@@ -0,0 +1,61 @@
+"""Reports the memory used by 20 seasons of fixtures, team-match rows and standings, typed with api_handler.schema
+and with the dtypes the handlers used before it: object strings, float64 counts and float64 / int64 totals.
+
+Usage: python -m benchmarks.bench_schema [n_seasons]
+"""
+
+import sys
+
+import pandas as pd
+
+from api_handler import xml_soccer
+from api_handler.schema import apply_dtypes, memory_report
+from benchmarks import synthetic
+
+# FIXTURE_DTYPES before the schema layer; every other column stayed a string
+_OLD_FIXTURE_DTYPES = {column: 'float64' for column, dtype in xml_soccer.FIXTURE_DTYPES.items()
+                       if dtype.startswith('int')}
+_OLD_FIXTURE_DTYPES.update(Id='int64', Date='datetime64[ns]', MatchDate='datetime64[ns]')
+
+
+def _untyped(df: pd.DataFrame, old_dtypes: dict = None) -> pd.DataFrame:
+    """df with the dtypes it had before the schema layer: strings as objects, counts with gaps as float64 and
+    other counts as int64, unless old_dtypes says otherwise."""
+    converted = dict()
+    for column, values in df.items():
+        if column in (old_dtypes or {}):
+            converted[column] = values.astype(old_dtypes[column])
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            converted[column] = values.astype(object)
+        elif pd.api.types.is_integer_dtype(values):
+            converted[column] = values.astype('float64' if values.hasnans else 'int64')
+        elif pd.api.types.is_string_dtype(values):
+            converted[column] = values.astype(object)
+    return df.assign(**converted)
+
+
+def main(n_seasons: int = 20):
+    season_detail_df = synthetic.xml_soccer_seasons(n_seasons)
+    typed_fixtures_df = apply_dtypes(season_detail_df, xml_soccer.FIXTURE_DTYPES)
+    matches_df, table_df = xml_soccer.process_season_matches(typed_fixtures_df)
+
+    untyped = memory_report({
+        'fixtures': _untyped(typed_fixtures_df, _OLD_FIXTURE_DTYPES),
+        'team-match rows': _untyped(matches_df, {'MatchDay': 'float64'}),
+        'standings': _untyped(table_df.reset_index(), {'MatchDay': 'float64'}),
+    })
+    typed = memory_report({
+        'fixtures': typed_fixtures_df,
+        'team-match rows': matches_df,
+        'standings': table_df.reset_index(),
+    })
+
+    report_df = pd.concat({'before MB': untyped.MB, 'typed MB': typed.MB}, axis=1)
+    report_df.insert(0, 'rows', typed.rows.astype(int))
+    report_df['saving'] = 1 - report_df['typed MB'] / report_df['before MB']
+    print(f'{n_seasons} seasons')
+    print(report_df.to_string(float_format=lambda x: f'{x:8.2f}'))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
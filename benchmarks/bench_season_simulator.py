@@ -0,0 +1,45 @@
+"""Times simulate_season on the second half of a 20 team season, in one process and over process pools of
+increasing size.
+
+Usage: python -m benchmarks.bench_season_simulator
+"""
+
+import os
+import time
+
+from analytics.fpl_match_predictor import DixonColesModel
+from analytics.season_simulator import simulate_season
+from api_handler import xml_soccer
+from api_handler.league_table import LeagueTable, XML_SOCCER_COLUMNS
+from benchmarks import synthetic
+
+
+def main(n_sims=200000, worker_counts=(1, 2, 4, 8)):
+    season_detail_df = synthetic.xml_soccer_seasons(3, team_strength=0.3)
+    matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+
+    current_season = season_detail_df.CompetitionSeason.iloc[-1]
+    played = (matches_df.CompetitionSeason != current_season) | (matches_df.MatchDay <= 19)
+    model = DixonColesModel(half_life_days=365).fit(matches_df[played])
+
+    season_matches_df = matches_df[played & (matches_df.CompetitionSeason == current_season)]
+    standings_df = LeagueTable.from_matches(season_matches_df, XML_SOCCER_COLUMNS, 'MatchDay', 'MatchId').standings()
+    remaining_df = season_detail_df[(season_detail_df.CompetitionSeason == current_season) &
+                                    (season_detail_df.Round.astype(float) > 19)]
+    fixtures_df = model.predict(remaining_df.HomeTeam, remaining_df.AwayTeam)
+
+    print(f'{len(fixtures_df)} remaining fixtures, {n_sims} simulated seasons, {os.cpu_count()} CPUs')
+    baseline_s = None
+    for max_workers in worker_counts:
+        start = time.perf_counter()
+        positions_df = simulate_season(standings_df, fixtures_df, n_sims=n_sims, max_workers=max_workers)
+        seconds = time.perf_counter() - start
+        baseline_s = baseline_s or seconds
+        print(f'  {max_workers} worker(s): {seconds:7.3f}s, {n_sims / seconds:10,.0f} seasons/s '
+              f'({baseline_s / seconds:.1f}x)')
+
+    print(positions_df.iloc[:, :4].head().round(3))
+
+
+if __name__ == '__main__':
+    main()
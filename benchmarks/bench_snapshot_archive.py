@@ -0,0 +1,52 @@
+"""Storage and read cost of a run of hourly bootstrap-static snapshots: a full JSON blob per tick, a gzipped blob
+per tick, and SnapshotArchive's gzipped bases plus deltas.
+
+Usage: python -m benchmarks.bench_snapshot_archive [n_snapshots] [base_every]
+"""
+
+import gzip
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from gcp.snapshot_archive import SnapshotArchive
+from gcp.storage_backends import LocalFileBackend
+
+
+def main(n_snapshots: int = 168, base_every: int = 24):
+    snapshots = list(synthetic.fpl_snapshots(n_snapshots))
+    raw_bytes = sum(len(json.dumps(snapshot).encode('utf-8')) for _, snapshot in snapshots)
+    gzip_bytes = sum(len(gzip.compress(json.dumps(snapshot).encode('utf-8'))) for _, snapshot in snapshots)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = LocalFileBackend(tmp_dir)
+        archive = SnapshotArchive(backend, base_every=base_every)
+
+        start = time.perf_counter()
+        for snapshot_time, snapshot in snapshots:
+            archive.write(snapshot, snapshot_time)
+        write_s = (time.perf_counter() - start) / n_snapshots
+        archive_bytes = backend.size()
+
+        read_times = []
+        for snapshot_time, snapshot in snapshots[::7]:
+            start = time.perf_counter()
+            assert SnapshotArchive(backend).read(snapshot_time) == snapshot
+            read_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        n_replayed = sum(1 for _ in archive.replay())
+        replay_s = time.perf_counter() - start
+
+    print(f'{n_snapshots} hourly snapshots, a base every {base_every}')
+    print(f'raw JSON:  {raw_bytes / 1e6:8.2f}MB')
+    print(f'gzip JSON: {gzip_bytes / 1e6:8.2f}MB ({raw_bytes / gzip_bytes:.0f}x smaller)')
+    print(f'archive:   {archive_bytes / 1e6:8.2f}MB ({raw_bytes / archive_bytes:.0f}x smaller)')
+    print(f'write {1000 * write_s:.1f}ms per snapshot; cold point-in-time read {1000 * max(read_times):.0f}ms worst, '
+          f'{1000 * sum(read_times) / len(read_times):.0f}ms mean; replay of {n_replayed} snapshots {replay_s:.2f}s')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,53 @@
+"""Writing a run of hourly bootstrap-static snapshots: the old replace-every-table loop vs SnapshotWriter.
+
+Both write to a local SQLite database. The old loop replaces each table with the full snapshot, so it writes
+every row every hour; SnapshotWriter appends only the rows that changed, keeping the full history.
+
+Usage: python -m benchmarks.bench_snapshot_writer [n_snapshots] [n_players]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+from gcp.snapshot_tables import SNAPSHOT_TABLES, SnapshotWriter, SqliteTableBackend
+
+
+def _legacy_write(snapshot, engine):
+    """The loop write_gcp_tables_pubsub used to run, with to_sql in place of to_gbq."""
+    for table_name, key in SNAPSHOT_TABLES.items():
+        df = pd.DataFrame.from_records(snapshot[key])
+        df = df.apply(lambda c: c.map(str) if c.map(lambda v: isinstance(v, (list, dict))).any() else c)
+        df['date_created'] = '2019-08-01'
+        df['current_event'] = snapshot['current-event']
+        df.to_sql(table_name, engine, if_exists='replace', index=False)
+    return sum(len(snapshot[key]) for key in SNAPSHOT_TABLES.values())
+
+
+def main(n_snapshots: int = 48, n_players: int = 600):
+    snapshots = list(synthetic.fpl_snapshots(n_snapshots, n_players))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_engine = get_engine(os.path.join(tmp_dir, 'legacy.db'))
+        start = time.perf_counter()
+        legacy_rows = sum(_legacy_write(snapshot, legacy_engine) for _, snapshot in snapshots)
+        legacy_s = time.perf_counter() - start
+
+        writer = SnapshotWriter(SqliteTableBackend(get_engine(os.path.join(tmp_dir, 'snapshots.db'))))
+        start = time.perf_counter()
+        rows = sum(sum(writer.write(snapshot, snapshot_time).values()) for snapshot_time, snapshot in snapshots)
+        writer_s = time.perf_counter() - start
+
+    print(f'{n_snapshots} snapshots of {n_players} players')
+    print(f'replace every table: {legacy_s:.2f}s, {legacy_rows} rows written, only the last snapshot kept')
+    print(f'SnapshotWriter:      {writer_s:.2f}s, {rows} rows written, full history kept '
+          f'({legacy_s / writer_s:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
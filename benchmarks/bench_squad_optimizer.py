@@ -0,0 +1,79 @@
+"""Times optimise_squad on 600 player bootstrap-static snapshots, then optimise_scenarios on noisy projections of
+one snapshot's points, in one process and over process pools of increasing size.
+
+The heavy-club snapshots double the points of two clubs' players, so that the best squad ignoring the club limit
+has far more than 3 of each and the branch and bound has to work for its answer. The strong-club players are
+harder still: costs of 40-130 only loosely tied to points, and three clubs whose players score 1.8 times as much,
+so that many near-equal ways of choosing between them have to be ruled out. They are also solved with a time limit.
+
+Usage: python -m benchmarks.bench_squad_optimizer
+"""
+
+import datetime as dt
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics.squad_optimizer import optimise_scenarios, optimise_squad
+from benchmarks import synthetic
+from gcp.snapshot_tables import snapshot_table
+
+
+def _players(seed):
+    return snapshot_table(synthetic.fpl_bootstrap_static(600, seed=seed), 'players', dt.datetime(2019, 8, 1))
+
+
+def _heavy_club_players(seed):
+    players_df = _players(seed)
+    players_df.loc[players_df.team.isin([1, 2]), 'ep_next'] *= 2
+    return players_df
+
+
+def _strong_club_players(seed, n_players=600, n_teams=20):
+    rng = np.random.RandomState(seed)
+    costs = rng.randint(40, 131, n_players)
+    teams = rng.randint(1, n_teams + 1, n_players)
+    points = rng.gamma(2.0, 1.5, n_players) * (0.5 + costs / 130)
+    return pd.DataFrame({'id': np.arange(1, n_players + 1), 'team': teams,
+                         'element_type': rng.choice([1, 2, 3, 4], n_players, p=[0.1, 0.33, 0.4, 0.17]),
+                         'now_cost': costs, 'ep_next': np.where(teams <= 3, 1.8 * points, points)})
+
+
+def main(n_snapshots=5, n_scenarios=200, worker_counts=(1, 2, 4), n_strong_club=10, time_limit=0.2):
+    cases = [('plain snapshots', _players, n_snapshots, None),
+             ('heavy club snapshots', _heavy_club_players, n_snapshots, None),
+             ('strong club players', _strong_club_players, n_strong_club, None),
+             (f'strong club players, {time_limit}s limit', _strong_club_players, n_strong_club, time_limit)]
+    for name, players, n_seeds, limit in cases:
+        timings, squads = [], []
+        for seed in range(n_seeds):
+            players_df = players(seed)
+            start = time.perf_counter()
+            squads.append(optimise_squad(players_df, time_limit=limit))
+            timings.append(time.perf_counter() - start)
+        print(f'{name}: {np.mean(timings) * 1000:6.1f}ms mean, {np.max(timings) * 1000:6.1f}ms max per squad '
+              f'({np.mean([squad.expected_points for squad in squads]):.2f} points mean)')
+
+    players_df = _players(0)
+    noise = np.random.RandomState(0).gamma(16.0, 1 / 16, (n_scenarios, len(players_df)))
+    scenario_points = players_df.ep_next.to_numpy() * noise
+
+    print(f'{n_scenarios} projection scenarios, {os.cpu_count()} CPUs')
+    baseline_s = None
+    for max_workers in worker_counts:
+        start = time.perf_counter()
+        squads = optimise_scenarios(players_df, scenario_points, max_workers=max_workers)
+        seconds = time.perf_counter() - start
+        baseline_s = baseline_s or seconds
+        print(f'  {max_workers} worker(s): {seconds:7.3f}s, {n_scenarios / seconds:7.1f} squads/s '
+              f'({baseline_s / seconds:.1f}x)')
+
+    picks = np.bincount(np.concatenate([squad.players for squad in squads])) / n_scenarios
+    most_picked = np.argsort(-picks)[:5]
+    print('most picked players: ' + ', '.join(f'{i} ({picks[i]:.0%})' for i in most_picked))
+
+
+if __name__ == '__main__':
+    main()
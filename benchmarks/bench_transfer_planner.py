@@ -0,0 +1,48 @@
+"""Times TransferPlanner.plan at horizons of 1 to 6 gameweeks, for a squad picked without knowing the projections,
+in one process and over a process pool, against the value of holding the squad.
+
+Usage: python -m benchmarks.bench_transfer_planner
+"""
+
+import datetime as dt
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics.squad_optimizer import optimise_squad
+from analytics.transfer_planner import TransferPlanner, project_points
+from benchmarks import synthetic
+from gcp.snapshot_tables import snapshot_table
+
+
+def main(horizons=range(1, 7), beam_width=8, time_budget=5.0, worker_counts=(1, 4)):
+    snapshot_time = dt.datetime(2019, 8, 1)
+    players_df = snapshot_table(synthetic.fpl_bootstrap_static(), 'players', snapshot_time)
+    teams_df = snapshot_table(synthetic.fpl_bootstrap_static(), 'teams', snapshot_time)
+    fixtures_df = pd.concat([snapshot_table(synthetic.fpl_bootstrap_static(event=event), 'fixtures', snapshot_time)
+                             for event in range(1, max(horizons) + 1)])
+    points_df = project_points(players_df, teams_df, fixtures_df, events=range(1, max(horizons) + 1))
+
+    random_points = np.random.RandomState(5).rand(len(players_df))
+    squad = optimise_squad(players_df.assign(ep_next=random_points), budget=950)
+    bank = 1000 - squad.cost
+
+    print(f'beam width {beam_width}, time budget {time_budget}s, {os.cpu_count()} CPUs')
+    for horizon in horizons:
+        held = TransferPlanner(players_df, points_df.iloc[:, :horizon], time_budget=0).plan(squad.players, bank)
+        for max_workers in worker_counts:
+            planner = TransferPlanner(players_df, points_df.iloc[:, :horizon], beam_width=beam_width,
+                                      time_budget=time_budget, max_workers=max_workers)
+            start = time.perf_counter()
+            plan = planner.plan(squad.players, bank, free_transfers=1)
+            seconds = time.perf_counter() - start
+            n_transfers = sum(len(transfers) for transfers in plan.transfers)
+            print(f'  {horizon} gameweek(s), {max_workers} worker(s): {seconds:7.3f}s, beam {plan.beam_width}, '
+                  f'{plan.expected_points:6.1f} points ({plan.expected_points - held.expected_points:+.1f} on '
+                  f'holding), {n_transfers} transfers, -{plan.hit_points} in hits')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""Times the ingest and feature code on synthetic datasets of increasing size, saving the timings as JSON and
+flagging regressions against a saved baseline.
+
+Cases, run at every scale in benchmarks.synthetic.SCALES asked for:
+xml_soccer.get_season_matches_df -> parsing XMLSoccer fixture payloads into typed frames, served from an
+offline response cache
+xml_soccer.process_season_matches -> match and standings tables of every season
+football_data.get_season_matches -> the same for football-data JSON payloads
+football_data.process_season_matches
+features.team_form_features -> rolling form over every season's team-match rows
+features.create_feature_vector -> the whole feature pipeline with lineup ratings, uncached, in one process
+snapshot_tables.SnapshotWriter -> writing hourly bootstrap-static snapshots to an in-memory SQLite database
+
+Each case runs repeats times and keeps the fastest, the run least disturbed by anything else on the machine,
+along with the instrumentation span totals of that run. Building the data is not timed. A case has regressed
+when it is more than tolerance (and 10ms) slower than the baseline's time for the same case and scale; cases the
+baseline doesn't have are not compared. Timings only compare across runs on the same machine.
+
+Usage: python -m benchmarks.harness [--scales small,medium] [--repeats 3] [--output results.json]
+                                    [--baseline baseline.json] [--tolerance 0.25] [--save-baseline baseline.json]
+Exits with status 1 if anything regressed.
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import sys
+import time
+import typing
+
+import pandas as pd
+
+from analytics import features
+from api_handler import football_data, xml_soccer
+from api_handler.http_cache import CacheEntry, MemoryResponseCache, cache_key
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+import instrumentation
+from gcp.snapshot_tables import SnapshotWriter, SqliteTableBackend
+
+FIRST_SEASON = 1990
+LEAGUE_CODE = 'Synthetic League'
+COMPETITION_CODE = 2021
+DEFAULT_TOLERANCE = 0.25
+MIN_SLOWDOWN_SECONDS = 0.01  # below this a slowdown is timer noise, however large a fraction it is
+
+
+class Case(typing.NamedTuple):
+    """One thing to time: run(*setup(scale)) returns the number of rows it produced."""
+    name: str
+    setup: typing.Callable[[synthetic.Scale], typing.Tuple]
+    run: typing.Callable[..., int]
+
+
+class Regression(typing.NamedTuple):
+    case: str
+    scale: str
+    seconds: float
+    baseline_seconds: float
+
+    @property
+    def ratio(self) -> float:
+        return self.seconds / self.baseline_seconds
+
+
+def _seasons(scale: synthetic.Scale) -> typing.List[int]:
+    return list(range(FIRST_SEASON, FIRST_SEASON + scale.n_seasons))
+
+
+def _season_date_string(season_start: int) -> str:
+    return f'{season_start % 100:02d}{(season_start + 1) % 100:02d}'
+
+
+def _cache_entry(url: str, params: typing.Dict, content: bytes, content_type: str) -> typing.Tuple[str, CacheEntry]:
+    return cache_key(url, params), CacheEntry(url=url, status_code=200, headers={'Content-Type': content_type},
+                                              content=content, stored_at=time.time(), ttl=None)
+
+
+def _xml_soccer_cache(scale: synthetic.Scale) -> typing.Tuple:
+    """Offline cache holding a GetFixturesByLeagueAndSeason response per season."""
+    cache = MemoryResponseCache(max_entries=scale.n_seasons)
+    url = xml_soccer.XmlSoccerRequest().api_url + 'GetFixturesByLeagueAndSeason'
+    for season_start in _seasons(scale):
+        season_df = synthetic.xml_soccer_season(season_start, scale.n_teams, lineups=True)
+        params = {'league': LEAGUE_CODE, 'seasonDateString': _season_date_string(season_start)}
+        cache.store(*_cache_entry(url, params, synthetic.xml_soccer_payload(season_df), 'text/xml; charset=utf-8'))
+    return cache, _seasons(scale)
+
+
+def _parse_xml_soccer(cache: MemoryResponseCache, seasons: typing.List[int]) -> int:
+    return sum(len(xml_soccer.get_season_matches_df(LEAGUE_CODE, _season_date_string(season_start), cache=cache,
+                                                    offline=True))
+               for season_start in seasons)
+
+
+def _xml_soccer_seasons(scale: synthetic.Scale) -> typing.Tuple:
+    return [synthetic.xml_soccer_season(season_start, scale.n_teams) for season_start in _seasons(scale)],
+
+
+def _process_xml_soccer(season_dfs: typing.List[pd.DataFrame]) -> int:
+    return sum(len(xml_soccer.process_season_matches(season_df)[0]) for season_df in season_dfs)
+
+
+def _football_data_cache(scale: synthetic.Scale) -> typing.Tuple:
+    """Offline cache holding a competition matches response per season."""
+    cache = MemoryResponseCache(max_entries=scale.n_seasons)
+    url = f'{football_data.FOOTBALL_DATA_API_URL}competitions/{COMPETITION_CODE}/matches/'
+    for season_start in _seasons(scale):
+        payload = synthetic.football_data_payload(season_start, scale.n_teams)
+        params = {'dateFrom': f'{season_start}-08-01', 'dateTo': f'{season_start + 1}-05-30'}
+        cache.store(*_cache_entry(url, params, json.dumps(payload).encode('utf-8'), 'application/json'))
+    return cache, _seasons(scale)
+
+
+def _parse_football_data(cache: MemoryResponseCache, seasons: typing.List[int]) -> int:
+    return sum(len(football_data.get_season_matches(COMPETITION_CODE, season_start, season_start + 1,
+                                                    _season_date_string(season_start), cache=cache, offline=True))
+               for season_start in seasons)
+
+
+def _football_data_seasons(scale: synthetic.Scale) -> typing.Tuple:
+    return [synthetic.football_data_season(season_start, scale.n_teams) for season_start in _seasons(scale)],
+
+
+def _process_football_data(season_dfs: typing.List[pd.DataFrame]) -> int:
+    return sum(len(football_data.process_season_matches(season_df)[1]) for season_df in season_dfs)
+
+
+def _team_matches(scale: synthetic.Scale) -> typing.Tuple:
+    season_detail_df = synthetic.xml_soccer_seasons(scale.n_seasons, scale.n_teams, first_season=FIRST_SEASON)
+    return xml_soccer.process_season_matches(season_detail_df)[0],
+
+
+def _team_form(matches_df: pd.DataFrame) -> int:
+    return len(features.team_form_features(matches_df))
+
+
+def _feature_sources(scale: synthetic.Scale) -> typing.Tuple:
+    season_detail_df = synthetic.xml_soccer_seasons(scale.n_seasons, scale.n_teams, first_season=FIRST_SEASON,
+                                                    lineups=True)
+    return season_detail_df, synthetic.fifa_ratings(scale.n_teams, n_other_players=25 * scale.n_players)
+
+
+def _feature_vector(season_detail_df: pd.DataFrame, player_stats_df: pd.DataFrame) -> int:
+    return len(features.create_feature_vector(season_detail_df, player_stats_df, cache_dir=None, max_workers=1))
+
+
+def _snapshots(scale: synthetic.Scale) -> typing.Tuple:
+    return list(synthetic.fpl_snapshots(scale.n_snapshots, scale.n_players, n_teams=scale.n_teams)),
+
+
+def _write_snapshots(snapshots: typing.List[typing.Tuple[dt.datetime, typing.Dict]]) -> int:
+    writer = SnapshotWriter(SqliteTableBackend(get_engine(':memory:')))
+    return sum(sum(writer.write(snapshot, snapshot_time).values()) for snapshot_time, snapshot in snapshots)
+
+
+CASES = [
+    Case('xml_soccer.get_season_matches_df', _xml_soccer_cache, _parse_xml_soccer),
+    Case('xml_soccer.process_season_matches', _xml_soccer_seasons, _process_xml_soccer),
+    Case('football_data.get_season_matches', _football_data_cache, _parse_football_data),
+    Case('football_data.process_season_matches', _football_data_seasons, _process_football_data),
+    Case('features.team_form_features', _team_matches, _team_form),
+    Case('features.create_feature_vector', _feature_sources, _feature_vector),
+    Case('snapshot_tables.SnapshotWriter', _snapshots, _write_snapshots),
+]
+
+
+def time_case(case: Case, scale: synthetic.Scale, repeats: int = 3) -> typing.Dict:
+    """Fastest of repeats runs of a case, with the rows it produced and its span totals."""
+    args = case.setup(scale)
+    best = None
+    for _ in range(repeats):
+        with instrumentation.recording() as recorder:
+            start = time.perf_counter()
+            rows = case.run(*args)
+            seconds = time.perf_counter() - start
+        if best is None or seconds < best['seconds']:
+            best = {'seconds': seconds, 'rows': rows, 'spans': recorder.summary()}
+    return best
+
+
+def run(scale_names: typing.Iterable[str] = ('small', 'medium'), repeats: int = 3,
+        case_names: typing.Iterable[str] = None) -> typing.Dict:
+    """Times every case (or those named) at every scale named, returning the results document."""
+    cases = [case for case in CASES if case_names is None or case.name in case_names]
+    results = []
+    for scale_name in scale_names:
+        scale = synthetic.SCALES[scale_name]
+        for case in cases:
+            result = time_case(case, scale, repeats)
+            results.append(dict(case=case.name, scale=scale_name, **result))
+            print(f'{scale_name:<8} {case.name:<40} {result["seconds"]:8.3f}s {result["rows"]:>9} rows')
+
+    return {
+        'created': dt.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeats': repeats,
+        'scales': {scale_name: synthetic.SCALES[scale_name]._asdict() for scale_name in scale_names},
+        'results': results,
+    }
+
+
+def compare(results: typing.Dict, baseline: typing.Dict, tolerance: float = DEFAULT_TOLERANCE,
+            min_slowdown: float = MIN_SLOWDOWN_SECONDS) -> typing.List[Regression]:
+    """Cases more than tolerance (a fraction) and min_slowdown seconds slower than in the baseline, at the same
+    scale."""
+    baseline_seconds = {(result['case'], result['scale']): result['seconds'] for result in baseline['results']}
+
+    regressions = []
+    for result in results['results']:
+        before = baseline_seconds.get((result['case'], result['scale']))
+        if before is not None and result['seconds'] > max(before * (1 + tolerance), before + min_slowdown):
+            regressions.append(Regression(result['case'], result['scale'], result['seconds'], before))
+    return regressions
+
+
+def _save(document: typing.Dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+
+
+def main(argv: typing.List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Times ingest and feature code on synthetic data.')
+    parser.add_argument('--scales', default='small,medium', help=f'comma separated, of {", ".join(synthetic.SCALES)}')
+    parser.add_argument('--cases', default=None, help='comma separated case names, by default all of them')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help='file to write the results to')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='slowdown, as a fraction, that counts as a regression')
+    parser.add_argument('--save-baseline', help='file to write the results to as the new baseline')
+    args = parser.parse_args(argv)
+
+    results = run(args.scales.split(','), args.repeats, args.cases.split(',') if args.cases else None)
+    if args.output:
+        _save(results, args.output)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression.scale} {regression.case}: {regression.seconds:.3f}s vs '
+                  f'{regression.baseline_seconds:.3f}s ({regression.ratio - 1:+.0%})')
+        if not regressions:
+            print(f'no regressions beyond {args.tolerance:.0%} against {args.baseline}')
+
+    if args.save_baseline:
+        _save(results, args.save_baseline)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""Generates synthetic football seasons shaped like the raw API payloads, so benchmarks can run offline.
+
+Everything is seeded, so the same arguments always give the same data. SCALES names a few dataset sizes, from
+a quick smoke test up to decades of a large league, for benchmarks/harness.py to run at.
+"""
+
+import datetime as dt
+import json
+import typing
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+
+FORMATIONS = {'4-4-2': (4, 2, 4), '4-3-3': (4, 3, 3), '3-5-2': (3, 2, 5), '4-5-1': (4, 1, 5)}  # (DEF, FWD, MID)
+SQUAD_SHAPE = (('Goalkeeper', 3), ('Defense', 8), ('Forward', 5), ('Midfield', 8))
+
+
+class Scale(typing.NamedTuple):
+    """Size of a synthetic dataset.
+
+    :param n_teams: teams in the league (and FPL teams)
+    :param n_seasons: seasons of fixtures
+    :param n_players: FPL players in each bootstrap-static snapshot; FIFA ratings get 25 times as many others
+    :param n_snapshots: hourly bootstrap-static snapshots
+    """
+    n_teams: int
+    n_seasons: int
+    n_players: int
+    n_snapshots: int
+
+
+SCALES = {
+    'small': Scale(n_teams=10, n_seasons=2, n_players=200, n_snapshots=6),
+    'medium': Scale(n_teams=20, n_seasons=10, n_players=600, n_snapshots=24),
+    'large': Scale(n_teams=40, n_seasons=40, n_players=1500, n_snapshots=48),
+}
+_SYLLABLES = ['ka', 'ro', 'mi', 'lo', 'ben', 'tar', 'vic', 'an', 'dre', 'sa', 'no', 'el', 'hu', 'go', 'ma', 'ri',
+              'os', 'le', 'va', 'zo', 'pe', 'dro', 'ti', 'ago', 'lu', 'ke', 'sha', 'wn', 'cor', 'mac']
+
+
+def team_names(n_teams: int) -> typing.List[str]:
+    return [f'Team {i:02d}' for i in range(n_teams)]
+
+
+def player_name(rng: np.random.RandomState) -> str:
+    def word(n_syllables):
+        return ''.join(rng.choice(_SYLLABLES, n_syllables)).capitalize()
+    return f'{word(rng.randint(1, 3))} {word(rng.randint(2, 4))}'
+
+
+def squads(n_teams: int, seed: int = 0) -> typing.Dict[str, typing.Dict[str, typing.List[str]]]:
+    """Player names for every team, by lineup position: {team: {'Goalkeeper': [...], ...}}."""
+    rng = np.random.RandomState(seed)
+    return {team: {position: [player_name(rng) for _ in range(size)] for position, size in SQUAD_SHAPE}
+            for team in team_names(n_teams)}
+
+
+def round_robin(n_teams: int) -> typing.List[typing.List[typing.Tuple[int, int]]]:
+    """Double round-robin schedule via the circle method: a list of rounds, each a list of (home, away) pairs."""
+    assert n_teams % 2 == 0, 'n_teams must be even'
+
+    teams = list(range(n_teams))
+    first_half = []
+    for r in range(n_teams - 1):
+        pairs = [(teams[i], teams[n_teams - 1 - i]) for i in range(n_teams // 2)]
+        first_half.append([(h, a) if r % 2 == 0 else (a, h) for h, a in pairs])
+        teams = [teams[0]] + [teams[-1]] + teams[1:-1]
+
+    second_half = [[(a, h) for h, a in round_pairs] for round_pairs in first_half]
+    return first_half + second_half
+
+
+def _lineup(rng: np.random.RandomState, squad: typing.Dict[str, typing.List[str]], side: str) -> typing.Dict:
+    """Lineup fields for one side of a match, formatted as XMLSoccer does: 'Name A; Name B;'."""
+    formation = rng.choice(list(FORMATIONS))
+    counts = dict(zip(('Defense', 'Forward', 'Midfield'), FORMATIONS[formation]), Goalkeeper=1)
+
+    fields = {f'{side}TeamFormation': formation}
+    for position, _ in SQUAD_SHAPE:
+        players = rng.choice(squad[position], counts[position], replace=False)
+        fields[f'{side}Lineup{position}'] = ' ' + '; '.join(players) + ';'
+    return fields
+
+
+def team_strengths(n_teams: int, seed: int = 0, spread: float = 0.3) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Log attack and defence strengths per team, fixed across seasons; 0 is an average team."""
+    rng = np.random.RandomState(seed + 2)
+    return rng.normal(0, spread, n_teams), rng.normal(0, spread, n_teams)
+
+
+def xml_soccer_season(season_start: int, n_teams: int = 20, seed: int = 0,
+                      competition_name: str = 'Synthetic League', lineups: bool = False,
+                      team_strength: float = 0.0) -> pd.DataFrame:
+    """Season fixtures shaped like GetFixturesByLeagueAndSeason output, with all values as strings.
+
+    With lineups=True each match also gets formations and starting lineups drawn from squads(n_teams, seed).
+    With team_strength > 0 goals depend on team_strengths(n_teams, seed, team_strength), otherwise every team
+    is equally good.
+    """
+    rng = np.random.RandomState(seed + season_start)
+    names = team_names(n_teams)
+    attack, defence = team_strengths(n_teams, seed, team_strength) if team_strength else (np.zeros(n_teams),) * 2
+    team_squads = squads(n_teams, seed) if lineups else None
+    kick_off = dt.datetime(season_start, 8, 10, 15)
+
+    records = []
+    for round_number, round_pairs in enumerate(round_robin(n_teams), start=1):
+        match_date = kick_off + dt.timedelta(days=7 * (round_number - 1))
+        for home, away in round_pairs:
+            record = {
+                'Id': str(season_start * 10000 + len(records)),
+                'Date': match_date.isoformat(),
+                'League': competition_name,
+                'Round': str(round_number),
+                'HomeTeam': names[home],
+                'AwayTeam': names[away],
+                'HomeGoals': str(rng.poisson(1.5 * np.exp(attack[home] - defence[away]))),
+                'AwayGoals': str(rng.poisson(1.1 * np.exp(attack[away] - defence[home]))),
+            }
+            if lineups:
+                record.update(_lineup(rng, team_squads[names[home]], 'Home'))
+                record.update(_lineup(rng, team_squads[names[away]], 'Away'))
+            records.append(record)
+
+    season_df = pd.DataFrame.from_records(records)
+    season_df['MatchDate'] = pd.to_datetime(season_df.Date)
+    season_df['CompetitionSeason'] = f'{season_start % 100:02d}{(season_start + 1) % 100:02d}'
+    season_df['CompetitionName'] = competition_name
+    return season_df
+
+
+def xml_soccer_payload(season_df: pd.DataFrame) -> bytes:
+    """GetFixturesByLeagueAndSeason response body holding the matches of xml_soccer_season output.
+
+    Only the columns the API sends are included, so get_season_matches_df of it matches season_df.
+    """
+    raw_columns = [column for column in season_df.columns
+                   if column not in ('MatchDate', 'CompetitionSeason', 'CompetitionName')]
+    matches = [''.join(f'<{column}>{escape(value)}</{column}>' for column, value in zip(raw_columns, row)
+                       if isinstance(value, str))
+               for row in season_df[raw_columns].itertuples(index=False)]
+    return ('<?xml version="1.0" encoding="utf-8"?>\n<XMLSOCCER.COM>\n' +
+            ''.join(f'  <Match>{match}</Match>\n' for match in matches) + '</XMLSOCCER.COM>').encode('utf-8')
+
+
+def football_data_payload(season_start: int, n_teams: int = 20, seed: int = 0,
+                          competition_name: str = 'Synthetic League') -> typing.Dict:
+    """competitions/{id}/matches/ response of the football-data API for one season."""
+    xml_df = xml_soccer_season(season_start, n_teams, seed, competition_name)
+    names = team_names(n_teams)
+
+    matches = [{'id': int(match_id), 'utcDate': date + 'Z', 'matchday': int(round_number),
+                'homeTeam': {'id': names.index(home), 'name': home},
+                'awayTeam': {'id': names.index(away), 'name': away},
+                'score': {'winner': None, 'fullTime': {'homeTeam': int(home_goals), 'awayTeam': int(away_goals)}}}
+               for match_id, date, round_number, home, away, home_goals, away_goals in zip(
+                   xml_df.Id, xml_df.Date, xml_df.Round, xml_df.HomeTeam, xml_df.AwayTeam, xml_df.HomeGoals,
+                   xml_df.AwayGoals)]
+
+    return {'count': len(matches), 'competition': {'id': 2021, 'name': competition_name}, 'matches': matches}
+
+
+def football_data_season(season_start: int, n_teams: int = 20, seed: int = 0,
+                         competition_name: str = 'Synthetic League') -> pd.DataFrame:
+    """Season matches shaped like get_season_matches output from the football-data API."""
+    payload = football_data_payload(season_start, n_teams, seed, competition_name)
+
+    season_df = pd.DataFrame.from_records(payload['matches'])
+    season_df['season'] = f'{season_start % 100:02d}-{(season_start + 1) % 100:02d}'
+    season_df['competitionName'] = payload['competition']['name']
+    return season_df
+
+
+def xml_soccer_seasons(n_seasons: int, n_teams: int = 20, first_season: int = 1970, seed: int = 0,
+                       lineups: bool = False, team_strength: float = 0.0) -> pd.DataFrame:
+    return pd.concat([xml_soccer_season(first_season + s, n_teams, seed, lineups=lineups, team_strength=team_strength)
+                      for s in range(n_seasons)], ignore_index=True)
+
+
+def fifa_ratings(n_teams: int = 20, seed: int = 0, n_other_players: int = 15000) -> pd.DataFrame:
+    """FIFA-style ratings table covering squads(n_teams, seed) plus players from other clubs.
+
+    As in the real dataset, most names are shortened to an initial ('K. De Bruyne'), so they never match
+    lineup names exactly.
+    """
+    rng = np.random.RandomState(seed + 1)
+    records = []
+
+    def fifa_name(full_name):
+        first, last = full_name.split(' ', 1)
+        return f'{first[0]}. {last}' if rng.rand() < 0.6 else full_name
+
+    for team, squad in squads(n_teams, seed).items():
+        for position, players in squad.items():
+            for player in players:
+                records.append({'Name': fifa_name(player), 'Club': team, 'Position': position,
+                                'Overall': rng.randint(60, 90), 'FullName': player})
+
+    for i in range(n_other_players):
+        player = player_name(rng)
+        records.append({'Name': fifa_name(player), 'Club': f'Other Club {i % 500:03d}', 'Position': 'Midfield',
+                        'Overall': rng.randint(45, 80), 'FullName': player})
+
+    return pd.DataFrame.from_records(records)
+
+
+FPL_POSITIONS = {1: 2, 2: 5, 3: 5, 4: 3}  # element_type -> squad quota, GKP / DEF / MID / FWD
+
+
+def fpl_bootstrap_static(n_players: int = 600, n_teams: int = 20, seed: int = 0, event: int = 1,
+                         snapshot_time: dt.datetime = None) -> typing.Dict:
+    """An FPL bootstrap-static payload with teams, elements, events and next_event_fixtures."""
+    rng = np.random.RandomState(seed)
+    names = team_names(n_teams)
+    snapshot_time = snapshot_time or dt.datetime(2019, 8, 1)
+
+    teams = []
+    for team_id, name in enumerate(names, start=1):
+        strength = int(rng.randint(2, 6))
+        team = {'id': team_id, 'code': 100 + team_id, 'name': name, 'short_name': name[-3:].upper(),
+                'strength': strength, 'played': 0, 'win': 0, 'draw': 0, 'loss': 0, 'points': 0, 'position': 0}
+        for ground in ('home', 'away'):
+            for aspect in ('overall', 'attack', 'defence'):
+                team[f'strength_{aspect}_{ground}'] = int(900 + 80 * strength + rng.randint(-60, 60))
+        teams.append(team)
+
+    elements = []
+    for element_id in range(1, n_players + 1):
+        element_type = int(rng.choice(list(FPL_POSITIONS), p=[0.1, 0.33, 0.4, 0.17]))
+        quality = rng.gamma(2.0, 1.5)
+        elements.append({
+            'id': element_id,
+            'web_name': player_name(rng).split(' ')[-1],
+            'team': int(rng.randint(1, n_teams + 1)),
+            'element_type': element_type,
+            'now_cost': int(40 + 5 * round(min(quality, 14))),
+            'total_points': int(quality * 10 * event),
+            'form': f'{quality:.1f}',
+            'points_per_game': f'{quality:.1f}',
+            'selected_by_percent': f'{min(60, quality ** 2):.1f}',
+            'ep_next': f'{quality * 1.1:.1f}',
+            'ep_this': f'{quality:.1f}',
+            'status': 'a',
+            'chance_of_playing_next_round': None,
+            'news': '',
+            'minutes': int(90 * event * rng.rand()),
+            'goals_scored': int(rng.poisson(quality * event / 10)),
+            'assists': int(rng.poisson(quality * event / 12)),
+            'transfers_in_event': int(rng.randint(0, 100000)),
+            'transfers_out_event': int(rng.randint(0, 100000)),
+        })
+
+    events = []
+    first_deadline = snapshot_time - dt.timedelta(days=7 * (event - 1))
+    for event_id in range(1, 39):
+        deadline = first_deadline + dt.timedelta(days=7 * (event_id - 1))
+        events.append({'id': event_id, 'name': f'Gameweek {event_id}', 'deadline_time': deadline.isoformat() + 'Z',
+                       'finished': event_id < event, 'is_current': event_id == event,
+                       'is_next': event_id == event + 1, 'average_entry_score': 50 if event_id < event else 0,
+                       'chip_plays': [{'chip_name': 'bboost', 'num_played': 1000 * event_id}]})
+
+    round_pairs = round_robin(n_teams)[(event - 1) % (2 * (n_teams - 1))]
+    next_event_fixtures = [{'id': 1000 * event + i, 'event': event, 'team_h': home + 1, 'team_a': away + 1,
+                            'kickoff_time': events[event - 1]['deadline_time'], 'finished': False,
+                            'team_h_difficulty': teams[away]['strength'], 'team_a_difficulty': teams[home]['strength'],
+                            'stats': []}
+                           for i, (home, away) in enumerate(round_pairs)]
+
+    element_types = [{'id': element_type, 'singular_name_short': short_name, 'squad_select': quota}
+                     for (element_type, quota), short_name in zip(FPL_POSITIONS.items(), ('GKP', 'DEF', 'MID', 'FWD'))]
+
+    return {'teams': teams, 'elements': elements, 'events': events, 'element_types': element_types,
+            'next_event_fixtures': next_event_fixtures, 'current-event': event, 'total-players': 5000000}
+
+
+def fpl_snapshots(n_snapshots: int, n_players: int = 600, seed: int = 0, change_rate: float = 0.05,
+                  interval: dt.timedelta = dt.timedelta(hours=1), start: dt.datetime = dt.datetime(2019, 8, 1),
+                  n_teams: int = 20) -> typing.Iterator[typing.Tuple[dt.datetime, typing.Dict]]:
+    """Consecutive (snapshot time, bootstrap-static) pairs, where change_rate of players change each tick.
+
+    Prices, ownership and form drift as they do between real hourly snapshots; the gameweek moves on weekly.
+    """
+    rng = np.random.RandomState(seed)
+    snapshot = fpl_bootstrap_static(n_players, n_teams, seed=seed, snapshot_time=start)
+
+    for tick in range(n_snapshots):
+        snapshot_time = start + tick * interval
+        event = min(38, 1 + int((snapshot_time - start) / dt.timedelta(days=7)))
+
+        if event != snapshot['current-event']:
+            snapshot = fpl_bootstrap_static(n_players, n_teams, seed=seed, event=event, snapshot_time=snapshot_time)
+            snapshot['elements'] = [dict(new, now_cost=old['now_cost']) for old, new in
+                                    zip(previous_elements, snapshot['elements'])]
+
+        changed = rng.rand(n_players) < change_rate
+        for element, change in zip(snapshot['elements'], changed):
+            if change:
+                ownership = max(0.0, float(element['selected_by_percent']) + rng.randn())
+                element['selected_by_percent'] = f'{ownership:.1f}'
+                element['transfers_in_event'] += int(rng.randint(0, 5000))
+                if rng.rand() < 0.1:
+                    element['now_cost'] += int(rng.choice([-1, 1]))
+
+        previous_elements = snapshot['elements']
+        yield snapshot_time, json.loads(json.dumps(snapshot))
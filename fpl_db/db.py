@@ -1,2 +1,28 @@
+"""SQLite connection helpers for the fpl_db schemas."""
+
+import os
+
 import sqlalchemy
 
+from fpl_db.schemas import Base
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), '.fpl_fun', 'fpl.db')
+
+
+def get_engine(db_path: str = DEFAULT_DB_PATH, echo: bool = False) -> sqlalchemy.engine.Engine:
+    """Creates an engine on a SQLite file (or ':memory:'), creating any missing tables.
+
+    :param db_path: path of the SQLite database file
+    :param echo: log every statement
+    :return: SQLAlchemy engine
+    """
+    if db_path == ':memory:':
+        # one shared connection, so every thread sees the same in-memory database
+        engine = sqlalchemy.create_engine('sqlite://', echo=echo, poolclass=sqlalchemy.pool.StaticPool,
+                                          connect_args={'check_same_thread': False})
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        engine = sqlalchemy.create_engine(f'sqlite:///{db_path}', echo=echo)
+
+    Base.metadata.create_all(engine)
+    return engine
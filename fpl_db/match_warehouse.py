@@ -0,0 +1,291 @@
+"""Local store of XMLSoccer fixtures, lineups and standings, so seasons are fetched once and then read from disk.
+
+Competitions, seasons and teams are stored once each and referenced by id. Writes are upserts keyed by match id
+(and by season, matchday and team for standings), sent as one executemany per table rather than ORM objects, so
+re-ingesting a season updates its scores in place. Reads come back as dataframes shaped like the API handlers'.
+
+E.g.
+warehouse = MatchWarehouse(get_engine())
+season_detail_df = xml_soccer.get_season_matches_df(league_code, '1718')
+warehouse.upsert_fixtures(season_detail_df)
+matches_df, table_df = xml_soccer.process_season_matches(season_detail_df)
+warehouse.upsert_standings(table_df, 'English Premier League', '1718')
+
+season_detail_df = warehouse.matches(competition='English Premier League', season='1718', with_lineups=True)
+warehouse.matches(team='Arsenal', start=dt.datetime(2017, 1, 1))
+"""
+
+import collections
+import datetime as dt
+import itertools
+import typing
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy.dialects.sqlite import insert
+
+from api_handler.league_table import rank_standings, standings_dtypes, XML_SOCCER_COLUMNS
+from api_handler.schema import apply_dtypes
+from api_handler.xml_soccer import FIXTURE_DTYPES
+from fpl_db.schemas import Competition, LineupPlayer, Match, Season, StandingsSnapshot, Team
+
+LINEUP_POSITIONS = ['Goalkeeper', 'Defense', 'Forward', 'Midfield']  # as in analytics.features
+SIDES = ['Home', 'Away']
+
+# standings column -> process_season_matches table column
+_STANDINGS_COLUMNS = {
+    'position': 'Position',
+    'played': XML_SOCCER_COLUMNS.played,
+    'won': XML_SOCCER_COLUMNS.won,
+    'drawn': XML_SOCCER_COLUMNS.drawn,
+    'lost': XML_SOCCER_COLUMNS.lost,
+    'goals_for': XML_SOCCER_COLUMNS.goals_for,
+    'goals_against': XML_SOCCER_COLUMNS.goals_against,
+    'goal_diff': XML_SOCCER_COLUMNS.goal_diff,
+    'points': XML_SOCCER_COLUMNS.points,
+}
+
+_ID_BATCH = 500  # match ids per IN (...) list, within SQLite's bound parameter limit
+
+
+def _epoch_seconds(dates: pd.Series) -> np.ndarray:
+    return pd.to_datetime(dates).to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+
+def _records(df: pd.DataFrame) -> typing.List[typing.Dict]:
+    """Rows as dicts of Python values, with None for any missing value, ready for executemany."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _upsert(conn, table: sqlalchemy.Table, records: typing.List[typing.Dict]) -> int:
+    """INSERT ... ON CONFLICT (primary key) DO UPDATE of every other column, as one executemany."""
+    if not records:
+        return 0
+    statement = insert(table)
+    key = [column.name for column in table.primary_key]
+    statement = statement.on_conflict_do_update(index_elements=key, set_={
+        name: statement.excluded[name] for name in records[0] if name not in key})
+    conn.execute(statement, records)
+    return len(records)
+
+
+def _lineup_rows(season_detail_df: pd.DataFrame) -> pd.DataFrame:
+    """One row per starting player from the '{side}Lineup{position}' columns, e.g. ' Name A; Name B;'."""
+    match_ids = season_detail_df.Id.to_numpy()
+    player_dfs = []
+    for side in SIDES:
+        for position in LINEUP_POSITIONS:
+            column = f'{side}Lineup{position}'
+            if column not in season_detail_df:
+                continue
+            # explode by row position, as the index may repeat, e.g. across concatenated seasons
+            names = season_detail_df[column].reset_index(drop=True).fillna('').str.split(';').explode().str.strip()
+            names = names[names != '']
+            player_dfs.append(pd.DataFrame({'match_id': match_ids[names.index.to_numpy(dtype=np.int64)],
+                                            'home_or_away': side, 'position': position,
+                                            'player_name': names.to_numpy()}))
+    if not player_dfs:
+        return pd.DataFrame(columns=['match_id', 'home_or_away', 'slot', 'position', 'player_name'])
+
+    lineups_df = pd.concat(player_dfs, ignore_index=True).sort_values(['match_id', 'home_or_away'], kind='stable')
+    lineups_df.insert(2, 'slot', lineups_df.groupby(['match_id', 'home_or_away']).cumcount())
+    return lineups_df
+
+
+class MatchWarehouse(object):
+    """Bulk upserts and dataframe loaders over the matches table and the match_* tables around it.
+
+    :param engine: SQLAlchemy engine, e.g. from fpl_db.db.get_engine
+    """
+
+    def __init__(self, engine: sqlalchemy.engine.Engine):
+        self.engine = engine
+
+    @staticmethod
+    def _team_ids(conn, names: typing.Iterable[str]) -> typing.Dict[str, int]:
+        names = sorted(set(names))
+        if not names:
+            return {}
+        conn.execute(Team.__table__.insert().prefix_with('OR IGNORE'), [{'name': name} for name in names])
+        query = sqlalchemy.select(Team.team_id, Team.name).where(Team.name.in_(names))
+        return {name: team_id for team_id, name in conn.execute(query)}
+
+    @staticmethod
+    def _season_ids(conn, competition_seasons: typing.Iterable[typing.Tuple[str, str]]
+                    ) -> typing.Dict[typing.Tuple[str, str], int]:
+        competition_seasons = sorted(set(competition_seasons))
+        if not competition_seasons:
+            return {}
+        competitions = sorted({competition for competition, _ in competition_seasons})
+        conn.execute(Competition.__table__.insert().prefix_with('OR IGNORE'),
+                     [{'name': name} for name in competitions])
+        competition_ids = dict(conn.execute(sqlalchemy.select(Competition.name, Competition.competition_id)
+                                            .where(Competition.name.in_(competitions))).fetchall())
+
+        conn.execute(Season.__table__.insert().prefix_with('OR IGNORE'),
+                     [{'competition_id': competition_ids[competition], 'name': season}
+                      for competition, season in competition_seasons])
+        query = sqlalchemy.select(Competition.name, Season.name, Season.season_id)\
+            .join(Competition, Season.competition_id == Competition.competition_id)\
+            .where(Competition.name.in_(competitions))
+        return {(competition, season): season_id for competition, season, season_id in conn.execute(query)}
+
+    def upsert_fixtures(self, season_detail_df: pd.DataFrame) -> int:
+        """Inserts or updates fixtures and replaces their lineups, returning how many fixtures were written.
+
+        :param season_detail_df: fixtures as returned by xml_soccer.get_season_matches_df, one or more seasons
+        """
+        fixtures_df = apply_dtypes(season_detail_df.drop_duplicates(subset='Id', keep='last'), FIXTURE_DTYPES)
+
+        with self.engine.begin() as conn:
+            team_ids = self._team_ids(conn, pd.concat([fixtures_df.HomeTeam.astype(str),
+                                                       fixtures_df.AwayTeam.astype(str)]))
+            season_ids = self._season_ids(conn, zip(fixtures_df.CompetitionName.astype(str),
+                                                    fixtures_df.CompetitionSeason.astype(str)))
+
+            matches_df = pd.DataFrame({
+                'match_id': fixtures_df.Id.to_numpy(),
+                'season_id': [season_ids[key] for key in zip(fixtures_df.CompetitionName.astype(str),
+                                                             fixtures_df.CompetitionSeason.astype(str))],
+                'matchday': fixtures_df.Round.to_numpy(),
+                'match_date': _epoch_seconds(fixtures_df.MatchDate),
+                'home_team_id': fixtures_df.HomeTeam.astype(str).map(team_ids).to_numpy(),
+                'away_team_id': fixtures_df.AwayTeam.astype(str).map(team_ids).to_numpy(),
+                'home_goals': fixtures_df.HomeGoals.to_numpy(),
+                'away_goals': fixtures_df.AwayGoals.to_numpy(),
+            })
+            for side in SIDES:
+                if f'{side}TeamFormation' in fixtures_df:
+                    matches_df[f'{side.lower()}_formation'] = fixtures_df[f'{side}TeamFormation'].to_numpy()
+            n_written = _upsert(conn, Match.__table__, _records(matches_df))
+
+            lineups_df = _lineup_rows(fixtures_df)
+            match_ids = [int(match_id) for match_id in lineups_df.match_id.unique()]
+            lineup_table = LineupPlayer.__table__
+            for start in range(0, len(match_ids), _ID_BATCH):
+                conn.execute(lineup_table.delete().where(
+                    lineup_table.c.match_id.in_(match_ids[start:start + _ID_BATCH])))
+            if len(lineups_df):
+                conn.execute(lineup_table.insert(), _records(lineups_df))
+
+        return n_written
+
+    def upsert_standings(self, table_df: pd.DataFrame, competition: str, season: str) -> int:
+        """Inserts or updates one season's standings, returning how many rows were written.
+
+        :param table_df: table as returned by xml_soccer.process_season_matches for that season
+        :param competition: competition name, e.g. the fixtures' CompetitionName
+        :param season: season name, e.g. the fixtures' CompetitionSeason
+        """
+        table_df = table_df.reset_index()
+        if 'Position' not in table_df:
+            table_df['Position'] = rank_standings(table_df, 'MatchDay', XML_SOCCER_COLUMNS)
+
+        with self.engine.begin() as conn:
+            team_ids = self._team_ids(conn, table_df.TeamName.astype(str))
+            season_id = self._season_ids(conn, [(competition, season)])[(competition, season)]
+
+            standings_df = pd.DataFrame({'season_id': season_id, 'matchday': table_df.MatchDay.to_numpy(),
+                                         'team_id': table_df.TeamName.astype(str).map(team_ids).to_numpy()})
+            for column, table_column in _STANDINGS_COLUMNS.items():
+                standings_df[column] = table_df[table_column].fillna(0).to_numpy()
+            return _upsert(conn, StandingsSnapshot.__table__, _records(standings_df))
+
+    def _read(self, query: str, params: typing.Dict, bind_params: typing.List = ()) -> pd.DataFrame:
+        statement = sqlalchemy.text(query).bindparams(*bind_params)
+        with self.engine.connect() as conn:
+            return pd.read_sql(statement, conn, params=params)
+
+    def matches(self, competition: str = None, season: str = None, team: str = None, start: dt.datetime = None,
+                end: dt.datetime = None, with_lineups: bool = False) -> pd.DataFrame:
+        """Fixtures shaped and typed like xml_soccer.get_season_matches_df output, ready for process_season_matches.
+
+        :param competition: competition name
+        :param season: season name
+        :param team: only this team's fixtures, home or away
+        :param start: only fixtures on or after this UTC time
+        :param end: only fixtures before this UTC time
+        :param with_lineups: add the '{side}Lineup{position}' and formation columns
+        :return: df with one row per fixture, ordered by date and id
+        """
+        clauses, params = [], {}
+        for clause, name, value in (('c.name = :competition', 'competition', competition),
+                                    ('s.name = :season', 'season', season),
+                                    ('(ht.name = :team OR at.name = :team)', 'team', team),
+                                    ('m.match_date >= :start', 'start', start),
+                                    ('m.match_date < :end', 'end', end)):
+            if value is not None:
+                clauses.append(clause)
+                params[name] = int(_epoch_seconds(pd.Series([value]))[0]) if isinstance(value, dt.datetime) \
+                    else value
+
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        fixtures_df = self._read(
+            'SELECT m.match_id AS Id, m.match_date AS MatchDate, m.matchday AS Round, ht.name AS HomeTeam, '
+            'at.name AS AwayTeam, m.home_goals AS HomeGoals, m.away_goals AS AwayGoals, '
+            'm.home_formation AS HomeTeamFormation, m.away_formation AS AwayTeamFormation, '
+            'c.name AS CompetitionName, s.name AS CompetitionSeason '
+            'FROM matches m JOIN match_seasons s ON m.season_id = s.season_id '
+            'JOIN match_competitions c ON s.competition_id = c.competition_id '
+            'JOIN match_teams ht ON m.home_team_id = ht.team_id '
+            'JOIN match_teams at ON m.away_team_id = at.team_id '
+            f'{where} ORDER BY m.match_date, m.match_id', params)
+
+        fixtures_df['MatchDate'] = pd.to_datetime(fixtures_df.MatchDate, unit='s')
+        fixtures_df['Date'] = fixtures_df.MatchDate
+        fixtures_df['League'] = fixtures_df.CompetitionName
+
+        if with_lineups:
+            fixtures_df = fixtures_df.join(self._lineup_columns(fixtures_df.Id), on='Id')
+        else:
+            fixtures_df = fixtures_df.drop(columns=['HomeTeamFormation', 'AwayTeamFormation'])
+
+        return apply_dtypes(fixtures_df, FIXTURE_DTYPES)
+
+    def lineups(self, match_ids: typing.Iterable[int] = None) -> pd.DataFrame:
+        """Starting players, one row per (match_id, home_or_away, slot)."""
+        if match_ids is None:
+            return self._read('SELECT * FROM match_lineups ORDER BY match_id, home_or_away, slot', {})
+
+        match_ids = sorted({int(match_id) for match_id in match_ids})
+        return pd.concat([self._read('SELECT * FROM match_lineups WHERE match_id IN :match_ids '
+                                     'ORDER BY match_id, home_or_away, slot',
+                                     {'match_ids': match_ids[start:start + _ID_BATCH]},
+                                     [sqlalchemy.bindparam('match_ids', expanding=True)])
+                          for start in range(0, max(len(match_ids), 1), _ID_BATCH)], ignore_index=True)
+
+    def _lineup_columns(self, match_ids: pd.Series) -> pd.DataFrame:
+        """'{side}Lineup{position}' columns indexed by match id, formatted as XMLSoccer does: ' Name A; Name B;'."""
+        lineups_df = self.lineups(match_ids)
+        columns = (lineups_df.home_or_away + 'Lineup' + lineups_df.position).tolist()
+
+        # rows come in (match, side, slot) order, so each position's players are one run of rows
+        lineups = collections.defaultdict(dict)
+        for (match_id, column), players in itertools.groupby(
+                zip(lineups_df.match_id.tolist(), columns, lineups_df.player_name.tolist()),
+                key=lambda row: row[:2]):
+            lineups[column][match_id] = ' ' + '; '.join(player for _, _, player in players) + ';'
+        return pd.DataFrame(lineups)
+
+    def standings(self, competition: str, season: str, matchday: int = None) -> pd.DataFrame:
+        """Standings indexed by (MatchDay, TeamName) and named as process_season_matches' table, ordered by
+        matchday and position; by default every matchday."""
+        params = {'competition': competition, 'season': season}
+        matchday_clause = ''
+        if matchday is not None:
+            matchday_clause = 'AND st.matchday = :matchday'
+            params['matchday'] = matchday
+
+        standings_df = self._read(
+            f'SELECT st.matchday AS MatchDay, t.name AS TeamName, '
+            f'{", ".join(f"st.{column} AS {name}" for column, name in _STANDINGS_COLUMNS.items())} '
+            'FROM match_standings st JOIN match_seasons s ON st.season_id = s.season_id '
+            'JOIN match_competitions c ON s.competition_id = c.competition_id '
+            'JOIN match_teams t ON st.team_id = t.team_id '
+            f'WHERE c.name = :competition AND s.name = :season {matchday_clause} '
+            'ORDER BY st.matchday, st.position', params)
+
+        standings_df = apply_dtypes(standings_df, dict(standings_dtypes(XML_SOCCER_COLUMNS), MatchDay='int8',
+                                                       Position='int8', TeamName='category'))
+        return standings_df.set_index(['MatchDay', 'TeamName'])
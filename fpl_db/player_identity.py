@@ -0,0 +1,76 @@
+"""Persists resolved player names so feature rebuilds only fuzzy match names they have not seen before.
+
+Matches are stored against a fingerprint of the ratings source ('Name Club' keys). When the source changes,
+matches made against the old one are invalidated, except manual overrides pinned with pin().
+
+E.g.
+store = PlayerIdentityStore(get_engine())
+store.pin('Son Heung-Min', 'H. Son Tottenham Hotspur')
+features.get_lineup_stats_vector(lineup_s, player_stats_df, store=store)
+"""
+
+import hashlib
+import typing
+
+import pandas as pd
+import sqlalchemy
+
+from fpl_db.schemas import PlayerIdentity
+
+
+class StoredIdentity(typing.NamedTuple):
+    fifa_key: str
+    score: float
+    margin: float
+    pinned: bool
+
+
+def source_fingerprint(player_stats_df: pd.DataFrame) -> str:
+    """Identifies a ratings table by its 'Name Club' keys, so rating changes alone don't invalidate matches."""
+    keys = player_stats_df.Name.str.cat(player_stats_df.Club, sep=' ')
+    return hashlib.sha1(pd.util.hash_pandas_object(keys, index=False).values.tobytes()).hexdigest()
+
+
+class PlayerIdentityStore(object):
+    """Bulk load / save of resolved player names in the player_identities table."""
+
+    def __init__(self, engine: sqlalchemy.engine.Engine):
+        self.engine = engine
+        self.table = PlayerIdentity.__table__
+
+    def load(self, fingerprint: str) -> typing.Dict[str, StoredIdentity]:
+        """Matches made against this ratings source, plus every pinned override."""
+        query = self.table.select().where(
+            sqlalchemy.or_(self.table.c.source_fingerprint == fingerprint, self.table.c.pinned))
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+
+        return {row.player_name: StoredIdentity(row.fifa_key, row.score, row.margin, row.pinned) for row in rows}
+
+    def save(self, identities: typing.Mapping[str, StoredIdentity], fingerprint: str):
+        """Upserts matches in one executemany, leaving pinned overrides alone."""
+        pinned = {name for name, identity in self.load(fingerprint).items() if identity.pinned}
+        records = [{'player_name': name, 'fifa_key': identity.fifa_key, 'source_fingerprint': fingerprint,
+                    'score': identity.score, 'margin': identity.margin, 'pinned': identity.pinned}
+                   for name, identity in identities.items() if name not in pinned or identity.pinned]
+        if not records:
+            return
+
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert().prefix_with('OR REPLACE'), records)
+
+    def invalidate(self, fingerprint: str) -> int:
+        """Drops unpinned matches made against any other ratings source, returning how many went."""
+        query = self.table.delete().where(sqlalchemy.and_(self.table.c.source_fingerprint != fingerprint,
+                                                          sqlalchemy.not_(self.table.c.pinned)))
+        with self.engine.begin() as conn:
+            return conn.execute(query).rowcount
+
+    def pin(self, player_name: str, fifa_key: str, fingerprint: str = ''):
+        """Manually maps a lineup name to a ratings row by its 'Name Club' key."""
+        self.save({player_name: StoredIdentity(fifa_key, 1.0, 1.0, True)}, fingerprint)
+
+    def unpin(self, player_name: str):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.player_name == player_name))
@@ -0,0 +1,194 @@
+"""Point-in-time history of every FPL player, fed incrementally from bootstrap-static snapshots.
+
+Rather than a players table per event, each player gets a row in player_snapshots whenever their price,
+ownership, form etc. changed since the last snapshot, keyed by (element_id, snapshot_time). A player's value at any
+time is then their latest row at or before it.
+
+E.g.
+store = PlayerTimeSeriesStore(get_engine())
+for snapshot_time, snapshot in archive.replay():
+    store.append_snapshot(snapshot, snapshot_time)
+store.history(element_ids=[191], start=dt.datetime(2019, 8, 1)).now_cost
+store.as_of(dt.datetime(2019, 12, 26, 12), team=12)
+"""
+
+import datetime as dt
+import typing
+
+import pandas as pd
+import sqlalchemy
+
+from fpl_db.schemas import PlayerSnapshot
+
+_EPOCH = dt.datetime(1970, 1, 1)
+
+# column -> converter from the bootstrap-static element value, which FPL often sends as a string
+_CONVERTERS = {
+    'team': int,
+    'element_type': int,
+    'status': str,
+    'now_cost': int,
+    'total_points': int,
+    'minutes': int,
+    'form': float,
+    'points_per_game': float,
+    'ep_next': float,
+    'selected_by_percent': float,
+    'transfers_in_event': int,
+    'transfers_out_event': int,
+    'chance_of_playing_next_round': float,
+}
+SERIES_COLUMNS = list(_CONVERTERS)
+
+
+def _to_epoch(snapshot_time: dt.datetime) -> int:
+    return int((snapshot_time - _EPOCH).total_seconds())
+
+
+def _convert(value, converter):
+    return None if value is None or value == '' else converter(value)
+
+
+class PlayerTimeSeriesStore(object):
+    """Appends bootstrap-static snapshots to, and queries, the player_snapshots table.
+
+    :param engine: SQLAlchemy engine, e.g. from fpl_db.db.get_engine
+    """
+
+    def __init__(self, engine: sqlalchemy.engine.Engine):
+        self.engine = engine
+        self.table = PlayerSnapshot.__table__
+        self._latest = None  # element_id -> (snapshot_time, row values) of each player's latest row
+
+    def _load_latest(self) -> typing.Dict[int, typing.Tuple]:
+        latest_df = self.as_of()
+        return {element_id: (_to_epoch(row.snapshot_time), tuple(None if pd.isna(v) else v for v in row[1:]))
+                for element_id, row in zip(latest_df.index, latest_df[['snapshot_time', 'event'] + SERIES_COLUMNS]
+                                           .itertuples(index=False))}
+
+    def _changed_records(self, snapshot: typing.Dict, snapshot_time: dt.datetime) -> typing.List[typing.Dict]:
+        if self._latest is None:
+            self._latest = self._load_latest()
+
+        epoch = _to_epoch(snapshot_time)
+        event = snapshot['current-event']
+        records = []
+        for element in snapshot['elements']:
+            values = (event,) + tuple(_convert(element.get(column), converter)
+                                      for column, converter in _CONVERTERS.items())
+            latest = self._latest.get(element['id'])
+            if latest is not None:
+                if epoch <= latest[0]:
+                    raise ValueError(f'{snapshot_time} is not after the latest snapshot of player {element["id"]}')
+                if latest[1] == values:
+                    continue
+
+            self._latest[element['id']] = (epoch, values)
+            records.append(dict(zip(['element_id', 'snapshot_time', 'event'] + SERIES_COLUMNS,
+                                    (element['id'], epoch) + values)))
+
+        return records
+
+    def append_snapshot(self, snapshot: typing.Dict, snapshot_time: dt.datetime) -> int:
+        """Writes the players that changed since their last row, returning how many rows were written.
+
+        :param snapshot: bootstrap-static payload
+        :param snapshot_time: UTC time it was taken; must be after any snapshot already appended
+        """
+        return self.append_snapshots([(snapshot_time, snapshot)])
+
+    def append_snapshots(self, snapshots: typing.Iterable[typing.Tuple[dt.datetime, typing.Dict]],
+                         batch_size: int = 100) -> int:
+        """Appends (snapshot time, snapshot) pairs in time order, batch_size snapshots per transaction."""
+        n_written = 0
+        batch = []
+        try:
+            for i, (snapshot_time, snapshot) in enumerate(snapshots, start=1):
+                batch.extend(self._changed_records(snapshot, snapshot_time))
+                if i % batch_size == 0 and batch:
+                    n_written += self._insert(batch)
+                    batch = []
+            if batch:
+                n_written += self._insert(batch)
+        except Exception:
+            self._latest = None  # rows may not have been written; reload from the table next time
+            raise
+
+        return n_written
+
+    def _insert(self, records: typing.List[typing.Dict]) -> int:
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert(), records)
+        return len(records)
+
+    @staticmethod
+    def _filters(element_ids: typing.Iterable[int] = None, team: int = None, event: int = None,
+                 prefix: str = '') -> typing.Tuple[typing.List[str], typing.Dict, typing.List]:
+        clauses, params, bind_params = [], {}, []
+        if element_ids is not None:
+            clauses.append(f'{prefix}element_id IN :element_ids')
+            params['element_ids'] = list(element_ids)
+            bind_params.append(sqlalchemy.bindparam('element_ids', expanding=True))
+        if team is not None:
+            clauses.append(f'{prefix}team = :team')
+            params['team'] = team
+        if event is not None:
+            clauses.append(f'{prefix}event = :event')
+            params['event'] = event
+        return clauses, params, bind_params
+
+    def _read(self, query: str, params: typing.Dict, bind_params: typing.List) -> pd.DataFrame:
+        statement = sqlalchemy.text(query).bindparams(*bind_params)
+        with self.engine.connect() as conn:
+            df = pd.read_sql(statement, conn, params=params)
+
+        df['snapshot_time'] = pd.to_datetime(df.snapshot_time, unit='s')
+        return df
+
+    def history(self, element_ids: typing.Iterable[int] = None, start: dt.datetime = None,
+                end: dt.datetime = None, team: int = None, event: int = None) -> pd.DataFrame:
+        """Every change between start and end, indexed by (element_id, snapshot_time).
+
+        With a start time, each player's row as of start is included too, so their series starts at start.
+        team and event filter on the value in each row, e.g. team picks rows from while a player was at that team.
+        """
+        clauses, params, bind_params = self._filters(element_ids, team, event)
+        if start is not None:
+            clauses.append('snapshot_time > :start')
+            params['start'] = _to_epoch(start)
+        if end is not None:
+            clauses.append('snapshot_time <= :end')
+            params['end'] = _to_epoch(end)
+
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        history_df = self._read(f'SELECT * FROM {self.table.name} {where} ORDER BY element_id, snapshot_time',
+                                params, bind_params)
+
+        if start is not None:
+            start_df = self.as_of(start, element_ids, team, event).reset_index()
+            history_df = pd.concat([start_df, history_df], ignore_index=True)\
+                .sort_values(['element_id', 'snapshot_time'], kind='stable')
+
+        return history_df.set_index(['element_id', 'snapshot_time'])
+
+    def as_of(self, snapshot_time: dt.datetime = None, element_ids: typing.Iterable[int] = None, team: int = None,
+              event: int = None) -> pd.DataFrame:
+        """Each player's latest row at or before snapshot_time (by default the latest of all), indexed by element_id.
+
+        team and event filter on the values as of snapshot_time.
+        """
+        latest_clauses, params, bind_params = self._filters(element_ids)
+        if snapshot_time is not None:
+            latest_clauses.append('snapshot_time <= :snapshot_time')
+            params['snapshot_time'] = _to_epoch(snapshot_time)
+        clauses, filter_params, _ = self._filters(team=team, event=event, prefix='p.')
+        params.update(filter_params)
+
+        latest_where = f'WHERE {" AND ".join(latest_clauses)}' if latest_clauses else ''
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        query = f'SELECT p.* FROM {self.table.name} p JOIN (' \
+                f'SELECT element_id, MAX(snapshot_time) AS snapshot_time FROM {self.table.name} {latest_where} ' \
+                f'GROUP BY element_id) latest ON p.element_id = latest.element_id ' \
+                f'AND p.snapshot_time = latest.snapshot_time {where} ORDER BY p.element_id'
+
+        return self._read(query, params, bind_params).set_index('element_id')
@@ -4,7 +4,7 @@ Additional documentation can be found here:
 http://docs.sqlalchemy.org/en/latest/orm/extensions/declarative/basic_use.html
 """
 
-from sqlalchemy import create_engine, Column, String, BigInteger, ForeignKey, Float, Index, Boolean, distinct
+from sqlalchemy import create_engine, Column, String, BigInteger, ForeignKey, Float, Index, Boolean, Integer, distinct
 from sqlalchemy.exc import IntegrityError, StatementError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -18,4 +18,128 @@ class FplRecords(Base):
 
     sic_code = Column(String, primary_key=True)
     ad_office = Column(String)
-    industry_title = Column(String)
\ No newline at end of file
+    industry_title = Column(String)
+
+
+class PlayerIdentity(Base):
+    """Resolved XMLSoccer lineup name -> FIFA ratings row, so names are only fuzzy matched once.
+
+    source_fingerprint identifies the ratings table the match was made against; see fpl_db.player_identity.
+    """
+    __tablename__ = 'player_identities'
+
+    player_name = Column(String, primary_key=True)
+    fifa_key = Column(String, nullable=False)  # 'Name Club' of the matched ratings row
+    source_fingerprint = Column(String, nullable=False, index=True)
+    score = Column(Float)
+    margin = Column(Float)
+    pinned = Column(Boolean, nullable=False, default=False)  # manual override, kept across ratings sources
+
+
+class PlayerSnapshot(Base):
+    """One FPL player's price, ownership and form as of a bootstrap-static snapshot; see fpl_db.player_timeseries.
+
+    Rows are only written when a player changed since their previous row. Without a rowid, rows are stored in
+    primary key order, so one player's history is contiguous on disk.
+    """
+    __tablename__ = 'player_snapshots'
+    __table_args__ = (
+        Index('ix_player_snapshots_team', 'team', 'snapshot_time'),
+        Index('ix_player_snapshots_event', 'event', 'element_id'),
+        {'sqlite_with_rowid': False},
+    )
+
+    element_id = Column(Integer, primary_key=True)
+    snapshot_time = Column(BigInteger, primary_key=True)  # UTC epoch seconds
+    event = Column(Integer, nullable=False)
+    team = Column(Integer, nullable=False)
+    element_type = Column(Integer, nullable=False)
+    status = Column(String)
+    now_cost = Column(Integer)
+    total_points = Column(Integer)
+    minutes = Column(Integer)
+    form = Column(Float)
+    points_per_game = Column(Float)
+    ep_next = Column(Float)
+    selected_by_percent = Column(Float)
+    transfers_in_event = Column(Integer)
+    transfers_out_event = Column(Integer)
+    chance_of_playing_next_round = Column(Float)
+
+
+class Competition(Base):
+    __tablename__ = 'match_competitions'
+
+    competition_id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+
+class Season(Base):
+    __tablename__ = 'match_seasons'
+    __table_args__ = (Index('ix_match_seasons_competition', 'competition_id', 'name', unique=True),)
+
+    season_id = Column(Integer, primary_key=True)
+    competition_id = Column(Integer, ForeignKey('match_competitions.competition_id'), nullable=False)
+    name = Column(String, nullable=False)  # e.g. '1718', as XMLSoccer's seasonDateString
+
+
+class Team(Base):
+    __tablename__ = 'match_teams'
+
+    team_id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+
+class Match(Base):
+    """One fixture, keyed by its XMLSoccer id; goals are NULL until it is played. See fpl_db.match_warehouse."""
+    __tablename__ = 'matches'
+    __table_args__ = (
+        Index('ix_matches_season_matchday', 'season_id', 'matchday'),
+        Index('ix_matches_home_team_date', 'home_team_id', 'match_date'),
+        Index('ix_matches_away_team_date', 'away_team_id', 'match_date'),
+    )
+
+    match_id = Column(BigInteger, primary_key=True)
+    season_id = Column(Integer, ForeignKey('match_seasons.season_id'), nullable=False)
+    matchday = Column(Integer)
+    match_date = Column(BigInteger, nullable=False)  # UTC epoch seconds
+    home_team_id = Column(Integer, ForeignKey('match_teams.team_id'), nullable=False)
+    away_team_id = Column(Integer, ForeignKey('match_teams.team_id'), nullable=False)
+    home_goals = Column(Integer)
+    away_goals = Column(Integer)
+    home_formation = Column(String)
+    away_formation = Column(String)
+
+
+class LineupPlayer(Base):
+    """One starting player of one side of a match, in XMLSoccer's lineup order."""
+    __tablename__ = 'match_lineups'
+    __table_args__ = ({'sqlite_with_rowid': False},)
+
+    match_id = Column(BigInteger, ForeignKey('matches.match_id'), primary_key=True)
+    home_or_away = Column(String, primary_key=True)
+    slot = Column(Integer, primary_key=True)  # 0 .. 10
+    position = Column(String, nullable=False)
+    player_name = Column(String, nullable=False)
+
+
+class StandingsSnapshot(Base):
+    """A team's running totals and league position after a matchday, as process_season_matches computes them."""
+    __tablename__ = 'match_standings'
+    __table_args__ = (
+        Index('ix_match_standings_team', 'team_id', 'season_id', 'matchday'),
+        {'sqlite_with_rowid': False},
+    )
+
+    season_id = Column(Integer, ForeignKey('match_seasons.season_id'), primary_key=True)
+    matchday = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey('match_teams.team_id'), primary_key=True)
+    position = Column(Integer, nullable=False)
+    played = Column(Integer, nullable=False)
+    won = Column(Integer, nullable=False)
+    drawn = Column(Integer, nullable=False)
+    lost = Column(Integer, nullable=False)
+    goals_for = Column(Integer, nullable=False)
+    goals_against = Column(Integer, nullable=False)
+    goal_diff = Column(Integer, nullable=False)
+    points = Column(Integer, nullable=False)
@@ -1,10 +1,15 @@
+import shutil
 import subprocess
 import os
+import tempfile
 
 from gcp import main
 from gcloud import storage
 from gcloud.exceptions import Conflict
 
+# modules outside gcp/ that the functions import, copied into the deployed source at the same relative path
+VENDORED_MODULES = ['instrumentation.py', 'api_handler/__init__.py', 'api_handler/schema.py']
+
 
 def create_requirements_txt():
     """Creates PIP requirements.txt file prior to deploying Cloud Functions.
@@ -28,29 +33,45 @@ def create_requirements_txt():
     return completed_process
 
 
-def create_get_fpl_data():
+def build_source(source_dir: str) -> str:
+    """Copies gcp/ and VENDORED_MODULES into source_dir, which mustn't exist yet, as the function source to deploy.
+
+    :return: source_dir
+    """
+    gcp_dir = os.path.dirname(main.__file__)
+    shutil.copytree(gcp_dir, source_dir, ignore=shutil.ignore_patterns('__pycache__'))
+    for module in VENDORED_MODULES:
+        os.makedirs(os.path.join(source_dir, os.path.dirname(module)), exist_ok=True)
+        shutil.copy(os.path.join(os.path.dirname(gcp_dir), module), os.path.join(source_dir, module))
+
+    return source_dir
+
+
+def create_get_fpl_data(source_dir: str):
     """Deploys get_fpl_data function to gcp Functions.
 
+    :param source_dir: function source, see build_source
     :return: CompletedProcess data type
     """
     completed_process = subprocess.run(
         f'gcloud beta functions deploy {main.get_fpl_data.__name__} --runtime=python37 --trigger-http '
-        f'--source={os.path.dirname(main.__file__)} --project=fpl-fun --entry-point={main.get_fpl_data.__name__} '
+        f'--source={source_dir} --project=fpl-fun --entry-point={main.get_fpl_data.__name__} '
         f'--env-vars-file .env.yaml',
     shell=True)
 
     return completed_process
 
 
-def create_create_gcp_tables():
+def create_create_gcp_tables(source_dir: str):
     """Deploys write_gcp_tables_pubsub function to gcp Functions.
 
+    :param source_dir: function source, see build_source
     :return: CompletedProcess data type
     """
 
     completed_process = subprocess.run(
         f'gcloud beta functions deploy {main.write_gcp_tables_pubsub.__name__} --runtime=python37 '
-        f'--source={os.path.dirname(main.__file__)} --project=fpl-fun '
+        f'--source={source_dir} --project=fpl-fun '
         f'--entry-point={main.write_gcp_tables_pubsub.__name__} '
         f'--trigger-resource {main.FPL_BUCKET_NAME} --trigger-event google.storage.object.finalize '
         f'--env-vars-file .env.yaml',
@@ -83,6 +104,8 @@ if __name__ == '__main__':
 
     create_fpl_storage_bucket()
     print('\n')
-    create_get_fpl_data()
-    print('\n')
-    create_create_gcp_tables()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_dir = build_source(os.path.join(tmp_dir, 'source'))
+        create_get_fpl_data(source_dir)
+        print('\n')
+        create_create_gcp_tables(source_dir)
@@ -3,32 +3,87 @@
 Currently includes:
 1. Cloud Storage update function (runs on a CRON job to store FPL JSON data in a Blob)
 2. BigQuery table creation function (triggered by addition of a blob to Cloud Storage)
-"""
-
-import requests as rq
-import pandas as pd
-from flask import Request
 
-from gcloud import storage
+Every cold start imports this module, so it only imports what both functions need. requests, gcloud and
+pandas (via snapshot_tables) are imported on first use: get_fpl_data never loads pandas, and nothing loads
+flask. The storage client and HTTP session are created once per instance and reused by warm invocations.
+See benchmarks/bench_cold_start.py for the effect.
+"""
 
-import logging
 import datetime as dt
+import functools
+import gzip
 import json
-from io import BytesIO
+import logging
+import os
+import typing
+
+# a top-level module, copied into the function source when deployed, see create_resources.build_source
+import instrumentation
+
+try:
+    from gcp.snapshot_archive import SnapshotArchive
+    from gcp.storage_backends import GcsBackend, stream_url_to_blob
+except ImportError:  # deployed: gcp/ is the function source root
+    from snapshot_archive import SnapshotArchive
+    from storage_backends import GcsBackend, stream_url_to_blob
+
+if typing.TYPE_CHECKING:
+    from flask import Request
 
 FPL_BUCKET_NAME = 'fpl_fun'
 FPL_PROJECT_ID = 'fpl-fun'
+FPL_BOOTSTRAP_URL = os.environ.get('FPL_BOOTSTRAP_URL', 'https://fantasy.premierleague.com/api/bootstrap-static/')
+
+RAW_BLOB_PREFIX = 'fpl_data_'
+
+instrumentation.configure_from_env()  # set FPL_INSTRUMENTATION to log a JSON line per span
+
+
+@functools.lru_cache(maxsize=None)
+def _storage_client():
+    """Cloud Storage client shared by every invocation on this instance."""
+    from gcloud import storage
+    return storage.Client()
+
+
+@functools.lru_cache(maxsize=None)
+def _http_session():
+    """requests Session shared by every invocation on this instance, keeping connections to the FPL API open."""
+    import requests as rq
+    return rq.Session()
+
+
+@functools.lru_cache(maxsize=None)
+def _snapshot_writer():
+    """SnapshotWriter to the BigQuery tables, importing snapshot_tables (and so pandas) on first call."""
+    try:
+        from gcp.snapshot_tables import SnapshotWriter, BigQueryTableBackend
+    except ImportError:  # deployed: gcp/ is the function source root
+        from snapshot_tables import SnapshotWriter, BigQueryTableBackend
+    return SnapshotWriter(BigQueryTableBackend(FPL_PROJECT_ID))
 
 
 def _fpl_downloader():
-    response = rq.get('https://fantasy.premierleague.com/api/bootstrap-static/')
+    response = _http_session().get(FPL_BOOTSTRAP_URL)
     return response.content
 
 
-def get_fpl_data(req: Request) -> str:
+def _raw_blob_time(blob_name: str) -> dt.datetime:
+    return dt.datetime.fromisoformat(blob_name[len(RAW_BLOB_PREFIX):].split('.json')[0])
+
+
+def save_fpl_data(backend, compress: bool = True, url: str = FPL_BOOTSTRAP_URL, session=None) -> str:
+    """Streams the bootstrap-static response into a new fpl_data_<timestamp> blob, returning its name."""
+    blob_name = RAW_BLOB_PREFIX + dt.datetime.utcnow().isoformat() + ('.json.gz' if compress else '')
+    return stream_url_to_blob(url, backend, blob_name, compress=compress, session=session)
+
+
+def get_fpl_data(req: 'Request') -> str:
     """Cloud function to save data from FPL website.
 
-    Writes raw JSON to Google Cloud storage.
+    Streams the gzipped JSON to Google Cloud storage through a resumable upload, so memory use doesn't grow
+    with the payload. write_gcp_tables_pubsub then moves it into the snapshot archive.
 
     Args:
       req: Flask Request automatically passed by gcp Functions. Is ignored.
@@ -38,34 +93,33 @@ def get_fpl_data(req: Request) -> str:
 
     """
     del req
-    storage_client = storage.Client()
 
     logging.info("Beginning FPL data collection run.")
 
-    response_content = _fpl_downloader()
-
-    fpl_bucket = storage_client.bucket(FPL_BUCKET_NAME)
-
-    fpl_blob_name = 'fpl_data_' + dt.datetime.utcnow().isoformat()
-    new_blob = fpl_bucket.blob(fpl_blob_name)
-    new_blob.upload_from_file(BytesIO(response_content), size=2048)
+    with instrumentation.span('get_fpl_data'):
+        fpl_blob_name = save_fpl_data(GcsBackend(FPL_BUCKET_NAME, _storage_client()), session=_http_session())
 
-    logging.info(f"Data uploaded to {new_blob.name}.")
+    logging.info(f"Data uploaded to {fpl_blob_name}.")
 
-    return new_blob.name
+    return fpl_blob_name
 
 
 def write_gcp_tables_pubsub(data, context) -> bool:
     """Triggered by creation of a new blob in our fpl_data storage bucket.
 
-    Represents the full state of the FPL website at a given point in time.
+    Represents the full state of the FPL website at a given point in time. The blob is added to the compressed
+    snapshot archive (see snapshot_archive.SnapshotArchive) and then deleted; any blob not named like a raw
+    fpl_data_<timestamp> one, such as those the archive writes, is ignored.
 
-    This function sequentially writes the blob data to 3 key BigQuery tables:
+    This function appends the blob data to 4 key BigQuery tables, in parallel:
     1. Team information -> information about each team -- strength as well as fixture
     2. Player information -> information on each premier league player at a given point in time
     3. Events information -> information about each upcoming event
     4. Fixtures information -> information about all fixtures in an upcoming event
 
+    Rows are typed, stamped with current_event, date_created and snapshot_time, and only written when they have
+    changed since the last snapshot (see snapshot_tables.SnapshotWriter).
+
     :param data: Passed in by the Pub/Sub service
     :param context: Passed in by the Pub/Sub service
     :return: True if function successfully executes properly
@@ -73,29 +127,38 @@ def write_gcp_tables_pubsub(data, context) -> bool:
     bucket_name = data['bucket']
     blob_name = data['name']
 
-    storage_client = storage.Client()
-    fpl_bucket = storage_client.bucket(bucket_name)
-
-    blob_data_pointer = fpl_bucket.get_blob(blob_name)
-    blob_data_json = json.loads(blob_data_pointer.download_as_string())
-
-    logging.info('Successfully loaded blob data')
-
-    teams_df = pd.DataFrame.from_records(blob_data_json['teams'])
-    players_df = pd.DataFrame.from_records(blob_data_json['elements'])
-    events_df = pd.DataFrame.from_records(blob_data_json['events'])
-    fixtures_df = pd.DataFrame.from_records(blob_data_json['next_event_fixtures'])
-
-    logging.info('Successfully created dataframes')
-
-    table_names = ['teams', 'players', 'events', 'fixtures']
-    today = dt.datetime.utcnow().date()
-
-    for d, df in enumerate([teams_df, players_df, events_df, fixtures_df]):
-        df['date_created'] = today.isoformat()
-        df['current_event'] = blob_data_json['current-event']
-        df.to_gbq(f"{table_names[d]}.{today.year}_event_{blob_data_json['current-event']}",
-                  project_id=FPL_PROJECT_ID, if_exists='replace')
+    if not blob_name.startswith(RAW_BLOB_PREFIX):  # archive entries, or anything else put in the bucket
+        return True
+    try:
+        snapshot_time = _raw_blob_time(blob_name)
+    except ValueError:
+        logging.warning(f'{blob_name} has no snapshot timestamp, ignored')
+        return True
+
+    with instrumentation.span('write_gcp_tables_pubsub', blob=blob_name):
+        backend = GcsBackend(bucket_name, _storage_client())
+        with instrumentation.span('write_gcp_tables_pubsub.read_blob') as s:
+            blob_data = backend.read(blob_name)
+            s.record(bytes=len(blob_data))
+        with instrumentation.span('write_gcp_tables_pubsub.parse') as s:
+            if blob_name.endswith('.gz'):
+                blob_data = gzip.decompress(blob_data)
+            blob_data_json = json.loads(blob_data)
+            s.record(bytes=len(blob_data))
+
+        logging.info('Successfully loaded blob data')
+
+        rows_written = _snapshot_writer().write(blob_data_json, snapshot_time)
+
+        logging.info(f'Wrote changed rows to GBQ: {rows_written}')
+
+        try:
+            with instrumentation.span('write_gcp_tables_pubsub.archive'):
+                archived_name = SnapshotArchive(backend).write(blob_data_json, snapshot_time)
+        except ValueError:  # delivered after a later snapshot was archived; keep the raw blob
+            logging.warning(f'{blob_name} is older than the latest archived snapshot, not archived')
+        else:
+            backend.delete(blob_name)
+            logging.info(f'Archived as {archived_name}')
 
-    logging.info('Wrote dataframes to GBQ')
     return True
@@ -0,0 +1,238 @@
+"""Archives FPL bootstrap-static snapshots as compressed bases plus per-entity deltas.
+
+Consecutive snapshots are mostly identical, so rather than a full JSON blob per cron tick the archive stores a
+gzipped full snapshot every base_every ticks, and in between only what changed since the previous tick:
+- teams, elements and events -> the records that were added or changed, and the ids that went, by id
+- any other top level key -> its new value, when it changed
+
+Blob names sort by snapshot time, so a point-in-time snapshot is the latest base at or before it with the
+deltas after that applied in order. Each delta names the entry it applies to.
+
+A head blob holds the names of the current chain (the latest base and the deltas since) and the latest snapshot,
+so a write reads one blob rather than listing the archive and replaying the chain. Writes are compare-and-swap
+on the head's generation: of two overlapping writers, the second finds the head moved on, deletes the entry it
+wrote and retries against the new head.
+
+E.g.
+archive = SnapshotArchive(LocalFileBackend('~/fpl_archive'))
+archive.write(json.loads(response.content), dt.datetime.utcnow())
+snapshot = archive.read(dt.datetime(2019, 8, 10, 11))
+for snapshot_time, snapshot in archive.replay():
+    ...
+"""
+
+import datetime as dt
+import gzip
+import json
+import typing
+
+try:
+    from gcp.storage_backends import BlobBackend, PreconditionFailed
+except ImportError:  # deployed: gcp/ is the function source root
+    from storage_backends import BlobBackend, PreconditionFailed
+
+ENTITY_KEYS = ('teams', 'elements', 'events')
+ARCHIVE_PREFIX = 'fpl_archive/'
+HEAD_NAME = 'HEAD'
+WRITE_ATTEMPTS = 3
+
+_TIME_FORMAT = '%Y%m%dT%H%M%S.%f'
+_BASE, _DELTA = 'base', 'delta'
+
+
+class ArchiveEntry(typing.NamedTuple):
+    snapshot_time: dt.datetime
+    kind: str  # 'base' or 'delta'
+    name: str  # blob name
+
+
+def _compress(payload: typing.Dict) -> bytes:
+    return gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+
+def _decompress(data: bytes) -> typing.Dict:
+    return json.loads(gzip.decompress(data).decode('utf-8'))
+
+
+def diff_snapshots(previous: typing.Dict, current: typing.Dict) -> typing.Dict:
+    """What changed between two snapshots, such that apply_delta(previous, delta) == current."""
+    delta = {'entities': {}, 'changed': {}, 'removed': [key for key in previous if key not in current]}
+
+    for key, value in current.items():
+        if key in ENTITY_KEYS and key in previous:
+            previous_records = {record['id']: record for record in previous[key]}
+            current_ids = [record['id'] for record in value]
+
+            entity_delta = {
+                'upserts': [record for record in value if previous_records.get(record['id']) != record],
+                'deletes': sorted(set(previous_records) - set(current_ids)),
+            }
+            new_ids = [record['id'] for record in entity_delta['upserts'] if record['id'] not in previous_records]
+            deleted = set(entity_delta['deletes'])
+            if [i for i in previous_records if i not in deleted] + new_ids != current_ids:
+                entity_delta['order'] = current_ids  # only stored when records were reordered
+
+            if entity_delta['upserts'] or entity_delta['deletes'] or 'order' in entity_delta:
+                delta['entities'][key] = entity_delta
+        elif previous.get(key) != value or key not in previous:
+            delta['changed'][key] = value
+
+    return delta
+
+
+def apply_delta(previous: typing.Dict, delta: typing.Dict) -> typing.Dict:
+    """The snapshot following previous; previous itself is left unchanged."""
+    current = {key: value for key, value in previous.items() if key not in delta['removed']}
+    current.update(delta['changed'])
+
+    for key, entity_delta in delta['entities'].items():
+        records = {record['id']: record for record in previous[key]}
+        for entity_id in entity_delta['deletes']:
+            del records[entity_id]
+        order = entity_delta.get('order') or \
+            list(records) + [record['id'] for record in entity_delta['upserts'] if record['id'] not in records]
+        records.update((record['id'], record) for record in entity_delta['upserts'])
+        current[key] = [records[entity_id] for entity_id in order]
+
+    return current
+
+
+class SnapshotArchive(object):
+    """Writes and reconstructs bootstrap-static snapshots held in a storage backend.
+
+    :param backend: gcp.storage_backends.BlobBackend to store the archive in
+    :param prefix: blob name prefix of the archive
+    :param base_every: a full snapshot is stored every base_every writes, bounding the deltas applied per read
+    """
+
+    def __init__(self, backend: BlobBackend, prefix: str = ARCHIVE_PREFIX, base_every: int = 24):
+        self.backend = backend
+        self.prefix = prefix
+        self.base_every = base_every
+        self._latest = None  # (entry, snapshot) last written or read, so consecutive writes skip a rebuild
+
+    def _name(self, snapshot_time: dt.datetime, kind: str) -> str:
+        return f'{self.prefix}{snapshot_time.strftime(_TIME_FORMAT)}.{kind}.json.gz'
+
+    def parse_name(self, name: str) -> ArchiveEntry:
+        time_string, kind = name[len(self.prefix):].split('.json.gz')[0].rsplit('.', 1)
+        return ArchiveEntry(dt.datetime.strptime(time_string, _TIME_FORMAT), kind, name)
+
+    def entries(self) -> typing.List[ArchiveEntry]:
+        return [self.parse_name(name) for name in self.backend.list(self.prefix) if name.endswith('.json.gz')]
+
+    @property
+    def _head_name(self) -> str:
+        return self.prefix + HEAD_NAME
+
+    def _read_head(self) -> typing.Tuple[typing.Dict, int]:
+        """The head, {'chain': entry names, 'snapshot': latest snapshot}, and its generation (0 if missing)."""
+        try:
+            data, generation = self.backend.read_generation(self._head_name)
+        except KeyError:
+            # archives written before the head existed, or empty ones
+            try:
+                chain = self._chain(self.entries())
+            except KeyError:
+                return {'chain': [], 'snapshot': None}, 0
+            return {'chain': [entry.name for entry in chain], 'snapshot': self._rebuild(chain)}, 0
+        return _decompress(data), generation
+
+    def _chain(self, entries: typing.List[ArchiveEntry], snapshot_time: dt.datetime = None
+               ) -> typing.List[ArchiveEntry]:
+        """The latest base at or before snapshot_time, followed by the deltas after it up to snapshot_time."""
+        if snapshot_time is not None:
+            entries = [entry for entry in entries if entry.snapshot_time <= snapshot_time]
+        bases = [i for i, entry in enumerate(entries) if entry.kind == _BASE]
+        if not bases:
+            raise KeyError(f'No archived snapshot at or before {snapshot_time}')
+        return entries[bases[-1]:]
+
+    def _rebuild(self, chain: typing.List[ArchiveEntry]) -> typing.Dict:
+        if self._latest is not None and self._latest[0] in chain:
+            start = chain.index(self._latest[0])
+            snapshot = self._latest[1]
+        else:
+            start = 0
+            snapshot = _decompress(self.backend.read(chain[0].name))
+
+        latest = chain[start]
+        for entry in chain[start + 1:]:
+            delta = _decompress(self.backend.read(entry.name))
+            if delta.get('previous', latest.name) == latest.name:  # else left by a writer that lost a race
+                snapshot = apply_delta(snapshot, delta)
+                latest = entry
+
+        self._latest = (latest, snapshot)
+        return snapshot
+
+    def write(self, snapshot: typing.Dict, snapshot_time: dt.datetime, attempts: int = WRITE_ATTEMPTS) -> str:
+        """Archives a snapshot taken after every one already archived, returning the blob name written.
+
+        Raises ValueError if snapshot_time isn't after the latest archived snapshot, and PreconditionFailed if
+        other writers moved the head on attempts times in a row.
+        """
+        for _ in range(attempts):
+            head, generation = self._read_head()
+            chain = [self.parse_name(name) for name in head['chain']]
+            if chain and snapshot_time <= chain[-1].snapshot_time:
+                raise ValueError(f'{snapshot_time} is not after the latest archived snapshot')
+
+            if not chain or len(chain) >= self.base_every:
+                chain = [ArchiveEntry(snapshot_time, _BASE, self._name(snapshot_time, _BASE))]
+                payload = snapshot
+            else:
+                payload = dict(diff_snapshots(head['snapshot'], snapshot), previous=chain[-1].name)
+                chain.append(ArchiveEntry(snapshot_time, _DELTA, self._name(snapshot_time, _DELTA)))
+
+            try:
+                self.backend.write(chain[-1].name, _compress(payload), if_generation_match=0)
+            except PreconditionFailed:  # another writer is archiving a snapshot from the same time
+                continue
+            try:
+                self.backend.write(self._head_name, _compress({'chain': [entry.name for entry in chain],
+                                                               'snapshot': snapshot}),
+                                   if_generation_match=generation)
+            except PreconditionFailed:
+                self.backend.delete(chain[-1].name)
+                continue
+
+            self._latest = (chain[-1], snapshot)
+            return chain[-1].name
+
+        raise PreconditionFailed(f'Archiving {snapshot_time} lost to concurrent writers {attempts} times')
+
+    def read(self, snapshot_time: dt.datetime = None) -> typing.Dict:
+        """The snapshot as it was at snapshot_time (by default the latest), raising KeyError if there was none."""
+        if snapshot_time is None:
+            try:
+                return _decompress(self.backend.read(self._head_name))['snapshot']
+            except KeyError:
+                pass
+        return self._rebuild(self._chain(self.entries(), snapshot_time))
+
+    def replay(self, start: dt.datetime = None, end: dt.datetime = None
+               ) -> typing.Iterator[typing.Tuple[dt.datetime, typing.Dict]]:
+        """Every archived (snapshot time, snapshot) between start and end, applying each delta once."""
+        entries = self.entries()
+        if start is not None:
+            try:
+                entries = entries[entries.index(self._chain(entries, start)[0]):]
+            except KeyError:  # start is before the first snapshot
+                pass
+
+        snapshot, latest_name = None, None
+        for entry in entries:
+            if end is not None and entry.snapshot_time > end:
+                break
+            payload = _decompress(self.backend.read(entry.name))
+            if entry.kind == _BASE:
+                snapshot = payload
+            elif snapshot is None or payload.get('previous', latest_name) != latest_name:
+                continue
+            else:
+                snapshot = apply_delta(snapshot, payload)
+            latest_name = entry.name
+
+            if start is None or entry.snapshot_time >= start:
+                yield entry.snapshot_time, snapshot
@@ -0,0 +1,209 @@
+"""Writes the tables held in an FPL bootstrap-static snapshot to a storage backend.
+
+Each snapshot is appended (rather than replacing the table) with typed columns, partitioned by the
+current_event and date_created columns, and stamped with its snapshot_time. Rows whose content is unchanged
+since the last snapshot written for that entity id are skipped, using a per-row content hash. Fields FPL adds to
+a table are added as new (nullable) columns on the next append; fields it drops are left null from then on.
+
+Backends:
+1. SqliteTableBackend -> local SQLite file, for development, tests and benchmarks
+2. BigQueryTableBackend -> BigQuery dataset per table, as used by the deployed Cloud Function
+"""
+
+import datetime as dt
+import json
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# top-level modules, copied into the function source when deployed, see create_resources.build_source
+import instrumentation
+from api_handler.schema import apply_dtypes, FPL_DTYPES
+
+# table name -> bootstrap-static key
+SNAPSHOT_TABLES = {
+    'teams': 'teams',
+    'players': 'elements',
+    'events': 'events',
+    'fixtures': 'next_event_fixtures',
+}
+
+# table name -> columns coerced to a fixed dtype, those of the FPL API table it holds
+TABLE_DTYPES = {table_name: FPL_DTYPES['fixtures' if key == 'next_event_fixtures' else key]
+                for table_name, key in SNAPSHOT_TABLES.items()}
+
+HASH_COLUMN = 'row_hash'
+
+
+def typed_table(records: typing.List[typing.Dict], dtypes: typing.Dict[str, str]) -> pd.DataFrame:
+    """Builds a table from API records, serialising nested values to JSON and coercing known columns.
+
+    Integer columns with missing values, e.g. a field FPL has dropped from some records, become nullable integers.
+    """
+    df = pd.DataFrame.from_records(records)
+
+    for column in df.columns[df.dtypes == object]:
+        if df[column].map(lambda v: isinstance(v, (list, dict))).any():
+            df[column] = df[column].map(json.dumps)
+
+    return apply_dtypes(df, dtypes)
+
+
+def snapshot_table(snapshot: typing.Dict, table_name: str, snapshot_time: dt.datetime) -> pd.DataFrame:
+    """One typed table from a bootstrap-static snapshot, with row hash and partition columns added."""
+    df = typed_table(snapshot[SNAPSHOT_TABLES[table_name]], TABLE_DTYPES[table_name])
+    # columns are hashed in name order, as a record missing a field moves that column to the end of the table
+    df[HASH_COLUMN] = pd.util.hash_pandas_object(df[sorted(df.columns)], index=False).values.view('int64')
+    df['current_event'] = snapshot['current-event']
+    df['date_created'] = snapshot_time.date().isoformat()
+    df['snapshot_time'] = pd.Timestamp(snapshot_time)
+
+    return df
+
+
+def snapshot_frames(snapshot: typing.Dict, snapshot_time: dt.datetime) -> typing.Dict[str, pd.DataFrame]:
+    return {table_name: snapshot_table(snapshot, table_name, snapshot_time) for table_name in SNAPSHOT_TABLES}
+
+
+def _sqlite_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'FLOAT'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TIMESTAMP'
+    return 'TEXT'
+
+
+class TableBackend(object):
+    """Somewhere to append snapshot tables to. Subclasses implement latest_hashes and append."""
+
+    def latest_hashes(self, table_name: str) -> typing.Dict[int, int]:
+        """Row hash most recently written for every entity id in a table."""
+        raise NotImplementedError
+
+    def append(self, table_name: str, df: pd.DataFrame):
+        """Appends rows to a table, creating it, or adding any columns it doesn't have yet, as needed."""
+        raise NotImplementedError
+
+
+class SqliteTableBackend(TableBackend):
+    """Appends to tables in a local SQLite database, e.g. the fpl_db one."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()  # SQLite allows one writer at a time anyway, and ':memory:' one connection
+
+    def latest_hashes(self, table_name):
+        query = f'SELECT id, {HASH_COLUMN} FROM {table_name} ' \
+                f'WHERE rowid IN (SELECT MAX(rowid) FROM {table_name} GROUP BY id)'
+
+        with self._lock:
+            with self.engine.connect() as conn:
+                if not self.engine.dialect.has_table(conn, table_name):
+                    return dict()
+            latest_df = pd.read_sql(query, self.engine)
+
+        return dict(zip(latest_df.id, latest_df[HASH_COLUMN]))
+
+    def _add_columns(self, conn, table_name: str, df: pd.DataFrame):
+        import sqlalchemy
+
+        if not self.engine.dialect.has_table(conn, table_name):
+            return
+        existing = {column['name'] for column in sqlalchemy.inspect(conn).get_columns(table_name)}
+        for column in df.columns:
+            if column not in existing:
+                conn.execute(sqlalchemy.text(
+                    f'ALTER TABLE {table_name} ADD COLUMN "{column}" {_sqlite_type(df[column].dtype)}'))
+
+    def append(self, table_name, df):
+        import sqlalchemy
+
+        with self._lock:
+            with self.engine.begin() as conn:
+                self._add_columns(conn, table_name, df)
+            df.to_sql(table_name, self.engine, if_exists='append', index=False)
+            with self.engine.begin() as conn:
+                for suffix, columns in (('partition', 'current_event, date_created'), ('id', 'id')):
+                    conn.execute(sqlalchemy.text(
+                        f'CREATE INDEX IF NOT EXISTS ix_{table_name}_{suffix} ON {table_name} ({columns})'))
+
+
+class BigQueryTableBackend(TableBackend):
+    """Appends to a snapshots table in a BigQuery dataset named after each table.
+
+    Reads go through pandas-gbq; appends are load jobs allowing field addition, as pandas-gbq rejects a dataframe
+    with columns the table doesn't have.
+    """
+
+    def __init__(self, project_id: str, table_suffix: str = 'snapshots'):
+        self.project_id = project_id
+        self.table_suffix = table_suffix
+        self._client = None
+
+    def _table_id(self, table_name: str) -> str:
+        return f'{table_name}.{self.table_suffix}'
+
+    def latest_hashes(self, table_name):
+        query = f'SELECT id, ARRAY_AGG({HASH_COLUMN} ORDER BY snapshot_time DESC LIMIT 1)[OFFSET(0)] ' \
+                f'AS {HASH_COLUMN} FROM `{self._table_id(table_name)}` GROUP BY id'
+        try:
+            latest_df = pd.read_gbq(query, project_id=self.project_id, dialect='standard')
+        except Exception as e:  # pandas-gbq raises a generic error for a missing table on the first write
+            if 'Not found' not in str(e):
+                raise
+            return dict()
+        return dict(zip(latest_df.id, latest_df[HASH_COLUMN]))
+
+    def append(self, table_name, df):
+        from google.cloud import bigquery
+
+        if self._client is None:
+            self._client = bigquery.Client(project=self.project_id)
+        job_config = bigquery.LoadJobConfig(
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            schema_update_options=[bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION])
+        self._client.load_table_from_dataframe(df, f'{self.project_id}.{self._table_id(table_name)}',
+                                               job_config=job_config).result()
+
+
+class SnapshotWriter(object):
+    """Writes the four bootstrap-static tables to a backend in parallel, skipping unchanged rows.
+
+    E.g. locally:
+    writer = SnapshotWriter(SqliteTableBackend(fpl_db.db.get_engine()))
+    rows_written = writer.write(json.loads(blob), dt.datetime.utcnow())
+    """
+
+    def __init__(self, backend: TableBackend, max_workers: int = len(SNAPSHOT_TABLES)):
+        self.backend = backend
+        self.max_workers = max_workers
+
+    def _write_table(self, snapshot: typing.Dict, table_name: str, snapshot_time: dt.datetime) -> int:
+        with instrumentation.span('snapshot_tables.build', table=table_name) as s:
+            df = snapshot_table(snapshot, table_name, snapshot_time)
+            s.record(rows=len(df))
+        with instrumentation.span('snapshot_tables.latest_hashes', table=table_name) as s:
+            latest_hashes = self.backend.latest_hashes(table_name)
+            s.record(rows=len(latest_hashes))
+        changed = [latest_hashes.get(entity_id) != row_hash for entity_id, row_hash in zip(df.id, df[HASH_COLUMN])]
+        changed_df = df[changed]
+
+        if len(changed_df):
+            with instrumentation.span('snapshot_tables.append', table=table_name) as s:
+                self.backend.append(table_name, changed_df)
+                s.record(rows=len(changed_df))
+        return len(changed_df)
+
+    def write(self, snapshot: typing.Dict, snapshot_time: dt.datetime) -> typing.Dict[str, int]:
+        """Appends one snapshot, returning the number of rows written per table."""
+        with instrumentation.span('snapshot_tables.write') as s:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {table_name: executor.submit(self._write_table, snapshot, table_name, snapshot_time)
+                           for table_name in SNAPSHOT_TABLES}
+                rows_written = {table_name: future.result() for table_name, future in futures.items()}
+            s.record(rows=sum(rows_written.values()))
+        return rows_written
@@ -0,0 +1,250 @@
+"""Blob storage the gcp functions read from and write to, so the same code can run against a local directory.
+
+Backends:
+1. LocalFileBackend -> files under a local directory, for development, tests and benchmarks
+2. GcsBackend -> a Google Cloud Storage bucket, as used by the deployed Cloud Functions
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import threading
+import typing
+import zlib
+
+# a top-level module, copied into the function source when deployed, see create_resources.build_source
+import instrumentation
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # GCS resumable uploads need a multiple of 256KB
+
+
+class ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, holding at most one chunk in memory."""
+
+    def __init__(self, chunks: typing.Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            try:
+                self._buffer = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def gzip_chunks(chunks: typing.Iterable[bytes], level: int = 6) -> typing.Iterator[bytes]:
+    """Gzip compresses a stream of chunks as it goes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class PreconditionFailed(Exception):
+    """A conditional write found the blob at another generation than the one expected."""
+
+
+class BlobBackend(object):
+    """Named blobs of bytes. Subclasses implement read, read_generation, write and list.
+
+    Every write gives a blob a new generation, a positive integer. Writing with if_generation_match only succeeds
+    if the blob is still at that generation (0: if it doesn't exist yet), and raises PreconditionFailed otherwise,
+    so concurrent read-modify-write cycles can't overwrite each other.
+    """
+
+    def read(self, name: str) -> bytes:
+        raise NotImplementedError
+
+    def read_generation(self, name: str) -> typing.Tuple[bytes, int]:
+        """A blob's content and the generation it was read at, raising KeyError if there is no such blob."""
+        raise NotImplementedError
+
+    def write(self, name: str, data: bytes, if_generation_match: int = None):
+        raise NotImplementedError
+
+    def list(self, prefix: str = '') -> typing.List[str]:
+        """Sorted names of every blob starting with prefix."""
+        raise NotImplementedError
+
+    def delete(self, name: str):
+        raise NotImplementedError
+
+    def upload_stream(self, name: str, stream: typing.BinaryIO, chunk_size: int = UPLOAD_CHUNK_SIZE):
+        """Writes a blob from a readable file object; backends override this to avoid reading it all at once."""
+        self.write(name, stream.read())
+
+    def size(self, prefix: str = '') -> int:
+        """Total bytes stored under prefix."""
+        return sum(len(self.read(name)) for name in self.list(prefix))
+
+
+class LocalFileBackend(BlobBackend):
+    """Stores each blob as a file under root; '/' in blob names become subdirectories.
+
+    Generations are derived from the content, and conditional writes are only atomic within this process.
+    """
+
+    _conditional_write_lock = threading.Lock()
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split('/'))
+
+    def read(self, name):
+        try:
+            with open(self._path(name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(name)
+
+    @staticmethod
+    def _generation(data: bytes) -> int:
+        return int.from_bytes(hashlib.sha1(data).digest()[:7], 'big') + 1
+
+    def read_generation(self, name):
+        data = self.read(name)
+        return data, self._generation(data)
+
+    def write(self, name, data, if_generation_match=None):
+        if if_generation_match is None:
+            self.upload_stream(name, io.BytesIO(data))
+            return
+
+        with self._conditional_write_lock:
+            try:
+                generation = LocalFileBackend.read_generation(self, name)[1]
+            except KeyError:
+                generation = 0
+            if generation != if_generation_match:
+                raise PreconditionFailed(f'{name} is at generation {generation}, not {if_generation_match}')
+            self.upload_stream(name, io.BytesIO(data))
+
+    def upload_stream(self, name, stream, chunk_size=UPLOAD_CHUNK_SIZE):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(stream, f, chunk_size)
+        os.replace(tmp_path, path)  # readers never see a half written blob
+
+    def delete(self, name):
+        os.remove(self._path(name))
+
+    def list(self, prefix=''):
+        names = []
+        for dir_path, _, file_names in os.walk(self.root):
+            rel_dir = os.path.relpath(dir_path, self.root).replace(os.sep, '/')
+            for file_name in file_names:
+                name = file_name if rel_dir == '.' else f'{rel_dir}/{file_name}'
+                if name.startswith(prefix) and not name.endswith('.tmp'):
+                    names.append(name)
+        return sorted(names)
+
+    def size(self, prefix=''):
+        return sum(os.path.getsize(self._path(name)) for name in self.list(prefix))
+
+
+class GcsBackend(BlobBackend):
+    """Stores blobs in a Cloud Storage bucket."""
+
+    def __init__(self, bucket_name: str, client=None):
+        if client is None:
+            from gcloud import storage
+            client = storage.Client()
+        self.bucket = client.bucket(bucket_name)
+
+    def read(self, name):
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            raise KeyError(name)
+        return blob.download_as_string()
+
+    def read_generation(self, name):
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            raise KeyError(name)
+        return blob.download_as_string(), blob.generation  # the media link downloads that generation
+
+    def write(self, name, data, if_generation_match=None):
+        if if_generation_match is None:
+            self.bucket.blob(name).upload_from_string(data)
+            return
+
+        # gcloud's uploads take no preconditions, so make a simple media upload with ifGenerationMatch directly
+        from gcloud.exceptions import PreconditionFailed as GcsPreconditionFailed
+
+        connection = self.bucket.client.connection
+        try:
+            connection.api_request(
+                method='POST', path=f'{self.bucket.path}/o', data=data, content_type='application/octet-stream',
+                query_params={'uploadType': 'media', 'name': name, 'ifGenerationMatch': if_generation_match},
+                api_base_url=connection.API_BASE_URL + '/upload')
+        except GcsPreconditionFailed as e:
+            raise PreconditionFailed(str(e))
+
+    def upload_stream(self, name, stream, chunk_size=UPLOAD_CHUNK_SIZE):
+        # with a chunk size and no known total size, gcloud makes a resumable upload, reading a chunk at a time
+        blob = self.bucket.blob(name)
+        blob.chunk_size = chunk_size
+        blob.upload_from_file(stream)
+
+    def delete(self, name):
+        self.bucket.delete_blob(name)
+
+    def list(self, prefix=''):
+        return sorted(blob.name for blob in self.bucket.list_blobs(prefix=prefix))
+
+    def size(self, prefix=''):
+        return sum(blob.size for blob in self.bucket.list_blobs(prefix=prefix))
+
+
+def _counted(chunks: typing.Iterable[bytes], span) -> typing.Iterator[bytes]:
+    """Passes chunks through, recording their total size on an instrumentation span."""
+    for chunk in chunks:
+        span.record(bytes=len(chunk))
+        yield chunk
+
+
+def stream_url_to_blob(url: str, backend: BlobBackend, name: str, compress: bool = True,
+                       chunk_size: int = UPLOAD_CHUNK_SIZE, session=None) -> str:
+    """Pipes an HTTP response body into a blob chunk by chunk, so memory use doesn't grow with the payload.
+
+    :param url: URL to GET
+    :param backend: backend to write the blob to
+    :param name: blob name
+    :param compress: gzip the body on the way through
+    :param chunk_size: bytes read from the response and sent to the backend at a time
+    :param session: optional requests.Session to make the request with
+    :return: name of the blob written
+    """
+    if session is None:
+        import requests  # deferred, so code that only reads and writes blobs doesn't pay for importing it
+        session = requests
+
+    with instrumentation.span('storage_backends.stream_url_to_blob', blob=name) as s, \
+            session.get(url, stream=True) as response:
+        if response.status_code != 200:
+            raise ConnectionError(f'{url} returned HTTP status {response.status_code}')
+
+        chunks = _counted(response.iter_content(chunk_size), s)
+        if compress:
+            chunks = gzip_chunks(chunks)
+        # buffered, so every read but the last returns a full chunk_size, as resumable uploads expect
+        backend.upload_stream(name, io.BufferedReader(ChunkStream(chunks), chunk_size), chunk_size)
+
+    return name
@@ -0,0 +1,388 @@
+"""Timing spans for the ingest-to-feature pipeline: fetch, parse, table build, feature stages and writes.
+
+A span times a block of work and records what it handled (rows, bytes) and the memory it took. Spans nest per
+thread; each records the name of the span it ran inside. Finished spans are kept by the active Recorder, which
+exports them as JSON, logs each one as a JSON line, or both. A Recorder can keep just the most recent spans, as
+the one configure_from_env enables does so that a warm Cloud Function instance doesn't accumulate them.
+
+Nothing is recorded until enable() is called (or FPL_INSTRUMENTATION is set, see configure_from_env). While
+disabled, span() returns a shared do-nothing span and timed functions call straight through, so instrumented code
+costs a function call and a global lookup per span.
+
+Options when enabled:
+trace_memory -> peak memory allocated by Python within each span, via tracemalloc (slows allocation-heavy code
+a few times over, so leave it off in production); otherwise spans only record the process's peak RSS so far.
+tracemalloc counts allocations process-wide, so only spans in the thread that enabled recording trace memory;
+spans in worker threads (e.g. SnapshotWriter's table writes) record peak_memory None, and what the workers allocate
+counts towards the enclosing span of the enabling thread. Before Python 3.9, which added tracemalloc.reset_peak,
+peak_memory is the memory a span left allocated when it finished, or the largest of its children's, so it
+understates spans whose temporaries were freed before they finished
+profile_dir -> cProfile each outermost span, one .prof file per span, for reading with pstats or snakeviz
+
+Only spans recorded in this process are collected: work done in process pools is timed by the parent, if at all.
+
+E.g.
+recorder = instrumentation.enable()
+with instrumentation.span('xml_soccer.parse', season='1819') as s:
+    matches_df = parse(content)
+    s.record(rows=len(matches_df), bytes=len(content))
+
+@instrumentation.timed('features.form')
+def build_form(matches_df): ...
+
+recorder.export_json('spans.json')
+"""
+
+import collections
+import contextlib
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import typing
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+INSTRUMENTATION_ENV = 'FPL_INSTRUMENTATION'
+PROFILE_DIR_ENV = 'FPL_PROFILE_DIR'
+ENV_MAX_SPANS = 1000  # spans kept by the recorder configure_from_env enables; every one is logged regardless
+
+_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')  # Python 3.9+
+
+_recorder = None  # the active Recorder, None while disabled
+_started_tracemalloc = False  # whether enable() started tracemalloc, and so disable() should stop it
+
+
+def _max_rss() -> typing.Optional[int]:
+    """Peak resident set size of this process so far, in bytes."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024  # kilobytes everywhere else
+
+
+class _NullSpan(object):
+    """What span() returns while instrumentation is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def record(self, rows: int = None, bytes: int = None, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span(object):
+    """One timed block of work. Use through span() rather than directly.
+
+    :param recorder: recorder the span is kept by when it finishes
+    :param name: dotted name, e.g. 'snapshot_tables.write_table'
+    :param attributes: anything else worth keeping, e.g. the table name; must be JSON serialisable
+    """
+
+    def __init__(self, recorder: 'Recorder', name: str, attributes: typing.Dict):
+        self.recorder = recorder
+        self.name = name
+        self.attributes = attributes
+        self.rows = None
+        self.bytes = None
+        self.parent = None
+        self.depth = 0
+        self._start = None
+        self._start_time = None
+        self._trace_memory = False
+        self._start_memory = 0
+        self._peak_memory = 0
+        self._profiler = None
+
+    def record(self, rows: int = None, bytes: int = None, **attributes):
+        """Notes the rows and bytes the span handled, adding to any recorded before, plus any attributes."""
+        if rows is not None:
+            self.rows = (self.rows or 0) + int(rows)
+        if bytes is not None:
+            self.bytes = (self.bytes or 0) + int(bytes)
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        if stack:
+            self.parent = stack[-1]
+            self.depth = len(stack)
+        stack.append(self)
+
+        self._trace_memory = self.recorder._traces_memory()
+        if self._trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if _RESET_PEAK:
+                if self.parent is not None:
+                    self.parent._peak_memory = max(self.parent._peak_memory, peak)
+                tracemalloc.reset_peak()
+            self._start_memory = self._peak_memory = current
+
+        if self.parent is None and self.recorder.profile_dir is not None:
+            self._profiler = self.recorder._start_profiler()
+
+        self._start_time = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self._start
+
+        profile_path = None
+        if self._profiler is not None:
+            profile_path = self.recorder._stop_profiler(self._profiler, self.name)
+
+        peak_memory = None
+        if self._trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            self._peak_memory = max(self._peak_memory, peak if _RESET_PEAK else current)
+            peak_memory = self._peak_memory - self._start_memory
+            if self.parent is not None:
+                self.parent._peak_memory = max(self.parent._peak_memory, self._peak_memory)
+
+        stack = self.recorder._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+
+        self.recorder._finish({
+            'name': self.name,
+            'parent': self.parent.name if self.parent is not None else None,
+            'depth': self.depth,
+            'start': self._start_time,
+            'seconds': seconds,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'peak_memory': peak_memory,
+            'max_rss': _max_rss(),
+            'error': exc_type.__name__ if exc_type is not None else None,
+            'profile': profile_path,
+            'attributes': self.attributes,
+        })
+        return False
+
+
+class Recorder(object):
+    """Collects finished spans. Use through enable() rather than directly.
+
+    :param trace_memory: record the peak memory Python allocated within each span, with tracemalloc, for spans in
+    the thread that created the recorder
+    :param profile_dir: directory to write a cProfile .prof file of each outermost span to, None not to profile
+    :param log: also log each span as it finishes, as one JSON line
+    :param logger: logger to log spans to, by default this module's
+    :param max_spans: keep only this many of the most recently finished spans, None to keep them all
+    """
+
+    def __init__(self, trace_memory: bool = False, profile_dir: typing.Optional[str] = None, log: bool = False,
+                 logger: logging.Logger = None, max_spans: typing.Optional[int] = None):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.log = log
+        self.logger = logger or logging.getLogger(__name__)
+        self.spans = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiling = False
+        self._n_profiles = 0
+        self._memory_thread = threading.get_ident()
+
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def _stack(self) -> typing.List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _traces_memory(self) -> bool:
+        return self.trace_memory and threading.get_ident() == self._memory_thread and tracemalloc.is_tracing()
+
+    def _start_profiler(self) -> typing.Optional[cProfile.Profile]:
+        with self._lock:  # one profiler at a time; outermost spans in other threads go unprofiled meanwhile
+            if self._profiling:
+                return None
+            self._profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, profiler: cProfile.Profile, name: str) -> str:
+        profiler.disable()
+        with self._lock:
+            self._profiling = False
+            self._n_profiles += 1
+            path = os.path.join(self.profile_dir, f'{name}-{self._n_profiles}.prof')
+        profiler.dump_stats(path)
+        return path
+
+    def _finish(self, record: typing.Dict):
+        with self._lock:
+            self.spans.append(record)
+        if self.log:
+            self.logger.info(json.dumps(record, default=str))
+
+    def span(self, name: str, **attributes) -> Span:
+        return Span(self, name, attributes)
+
+    def add(self, name: str, seconds: float, rows: int = None, bytes: int = None, **attributes):
+        """Records work timed elsewhere, e.g. in a worker process, as a finished span inside the current one."""
+        stack = self._stack()
+        self._finish({
+            'name': name,
+            'parent': stack[-1].name if stack else None,
+            'depth': len(stack),
+            'start': time.time() - seconds,
+            'seconds': seconds,
+            'rows': rows,
+            'bytes': bytes,
+            'peak_memory': None,
+            'max_rss': None,
+            'error': None,
+            'profile': None,
+            'attributes': attributes,
+        })
+
+    def summary(self) -> typing.Dict[str, typing.Dict]:
+        """Totals per span name: count, seconds, rows and bytes, and the largest peak_memory."""
+        totals = dict()
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            total = totals.setdefault(record['name'], {'count': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0,
+                                                       'peak_memory': None})
+            total['count'] += 1
+            total['seconds'] += record['seconds']
+            total['rows'] += record['rows'] or 0
+            total['bytes'] += record['bytes'] or 0
+            if record['peak_memory'] is not None:
+                total['peak_memory'] = max(total['peak_memory'] or 0, record['peak_memory'])
+        return totals
+
+    def to_json(self, indent: int = None) -> str:
+        """Every finished span kept, in the order they finished, as a JSON array."""
+        with self._lock:
+            return json.dumps(list(self.spans), indent=indent, default=str)
+
+    def export_json(self, path: str, indent: int = 2):
+        with open(path, 'w') as f:
+            f.write(self.to_json(indent=indent))
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+def enable(trace_memory: bool = False, profile_dir: typing.Optional[str] = None, log: bool = False,
+           logger: logging.Logger = None, max_spans: typing.Optional[int] = None) -> Recorder:
+    """Starts recording spans with a new Recorder, replacing any active one, and returns it.
+
+    See Recorder for the parameters.
+    """
+    global _recorder, _started_tracemalloc
+    disable()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _recorder = Recorder(trace_memory=trace_memory, profile_dir=profile_dir, log=log, logger=logger,
+                         max_spans=max_spans)
+    return _recorder
+
+
+def disable() -> typing.Optional[Recorder]:
+    """Stops recording spans, returning the Recorder that was active, if any.
+
+    tracemalloc is stopped only if enable() started it, not if it was already tracing, e.g. under python -X tracemalloc.
+    """
+    global _recorder, _started_tracemalloc
+    recorder, _recorder = _recorder, None
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    return recorder
+
+
+def active_recorder() -> typing.Optional[Recorder]:
+    return _recorder
+
+
+@contextlib.contextmanager
+def recording(**kwargs) -> typing.Iterator[Recorder]:
+    """Records spans only within a with block, e.g. for a benchmark or a test; see enable for the kwargs."""
+    recorder = enable(**kwargs)
+    try:
+        yield recorder
+    finally:
+        disable()
+
+
+def configure_from_env(environ: typing.Mapping[str, str] = os.environ) -> typing.Optional[Recorder]:
+    """Enables recording, logging every span and keeping the last ENV_MAX_SPANS, if FPL_INSTRUMENTATION is set.
+
+    Its value is a comma separated list of options: 'memory' to trace memory, 'profile' to profile outermost
+    spans into FPL_PROFILE_DIR (by default /tmp/fpl_profiles); anything else, e.g. '1', just records timings.
+    """
+    options = {option.strip() for option in environ.get(INSTRUMENTATION_ENV, '').split(',') if option.strip()}
+    if not options:
+        return None
+    profile_dir = environ.get(PROFILE_DIR_ENV, os.path.join('/tmp', 'fpl_profiles')) if 'profile' in options \
+        else None
+    return enable(trace_memory='memory' in options, profile_dir=profile_dir, log=True, max_spans=ENV_MAX_SPANS)
+
+
+def span(name: str, **attributes) -> typing.Union[Span, _NullSpan]:
+    """Context manager timing its block as a span named name, if recording; see the module docstring."""
+    if _recorder is None:
+        return _NULL_SPAN
+    return _recorder.span(name, **attributes)
+
+
+def add_span(name: str, seconds: float, rows: int = None, bytes: int = None, **attributes):
+    """Records work timed elsewhere as a finished span, if recording; see Recorder.add."""
+    if _recorder is not None:
+        _recorder.add(name, seconds, rows=rows, bytes=bytes, **attributes)
+
+
+def frame_rows(result) -> typing.Optional[int]:
+    """Row count of a dataframe or array result, or of the first one in a tuple of them."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    return len(result) if hasattr(result, 'shape') else None
+
+
+def timed(name: str = None, rows: typing.Callable[[typing.Any], typing.Optional[int]] = frame_rows):
+    """Decorator timing every call of a function as a span.
+
+    :param name: span name, by default the function's module and qualified name
+    :param rows: function of the return value giving the rows to record, by default its length if it is a
+    dataframe or array (or a tuple starting with one)
+    """
+    def decorator(func):
+        span_name = name or f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with _recorder.span(span_name) as s:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    s.record(rows=rows(result))
+                return result
+
+        return wrapper
+
+    return decorator
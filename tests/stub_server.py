@@ -0,0 +1,58 @@
+"""Local HTTP server standing in for the football APIs, so client tests never touch the network."""
+
+import threading
+import typing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# route handler: takes (path, query params, request headers), returns (status, response headers, body)
+Route = typing.Callable[[str, typing.Dict, typing.Dict], typing.Tuple[int, typing.Dict, bytes]]
+
+
+class StubServer(object):
+    """Serves routes keyed by path prefix on localhost, recording every request it receives.
+
+    Use as a context manager:
+    with StubServer({'/matches/': handler}) as server:
+        rq.get(server.url + '/matches/')
+    """
+
+    def __init__(self, routes: typing.Dict[str, Route]):
+        self.routes = routes
+        self.requests = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                stub.requests.append((parsed.path, self.headers))
+
+                for prefix, route in stub.routes.items():
+                    if parsed.path.startswith(prefix):
+                        status, headers, body = route(parsed.path, parse_qs(parsed.query), self.headers)
+                        break
+                else:
+                    status, headers, body = 404, {}, b'not found'
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
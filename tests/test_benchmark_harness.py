@@ -0,0 +1,56 @@
+import unittest
+
+import pandas as pd
+
+from api_handler import football_data, xml_soccer
+from benchmarks import harness, synthetic
+
+
+class TestSyntheticPayloads(unittest.TestCase):
+
+    def test_xml_soccer_payload_parses_to_season(self):
+        scale = synthetic.Scale(n_teams=6, n_seasons=1, n_players=50, n_snapshots=1)
+        cache, (season_start,) = harness._xml_soccer_cache(scale)
+
+        parsed_df = xml_soccer.get_season_matches_df(harness.LEAGUE_CODE, harness._season_date_string(season_start),
+                                                     cache=cache, offline=True)
+
+        season_df = synthetic.xml_soccer_season(season_start, n_teams=6, lineups=True)
+        self.assertEqual(len(parsed_df), len(season_df))
+        self.assertEqual(list(parsed_df.HomeLineupDefense), list(season_df.HomeLineupDefense))
+        pd.testing.assert_frame_equal(xml_soccer.process_season_matches(parsed_df)[1],
+                                      xml_soccer.process_season_matches(season_df)[1], check_categorical=False)
+
+    def test_football_data_payload_parses_to_season(self):
+        scale = synthetic.Scale(n_teams=6, n_seasons=1, n_players=50, n_snapshots=1)
+        cache, (season_start,) = harness._football_data_cache(scale)
+
+        parsed_df = football_data.get_season_matches(harness.COMPETITION_CODE, season_start, season_start + 1,
+                                                     '90-91', cache=cache, offline=True)
+
+        pd.testing.assert_frame_equal(parsed_df, synthetic.football_data_season(season_start, n_teams=6))
+
+
+class TestHarness(unittest.TestCase):
+
+    def test_run_every_case(self):
+        scale = synthetic.Scale(n_teams=4, n_seasons=1, n_players=50, n_snapshots=2)
+        for case in harness.CASES:
+            result = harness.time_case(case, scale, repeats=1)
+            self.assertGreater(result['rows'], 0, case.name)
+            self.assertGreaterEqual(result['seconds'], 0)
+
+    def test_compare(self):
+        def results(seconds):
+            return {'results': [{'case': case, 'scale': 'small', 'seconds': s} for case, s in seconds.items()]}
+
+        baseline = results({'parse': 1.0, 'process': 0.001, 'write': 2.0})
+        current = results({'parse': 1.5, 'process': 0.005, 'write': 2.1, 'new': 9.0})
+
+        self.assertEqual(harness.compare(current, baseline, tolerance=0.25),
+                         [harness.Regression('parse', 'small', 1.5, 1.0)])
+        self.assertEqual(harness.compare(current, baseline, tolerance=0.6), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import threading
+import unittest
+
+from api_handler import football_data
+from api_handler.football_data import SeasonJob
+from api_handler.rate_limit import RateLimitedSession, TokenBucket
+from stub_server import StubServer
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def competition_route(fail_first: int = 0, status: int = 429):
+    """Serves a one-match season per (competition, dateFrom), failing the first few requests."""
+    lock = threading.Lock()
+    calls = []
+
+    def route(path, params, headers):
+        with lock:
+            calls.append(path)
+            if len(calls) <= fail_first:
+                return status, {'Retry-After': '0'}, b'{}'
+
+        competition_code = int(path.split('/')[2])
+        body = {
+            'competition': {'name': f'Competition {competition_code}'},
+            'matches': [{'id': competition_code, 'utcDate': params['dateFrom'][0], 'matchday': 1}],
+        }
+        return 200, {'Content-Type': 'application/json'}, json.dumps(body).encode('utf-8')
+
+    return route
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_requests_spaced_at_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate_per_minute=6, capacity=2, clock=clock, sleep=clock.sleep)
+
+        acquired_at = []
+        for _ in range(5):
+            bucket.acquire()
+            acquired_at.append(clock.now)
+
+        self.assertEqual(acquired_at, [0, 0, 10, 20, 30])
+
+    def test_pause_holds_back_callers(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate_per_minute=60, capacity=5, clock=clock, sleep=clock.sleep)
+
+        bucket.pause(30)
+        bucket.acquire()
+
+        self.assertGreaterEqual(clock.now, 30)
+
+
+class TestBulkFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.original_url = football_data.FOOTBALL_DATA_API_URL
+        self.addCleanup(setattr, football_data, 'FOOTBALL_DATA_API_URL', self.original_url)
+
+    def test_retries_rate_limited_and_server_errors(self):
+        for status in (429, 503):
+            with StubServer({'/competitions/': competition_route(fail_first=2, status=status)}) as server:
+                football_data.FOOTBALL_DATA_API_URL = server.url + '/'
+                session = RateLimitedSession(limiter=TokenBucket(6000), backoff=0.01)
+                season_df = football_data.get_season_matches(2021, 2017, 2018, '17-18', session=session)
+
+            self.assertEqual(len(server.requests), 3)
+            self.assertEqual(season_df.competitionName.tolist(), ['Competition 2021'])
+
+    def test_streams_every_job(self):
+        jobs = [SeasonJob(c, y, y + 1, f'{y}') for c in (2021, 2001, 2055, 2056) for y in range(2015, 2019)]
+
+        with StubServer({'/competitions/': competition_route(fail_first=1)}) as server:
+            football_data.FOOTBALL_DATA_API_URL = server.url + '/'
+            session = RateLimitedSession(limiter=TokenBucket(60000, capacity=4), backoff=0.01, pool_size=4)
+            results = list(football_data.iter_season_matches(jobs, max_workers=4, session=session))
+            seasons_df = football_data.get_seasons_matches(jobs[:3], max_workers=2, session=session)
+
+        self.assertEqual(sorted(job for job, _ in results), sorted(jobs))
+        for job, season_df in results:
+            self.assertEqual(season_df.id.tolist(), [job.competition_code])
+            self.assertEqual(season_df.utcDate.tolist(), [f'{job.year_start}-08-01'])
+        self.assertEqual(len(seasons_df), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import tempfile
+import unittest
+
+import pandas as pd
+
+from analytics import features
+from api_handler import xml_soccer
+from benchmarks import synthetic
+
+
+class TestLineupFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.season_detail_df = synthetic.xml_soccer_seasons(2, n_teams=4, lineups=True)
+        self.season_detail_df.loc[0, 'HomeLineupForward'] = None
+        self.matches_df, _ = xml_soccer.process_season_matches(self.season_detail_df)
+
+    def test_lineups(self):
+        lineup_s = features.get_match_lineup_vector(self.matches_df, self.season_detail_df)
+        self.assertTrue(lineup_s.index.equals(self.matches_df.index))
+
+        self.assertEqual(lineup_s.iloc[7], self.expected_lineup(3, 'Away'))
+        self.assertEqual(len(lineup_s.iloc[7]), 11)
+
+        # a missing position just drops out of the lineup
+        self.assertEqual(lineup_s.iloc[0], self.expected_lineup(0, 'Home'))
+        self.assertLess(len(lineup_s.iloc[0]), 11)
+
+    def expected_lineup(self, fixture_pos, side):
+        fixture = self.season_detail_df.iloc[fixture_pos].fillna('')
+        return [name.strip() for position in features.LINEUP_POSITIONS
+                for name in fixture[f'{side}Lineup{position}'].split(';') if name != '']
+
+    def test_formations(self):
+        match_side_index = features.build_match_side_index(self.season_detail_df)
+        formation_s = features.get_encoded_formation_vector(self.matches_df, self.season_detail_df, match_side_index)
+
+        self.assertEqual(formation_s.iloc[0::2].tolist(), self.season_detail_df.HomeTeamFormation.tolist())
+        self.assertEqual(formation_s.iloc[1::2].tolist(), self.season_detail_df.AwayTeamFormation.tolist())
+
+
+class TestFormFeatures(unittest.TestCase):
+
+    def setUp(self):
+        season_detail_df = synthetic.xml_soccer_seasons(3, n_teams=6)
+        self.matches_df, _ = xml_soccer.process_season_matches(season_detail_df)
+        self.features_df = features.team_form_features(self.matches_df)
+
+    def team_rows(self, team):
+        return self.matches_df[self.matches_df.TeamName == team].sort_values('MatchDate')
+
+    def test_form_uses_only_earlier_matches(self):
+        team_df = self.team_rows('Team 02')
+        team_features_df = self.features_df.loc[team_df.index]
+
+        self.assertTrue(team_features_df.iloc[0].isna().all())
+        self.assertEqual(team_features_df.PointsLag1.iloc[1:].tolist(), team_df.Points.iloc[:-1].tolist())
+        self.assertEqual(team_features_df.PointsLag3.iloc[3:].tolist(), team_df.Points.iloc[:-3].tolist())
+        self.assertAlmostEqual(team_features_df.FormGoalsFor.iloc[12], team_df.GoalsFor.iloc[7:12].mean())
+        self.assertEqual(team_features_df.RestDays.iloc[1:].tolist(),
+                         (team_df.MatchDate.diff().dt.days.iloc[1:]).tolist())
+
+    def test_last_meeting(self):
+        team_df = self.team_rows('Team 01')
+        meetings_df = team_df[team_df.MatchOpponent == 'Team 04']
+        last_meeting_s = features.get_last_played_team_vector(self.matches_df).loc[meetings_df.index]
+
+        self.assertTrue(pd.isna(last_meeting_s.iloc[0]))
+        self.assertEqual(last_meeting_s.iloc[1:].tolist(), meetings_df.Points.iloc[:-1].tolist())
+
+    def test_last_played_match_vector(self):
+        seasons = [season_df for _, season_df in self.matches_df.groupby('CompetitionSeason')]
+        seconds_s = features.get_last_played_match_vector(seasons)
+
+        self.assertEqual(len(seconds_s), len(self.matches_df))
+        self.assertEqual((seconds_s == 0).sum(), 6)
+        self.assertEqual((seconds_s > 7 * 86400).sum(), 6 * 2)  # a summer break per team between seasons
+
+    def test_incremental_matches_full_recompute(self):
+        form = features.TeamFormFeatures()
+        season_features = [form.update(season_df) for _, season_df in self.matches_df.groupby('CompetitionSeason')]
+
+        pd.testing.assert_frame_equal(pd.concat(season_features).sort_index(), self.features_df)
+        self.assertLess(len(form._context_df), len(self.matches_df) / 2)
+
+
+class TestCreateFeatureVector(unittest.TestCase):
+
+    def test_features_and_cached_rerun(self):
+        season_detail_df = synthetic.xml_soccer_seasons(2, n_teams=4, lineups=True)
+        player_stats_df = synthetic.fifa_ratings(n_teams=4, n_other_players=100)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            features_df = features.create_feature_vector(season_detail_df, player_stats_df, cache_dir=cache_dir,
+                                                         max_workers=1)
+            with self.assertLogs(features.logger, 'INFO') as logs:
+                cached_df = features.create_feature_vector(season_detail_df, player_stats_df, cache_dir=cache_dir,
+                                                           max_workers=1, report=True)
+
+        pd.testing.assert_frame_equal(features_df, cached_df)
+        self.assertEqual(len(features_df), 2 * len(season_detail_df))
+
+        home_df, away_df = features_df.iloc[0::2], features_df.iloc[1::2]
+        self.assertEqual(home_df.Outcome.tolist(), (-away_df.Outcome).tolist())
+        self.assertEqual(home_df.OpponentLineupRating.tolist(), away_df.LineupRating.tolist())
+        self.assertEqual(home_df.OpponentTablePoints.tolist(), away_df.TablePoints.tolist())
+        self.assertEqual(features_df.TablePoints.iloc[:4].tolist(), [0, 0, 0, 0])
+        self.assertTrue(features_df.LineupRating.notna().all())
+        self.assertRegex(logs.output[0], r'features +cached')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+import unittest
+
+from api_handler.fpl_api import FplClient, FPL_DTYPES, typed_frame
+from benchmarks import synthetic
+from stub_server import StubServer
+
+BOOTSTRAP = synthetic.fpl_bootstrap_static(n_players=40, event=3)
+
+
+def element_summary(element_id):
+    return {
+        'fixtures': [{'id': 100 + element_id, 'event': 4, 'team_h': 1, 'team_a': 2,
+                      'kickoff_time': '2019-08-24T14:00:00Z'}],
+        'history': [{'element': element_id, 'fixture': event, 'opponent_team': 2, 'round': event,
+                     'total_points': element_id % 7, 'minutes': 90, 'value': 55, 'selected': 1000, 'influence': '10.2',
+                     'creativity': '3.0', 'threat': '12.0', 'ict_index': '2.5', 'kickoff_time': '2019-08-10T14:00:00Z'}
+                    for event in (1, 2)],
+        'history_past': [],
+    }
+
+
+class FplRoutes(object):
+    """Serves bootstrap-static, fixtures, element-summary and event live with ETags, tracking concurrency."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.full_responses = 0
+        self._lock = threading.Lock()
+
+    def _serve(self, payload, headers):
+        body = json.dumps(payload).encode('utf-8')
+        etag = f'"{hash(body)}"'
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, b''
+
+        with self._lock:
+            self.full_responses += 1
+        return 200, {'ETag': etag, 'Content-Type': 'application/json'}, body
+
+    def route(self, path, params, headers):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            parts = path.strip('/').split('/')[1:]
+            if parts == ['bootstrap-static']:
+                return self._serve(BOOTSTRAP, headers)
+            if parts == ['fixtures']:
+                return self._serve(BOOTSTRAP['next_event_fixtures'], headers)
+            if parts[0] == 'element-summary':
+                return self._serve(element_summary(int(parts[1])), headers)
+            if parts[0] == 'event' and parts[2] == 'live':
+                return self._serve({'elements': [{'id': e['id'], 'stats': {'minutes': 90, 'total_points': 2,
+                                                                           'influence': '4.2'}, 'explain': []}
+                                                 for e in BOOTSTRAP['elements']]}, headers)
+            return 404, {}, b''
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class TestFplClient(unittest.TestCase):
+
+    def test_bootstrap_static_is_typed(self):
+        with StubServer({'/api/': FplRoutes().route}) as server:
+            tables = FplClient(server.url + '/api/').bootstrap_static()
+
+        self.assertEqual(len(tables['elements']), 40)
+        self.assertEqual(tables['elements'].form.dtype, 'float64')
+        self.assertEqual(tables['elements'].status.dtype, 'category')
+        self.assertEqual(str(tables['events'].deadline_time.dtype), 'datetime64[ns]')
+
+    def test_unchanged_payloads_are_not_downloaded_again(self):
+        routes = FplRoutes()
+        with StubServer({'/api/': routes.route}) as server:
+            client = FplClient(server.url + '/api/')
+            first = client.fixtures()
+            second = client.fixtures()
+
+        self.assertEqual(routes.full_responses, 1)
+        self.assertEqual(client.cache.stats()['revalidations'], 1)
+        self.assertTrue(first.equals(second))
+
+    def test_element_summaries_are_concurrent_and_bounded(self):
+        routes = FplRoutes(delay=0.02)
+        with StubServer({'/api/': routes.route}) as server:
+            summaries = FplClient(server.url + '/api/', max_workers=4).element_summaries()
+
+        self.assertEqual(len(summaries['history']), 80)
+        self.assertEqual(list(summaries['history'].element.unique()), [e['id'] for e in BOOTSTRAP['elements']])
+        self.assertEqual(summaries['history'].influence.dtype, 'float64')
+        self.assertEqual(len(summaries['fixtures']), 40)
+        self.assertTrue(summaries['history_past'].empty)
+        self.assertGreater(routes.max_in_flight, 1)
+        self.assertLessEqual(routes.max_in_flight, 4)
+
+    def test_event_live(self):
+        with StubServer({'/api/': FplRoutes().route}) as server:
+            live_df = FplClient(server.url + '/api/').event_live(3)
+
+        self.assertEqual(list(live_df.id), [e['id'] for e in BOOTSTRAP['elements']])
+        self.assertEqual(live_df.influence.dtype, 'float64')
+
+    def test_missing_integers_are_nullable(self):
+        records = element_summary(1)['history']
+        del records[0]['value']
+        records[1]['selected'] = None
+        history_df = typed_frame(records, FPL_DTYPES['history'])
+
+        self.assertEqual((history_df.value.dtype, history_df.selected.dtype), ('Int64', 'Int64'))
+        self.assertEqual(history_df.value.isna().tolist(), [True, False])
+        self.assertEqual(history_df.minutes.dtype, 'int64')
+
+    def test_missing_endpoint_raises(self):
+        with StubServer({}) as server:
+            with self.assertRaises(ConnectionError):
+                FplClient(server.url + '/api/').event_live(3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+import unittest
+
+from gcp import main
+from gcp.snapshot_archive import ARCHIVE_PREFIX
+
+
+class TestColdStart(unittest.TestCase):
+
+    def test_import_loads_no_heavy_dependencies(self):
+        code = 'import json, sys; import gcp.main; ' \
+               'print(json.dumps([m for m in ("pandas", "requests", "gcloud", "flask") if m in sys.modules]))'
+        output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(json.loads(output), [])
+
+    def test_http_session_is_shared(self):
+        self.assertIs(main._http_session(), main._http_session())
+
+
+class TestWriteTables(unittest.TestCase):
+
+    def test_other_blobs_are_ignored(self):
+        def storage_client():
+            raise AssertionError('storage was used')
+
+        storage_client_, main._storage_client = main._storage_client, storage_client
+        try:
+            for blob_name in ('notes/readme.txt', ARCHIVE_PREFIX + 'HEAD', main.RAW_BLOB_PREFIX + 'notes.txt'):
+                self.assertTrue(main.write_gcp_tables_pubsub({'bucket': main.FPL_BUCKET_NAME, 'name': blob_name},
+                                                             None))
+        finally:
+            main._storage_client = storage_client_
+
+
+if __name__ == '__main__':
+    unittest.main()
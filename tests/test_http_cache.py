@@ -0,0 +1,104 @@
+import json
+import tempfile
+import unittest
+
+from api_handler import football_data
+from api_handler.http_cache import cached_get, DiskResponseCache, MemoryResponseCache
+from api_handler.xml_soccer import XmlSoccerRequest
+from stub_server import StubServer
+
+MATCHES_PAYLOAD = json.dumps({
+    'competition': {'name': 'Premier League'},
+    'matches': [{'id': 1, 'utcDate': '2017-08-11T18:45:00Z', 'matchday': 1}],
+}).encode('utf-8')
+
+FIXTURES_XML = b'''<?xml version="1.0" encoding="utf-8"?>
+<XMLSOCCER.COM>
+  <Match><Id>1</Id><HomeTeam>Arsenal</HomeTeam><AwayTeam>Leicester</AwayTeam></Match>
+  <Match><Id>2</Id><HomeTeam>Watford</HomeTeam><AwayTeam>Liverpool</AwayTeam></Match>
+</XMLSOCCER.COM>'''
+
+
+def etag_route(body: bytes, etag: str = '"v1"'):
+    def route(path, params, headers):
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, b''
+        return 200, {'ETag': etag, 'Content-Type': 'application/json'}, body
+    return route
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def test_hit_miss_and_revalidation(self):
+        cache = DiskResponseCache(self.cache_dir.name)
+
+        with StubServer({'/data': etag_route(b'{"a": 1}')}) as server:
+            first = cached_get(server.url + '/data', {'season': 1}, cache=cache, ttl=None)
+            second = cached_get(server.url + '/data', {'season': 1}, cache=cache, ttl=None)
+            stale = cached_get(server.url + '/data', {'season': 2}, cache=cache, ttl=0)
+            revalidated = cached_get(server.url + '/data', {'season': 2}, cache=cache, ttl=0)
+
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(stale.content, revalidated.content)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2, 'revalidations': 1})
+        self.assertEqual(len(server.requests), 3)
+
+    def test_api_key_excluded_from_key(self):
+        cache = MemoryResponseCache()
+
+        with StubServer({'/data': etag_route(b'{}')}) as server:
+            cached_get(server.url + '/data', {'ApiKey': 'one'}, cache=cache, ttl=None)
+            cached_get(server.url + '/data', {'ApiKey': 'two'}, cache=cache, ttl=None)
+
+        self.assertEqual(len(server.requests), 1)
+
+    def test_lru_eviction_by_size(self):
+        cache = DiskResponseCache(self.cache_dir.name, max_bytes=250)
+
+        with StubServer({'/data': etag_route(b'x' * 100)}) as server:
+            for season in (1, 2, 1, 3):
+                cached_get(server.url + '/data', {'season': season}, cache=cache, ttl=None)
+
+            # season 2 was least recently used, so it made way for season 3
+            reopened = DiskResponseCache(self.cache_dir.name, max_bytes=250)
+            cached_get(server.url + '/data', {'season': 1}, cache=reopened, ttl=None, offline=True)
+            with self.assertRaises(ConnectionError):
+                cached_get(server.url + '/data', {'season': 2}, cache=reopened, ttl=None, offline=True)
+
+        self.assertLessEqual(reopened.size_bytes, 250)
+
+    def test_offline_backfill(self):
+        cache = DiskResponseCache(self.cache_dir.name)
+        original_url = football_data.FOOTBALL_DATA_API_URL
+
+        with StubServer({'/competitions/': etag_route(MATCHES_PAYLOAD)}) as server:
+            football_data.FOOTBALL_DATA_API_URL = server.url + '/'
+            try:
+                football_data.get_season_matches(2021, 2017, 2018, '17-18', cache=cache)
+                season_df = football_data.get_season_matches(2021, 2017, 2018, '17-18', cache=cache, offline=True)
+            finally:
+                football_data.FOOTBALL_DATA_API_URL = original_url
+
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(season_df.competitionName.tolist(), ['Premier League'])
+
+    def test_xml_soccer_through_cache(self):
+        cache = MemoryResponseCache()
+
+        with StubServer({'/FootballData.asmx/': etag_route(FIXTURES_XML)}) as server:
+            xml_request = XmlSoccerRequest(cache=cache)
+            xml_request.api_url = server.url + '/FootballData.asmx/'
+            first = xml_request.get('GetFixturesByLeagueAndSeason', league='1', seasonDateString='1718')
+            xml_request.offline = True
+            second = xml_request.get('GetFixturesByLeagueAndSeason', league='1', seasonDateString='1718')
+
+        self.assertEqual(first, second)
+        self.assertEqual([m['HomeTeam'] for m in first], ['Arsenal', 'Watford'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import json
+import os
+import pstats
+import tempfile
+import tracemalloc
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analytics.pipeline import Pipeline, Stage
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+import instrumentation
+from gcp.snapshot_tables import SnapshotWriter, SqliteTableBackend
+
+
+@instrumentation.timed('test.frame')
+def _frame(n_rows):
+    return pd.DataFrame({'a': np.arange(n_rows)})
+
+
+def _double(df):
+    return df * 2
+
+
+class TestSpans(unittest.TestCase):
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_disabled_records_nothing(self):
+        self.assertIsNone(instrumentation.active_recorder())
+        with instrumentation.span('outer') as s:
+            s.record(rows=1, bytes=2)
+        self.assertEqual(len(_frame(3)), 3)
+
+        recorder = instrumentation.enable()
+        self.assertEqual(list(recorder.spans), [])
+
+    def test_nested_spans(self):
+        with instrumentation.recording() as recorder:
+            with instrumentation.span('outer', season='1819') as outer:
+                with instrumentation.span('inner') as inner:
+                    inner.record(rows=2, bytes=100)
+                    inner.record(rows=3)
+                _frame(7)
+                outer.record(bytes=5)
+            with self.assertRaises(KeyError):
+                with instrumentation.span('failing'):
+                    raise KeyError('x')
+        self.assertIsNone(instrumentation.active_recorder())
+
+        spans = {record['name']: record for record in recorder.spans}
+        self.assertEqual([record['name'] for record in recorder.spans], ['inner', 'test.frame', 'outer', 'failing'])
+        self.assertEqual((spans['inner']['parent'], spans['inner']['depth']), ('outer', 1))
+        self.assertEqual((spans['inner']['rows'], spans['inner']['bytes']), (5, 100))
+        self.assertEqual(spans['test.frame']['rows'], 7)
+        self.assertEqual(spans['outer']['attributes'], {'season': '1819'})
+        self.assertIsNone(spans['outer']['parent'])
+        self.assertGreaterEqual(spans['outer']['seconds'], spans['inner']['seconds'])
+        self.assertEqual(spans['failing']['error'], 'KeyError')
+
+        self.assertEqual(json.loads(recorder.to_json()), list(recorder.spans))
+        self.assertEqual(recorder.summary()['inner'], {'count': 1, 'seconds': spans['inner']['seconds'], 'rows': 5,
+                                                       'bytes': 100, 'peak_memory': None})
+
+    def test_max_spans(self):
+        with instrumentation.recording(max_spans=2) as recorder:
+            for n in range(5):
+                with instrumentation.span('loop', n=n):
+                    pass
+
+        self.assertEqual([record['attributes']['n'] for record in recorder.spans], [3, 4])
+        self.assertEqual(recorder.summary()['loop']['count'], 2)
+
+    @unittest.skipUnless(instrumentation._RESET_PEAK, 'peaks of freed memory need tracemalloc.reset_peak')
+    def test_trace_memory(self):
+        with instrumentation.recording(trace_memory=True) as recorder:
+            with instrumentation.span('outer'):
+                with instrumentation.span('inner'):
+                    data = bytearray(8 * 1024 * 1024)
+                    del data
+                small = bytearray(1024)
+        del small
+
+        spans = {record['name']: record for record in recorder.spans}
+        self.assertGreaterEqual(spans['inner']['peak_memory'], 8 * 1024 * 1024)
+        self.assertGreaterEqual(spans['outer']['peak_memory'], spans['inner']['peak_memory'])
+
+    def test_trace_memory_without_reset_peak(self):
+        reset_peak, instrumentation._RESET_PEAK = instrumentation._RESET_PEAK, False
+        try:
+            with instrumentation.recording(trace_memory=True) as recorder:
+                with instrumentation.span('outer'):
+                    with instrumentation.span('inner'):
+                        kept = bytearray(8 * 1024 * 1024)
+                    del kept
+        finally:
+            instrumentation._RESET_PEAK = reset_peak
+
+        spans = {record['name']: record for record in recorder.spans}
+        self.assertGreaterEqual(spans['inner']['peak_memory'], 8 * 1024 * 1024)
+        self.assertGreaterEqual(spans['outer']['peak_memory'], spans['inner']['peak_memory'])
+
+    def test_trace_memory_in_worker_threads(self):
+        def work():
+            with instrumentation.span('worker'):
+                return len(bytearray(1024))
+
+        with instrumentation.recording(trace_memory=True) as recorder:
+            with instrumentation.span('outer'):
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    list(executor.map(lambda _: work(), range(4)))
+
+        spans = [record for record in recorder.spans if record['name'] == 'worker']
+        self.assertEqual([record['peak_memory'] for record in spans], [None] * 4)
+        self.assertIsNotNone(recorder.summary()['outer']['peak_memory'])
+
+    def test_trace_memory_leaves_callers_tracemalloc_running(self):
+        tracemalloc.start()
+        try:
+            with instrumentation.recording(trace_memory=True):
+                pass
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+        with instrumentation.recording(trace_memory=True):
+            self.assertTrue(tracemalloc.is_tracing())
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_profile_outermost_spans(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with instrumentation.recording(profile_dir=profile_dir) as recorder:
+                with instrumentation.span('outer'):
+                    with instrumentation.span('inner'):
+                        _frame(10)
+
+            profiles = [record['profile'] for record in recorder.spans]
+            self.assertEqual(profiles[:2], [None, None])
+            self.assertEqual(os.path.dirname(profiles[2]), profile_dir)
+            self.assertTrue(any('_frame' in function for _, _, function in pstats.Stats(profiles[2]).stats))
+
+    def test_configure_from_env(self):
+        self.assertIsNone(instrumentation.configure_from_env({}))
+        recorder = instrumentation.configure_from_env({instrumentation.INSTRUMENTATION_ENV: '1'})
+        self.assertIs(instrumentation.active_recorder(), recorder)
+        self.assertTrue(recorder.log)
+        self.assertFalse(recorder.trace_memory)
+        self.assertEqual(recorder.spans.maxlen, instrumentation.ENV_MAX_SPANS)
+
+        recorder = instrumentation.configure_from_env({instrumentation.INSTRUMENTATION_ENV: 'memory'})
+        self.assertTrue(recorder.trace_memory)
+        self.assertIsNone(recorder.profile_dir)
+
+
+class TestPipelineSpans(unittest.TestCase):
+
+    def test_snapshot_writer(self):
+        writer = SnapshotWriter(SqliteTableBackend(get_engine(':memory:')))
+        snapshot_time, snapshot = next(synthetic.fpl_snapshots(1, n_players=50))
+
+        with instrumentation.recording() as recorder:
+            rows_written = writer.write(snapshot, snapshot_time)
+
+        summary = recorder.summary()
+        self.assertEqual(summary['snapshot_tables.write']['rows'], sum(rows_written.values()))
+        self.assertEqual(summary['snapshot_tables.append']['rows'], sum(rows_written.values()))
+        self.assertEqual(summary['snapshot_tables.build']['count'], 4)
+
+    def test_pipeline_stages(self):
+        pipeline = Pipeline([Stage('doubled', _double, inputs=['source'])], cache_dir=None, max_workers=1)
+
+        with instrumentation.recording() as recorder:
+            pipeline.run({'source': pd.DataFrame({'a': range(4)})})
+
+        stage, run = recorder.spans
+        self.assertEqual((stage['name'], stage['parent'], stage['rows']), ('pipeline.stage', 'pipeline.run', 4))
+        self.assertEqual(stage['attributes'], {'stage': 'doubled', 'status': 'computed'})
+        self.assertEqual(run['rows'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
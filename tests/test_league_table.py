@@ -0,0 +1,112 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from api_handler import football_data, xml_soccer
+from api_handler.league_table import build_team_match_table, cumulative_table, LeagueTable, rank_standings, \
+    XML_SOCCER_COLUMNS
+from benchmarks import synthetic
+
+
+class TestLeagueTable(unittest.TestCase):
+
+    def test_team_match_rows(self):
+        table_df = build_team_match_table(['A', 'B', 'C'], ['B', 'C', 'A'], [2.0, 1.0, np.nan], [0.0, 1.0, np.nan],
+                                          columns=XML_SOCCER_COLUMNS, match_columns={'MatchId': ['1', '2', '3']})
+
+        self.assertEqual(table_df.TeamName.tolist(), ['A', 'B', 'B', 'C', 'C', 'A'])
+        self.assertEqual(table_df.MatchOpponent.tolist(), ['B', 'A', 'C', 'B', 'A', 'C'])
+        self.assertEqual(table_df.HomeOrAway.tolist(), ['Home', 'Away'] * 3)
+        self.assertEqual(table_df.MatchId.tolist(), ['1', '1', '2', '2', '3', '3'])
+        self.assertEqual(table_df.Points.tolist(), [3, 0, 1, 1, 0, 0])
+        self.assertEqual(table_df.GamesWon.fillna(0).tolist(), [1, 0, 0, 0, 0, 0])
+        self.assertEqual(table_df.GamesDrawn.fillna(0).tolist(), [0, 0, 1, 1, 0, 0])
+        # unplayed matches fall through to a loss, as the row-wise builder did
+        self.assertEqual(table_df.GamesLost.fillna(0).tolist(), [0, 1, 0, 0, 1, 1])
+
+    def test_xml_soccer_season_table(self):
+        season_df = synthetic.xml_soccer_season(2018, n_teams=6)
+        matches_df, table_df = xml_soccer.process_season_matches(season_df)
+
+        self.assertEqual(len(matches_df), 2 * len(season_df))
+        final_table = table_df.xs(table_df.index.get_level_values('MatchDay').max(), level='MatchDay')
+        self.assertTrue((final_table.GamesPlayed == 10).all())
+        self.assertEqual(final_table.Points.sum(), matches_df.Points.sum())
+        self.assertEqual(final_table.GoalDiff.sum(), 0)
+
+    def test_rank_standings_tie_breaks(self):
+        table_df = pd.DataFrame({
+            'MatchDay': [1, 1, 1, 1, 2, 2, 2, 2],
+            'TeamName': ['D', 'C', 'B', 'A', 'A', 'B', 'C', 'D'],
+            'Points': [3, 3, 3, 0, 4, 4, 4, 6],
+            'GoalDiff': [1, 2, 1, -4, 0, 0, -2, 2],
+            'GoalsFor': [2, 2, 3, 0, 3, 3, 2, 3],
+        }).set_index(['MatchDay', 'TeamName'])
+
+        positions = rank_standings(table_df, 'MatchDay', XML_SOCCER_COLUMNS)
+
+        # points, then goal difference, then goals for, then name
+        self.assertEqual(positions.tolist(), [3, 1, 2, 4, 2, 3, 4, 1])
+
+    def test_xml_soccer_positions_match_standings(self):
+        season_df = synthetic.xml_soccer_season(2018, n_teams=8)
+        matches_df, table_df = xml_soccer.process_season_matches(season_df)
+
+        for matchday in (1, 7, 14):
+            standings_df = LeagueTable.from_matches(matches_df[matches_df.MatchDay <= matchday], XML_SOCCER_COLUMNS,
+                                                    'MatchDay', 'MatchId').standings()
+            matchday_df = table_df.xs(float(matchday), level='MatchDay')
+            self.assertEqual(matchday_df.Position.tolist(), list(range(1, 9)))
+            keys = ['Points', 'GoalDiff', 'GoalsFor']
+            np.testing.assert_array_equal(matchday_df[keys].to_numpy(), standings_df[keys].to_numpy())
+
+    def test_football_data_season_table(self):
+        season_df = synthetic.football_data_season(2018, n_teams=4)
+        expanded_df, table_df, grouped_table_df = football_data.process_season_matches(season_df)
+
+        self.assertEqual(expanded_df.homeTeamName.tolist(), [t['name'] for t in season_df.homeTeam])
+        self.assertEqual(table_df.competition.unique().tolist(), ['Synthetic League'])
+        pd.testing.assert_series_equal(table_df.goalDiff, table_df.goalsFor - table_df.goalsAgainst,
+                                       check_names=False)
+        self.assertTrue((grouped_table_df.xs(6, level='matchDay').played == 6).all())
+
+
+class TestLeagueTableUpdates(unittest.TestCase):
+
+    def setUp(self):
+        self.matches_df, _ = xml_soccer.process_season_matches(synthetic.xml_soccer_season(2018, n_teams=6))
+
+    def assert_matches_full_recompute(self, league_table, matches_df):
+        expected_df = cumulative_table(matches_df, 'MatchDay', 'TeamName',
+                                       columns=XML_SOCCER_COLUMNS)[league_table.stat_cols]
+        pd.testing.assert_frame_equal(league_table.to_frame(), expected_df, check_index_type=False)
+
+    def test_incremental_matches_full_recompute(self):
+        first_half = self.matches_df[self.matches_df.MatchDay <= 5]
+        league_table = LeagueTable.from_matches(first_half, XML_SOCCER_COLUMNS, 'MatchDay', 'MatchId')
+        self.assert_matches_full_recompute(league_table, first_half)
+
+        for matchday in range(6, 11):
+            league_table.update(self.matches_df[self.matches_df.MatchDay == matchday])
+        self.assert_matches_full_recompute(league_table, self.matches_df)
+
+    def test_score_correction_and_postponement(self):
+        league_table = LeagueTable.from_matches(self.matches_df, XML_SOCCER_COLUMNS, 'MatchDay', 'MatchId')
+
+        corrected_match = self.matches_df[self.matches_df.MatchDay == 2].MatchId.iloc[0]
+        postponed_match = self.matches_df[self.matches_df.MatchDay == 3].MatchId.iloc[0]
+
+        season_df = synthetic.xml_soccer_season(2018, n_teams=6)
+        season_df.loc[season_df.Id == corrected_match, ['HomeGoals', 'AwayGoals']] = ['7', '0']
+        corrected_df, _ = xml_soccer.process_season_matches(season_df)
+
+        league_table.update(corrected_df[corrected_df.MatchId == corrected_match])
+        league_table.remove([postponed_match])
+
+        self.assert_matches_full_recompute(league_table, corrected_df[corrected_df.MatchId != postponed_match])
+        self.assertEqual(len(league_table.standings()), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
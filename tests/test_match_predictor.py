@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from analytics.fpl_match_predictor import DixonColesModel
+from api_handler import xml_soccer
+from benchmarks import synthetic
+
+
+class TestDixonColesModel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.season_detail_df = synthetic.xml_soccer_seasons(8, n_teams=10, team_strength=0.4)
+        cls.matches_df, _ = xml_soccer.process_season_matches(cls.season_detail_df)
+        cls.model = DixonColesModel().fit(cls.matches_df)
+
+    def test_recovers_team_strengths(self):
+        attack, defence = synthetic.team_strengths(10, spread=0.4)
+
+        self.assertGreater(np.corrcoef(attack, self.model.attack)[0, 1], 0.95)
+        self.assertGreater(np.corrcoef(defence, self.model.defence)[0, 1], 0.95)
+        self.assertAlmostEqual(self.model.home_advantage, np.log(1.5 / 1.1), delta=0.1)
+        self.assertLess(abs(self.model.rho), 0.3)
+
+    def test_batched_predictions_match_one_at_a_time(self):
+        fixtures_df = self.season_detail_df.iloc[:90]
+        batch_df = self.model.predict(fixtures_df.HomeTeam, fixtures_df.AwayTeam, batch_size=40)
+
+        np.testing.assert_allclose(batch_df[['HomeWin', 'Draw', 'AwayWin']].sum(axis=1), 1)
+        for i in (0, 45, 89):
+            single_df = self.model.predict([fixtures_df.HomeTeam.iloc[i]], [fixtures_df.AwayTeam.iloc[i]])
+            np.testing.assert_allclose(single_df.iloc[0, 2:].to_numpy(dtype=float),
+                                       batch_df.iloc[i, 2:].to_numpy(dtype=float))
+
+    def test_stronger_team_is_favoured(self):
+        strongest = (self.model.attack + self.model.defence).idxmax()
+        weakest = (self.model.attack + self.model.defence).idxmin()
+        predictions_df = self.model.predict([strongest, weakest, 'Promoted FC'], [weakest, strongest, 'Promoted FC'])
+
+        self.assertGreater(predictions_df.HomeWin[0], 0.6)
+        self.assertGreater(predictions_df.AwayWin[1], predictions_df.HomeWin[1])
+        # unseen teams are average, so only home advantage separates them
+        self.assertGreater(predictions_df.HomeWin[2], predictions_df.AwayWin[2])
+
+    def test_unplayed_rows_are_ignored(self):
+        matches_df = self.matches_df.copy()
+        matches_df.loc[matches_df.index[-20:], 'GoalsFor'] = np.nan
+        model = DixonColesModel().fit(matches_df)
+
+        self.assertEqual(len(model.attack), 10)
+        self.assertFalse(np.isnan(model.attack).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
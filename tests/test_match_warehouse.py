@@ -0,0 +1,83 @@
+import datetime as dt
+import unittest
+
+import pandas as pd
+
+from analytics import features
+from api_handler import xml_soccer
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+from fpl_db.match_warehouse import MatchWarehouse
+
+
+class TestMatchWarehouse(unittest.TestCase):
+
+    def setUp(self):
+        self.warehouse = MatchWarehouse(get_engine(':memory:'))
+        self.seasons_df = synthetic.xml_soccer_seasons(2, n_teams=6, lineups=True)
+        self.warehouse.upsert_fixtures(self.seasons_df)
+
+    def test_fixtures_round_trip(self):
+        season_df = self.warehouse.matches(competition='Synthetic League', season='7172', with_lineups=True)
+        expected_df = xml_soccer.process_season_matches(self.seasons_df[self.seasons_df.CompetitionSeason == '7172'])
+
+        self.assertEqual(len(season_df), 30)
+        matches_df, table_df = xml_soccer.process_season_matches(season_df)
+        pd.testing.assert_frame_equal(table_df, expected_df[1])
+        pd.testing.assert_series_equal(matches_df.GoalsFor, expected_df[0].GoalsFor)
+
+        expected_index = features.build_match_side_index(self.seasons_df)
+        pd.testing.assert_frame_equal(features.build_match_side_index(season_df).sort_index(),
+                                      expected_index.loc[season_df.Id.tolist()].sort_index())
+
+    def test_upsert_updates_in_place(self):
+        corrected_df = self.seasons_df.iloc[:3].copy()
+        corrected_df[['HomeGoals', 'AwayGoals']] = ['9', '0']
+        corrected_df['HomeLineupGoalkeeper'] = ' Stand In;'
+        self.warehouse.upsert_fixtures(corrected_df)
+
+        all_df = self.warehouse.matches()
+        self.assertEqual(len(all_df), len(self.seasons_df))
+        self.assertEqual(all_df.set_index('Id').loc[corrected_df.Id.astype(int), 'HomeGoals'].tolist(), [9, 9, 9])
+
+        lineups_df = self.warehouse.lineups(corrected_df.Id.astype(int))
+        self.assertEqual(len(lineups_df), 3 * 22)
+        goalkeepers = lineups_df[(lineups_df.home_or_away == 'Home') & (lineups_df.position == 'Goalkeeper')]
+        self.assertEqual(goalkeepers.player_name.unique().tolist(), ['Stand In'])
+
+    def test_seasons_concatenated_without_ignore_index(self):
+        warehouse = MatchWarehouse(get_engine(':memory:'))
+        seasons_df = pd.concat([synthetic.xml_soccer_season(1970, n_teams=6, lineups=True),
+                                synthetic.xml_soccer_season(1971, n_teams=6, lineups=True)])
+        self.assertFalse(seasons_df.index.is_unique)
+
+        self.assertEqual(warehouse.upsert_fixtures(seasons_df), 60)
+        lineups_df = warehouse.lineups()
+        self.assertEqual(len(lineups_df), 60 * 22)
+        home_goalkeepers = lineups_df[(lineups_df.home_or_away == 'Home') & (lineups_df.position == 'Goalkeeper')]
+        expected = seasons_df.set_index(seasons_df.Id.astype(int)).HomeLineupGoalkeeper.str.strip(' ;')
+        self.assertEqual(home_goalkeepers.set_index('match_id').player_name.sort_index().tolist(),
+                         expected.sort_index().tolist())
+
+    def test_team_and_date_filters(self):
+        team_df = self.warehouse.matches(team='Team 03', start=dt.datetime(1971, 1, 1))
+        expected = self.seasons_df[((self.seasons_df.HomeTeam == 'Team 03') | (self.seasons_df.AwayTeam == 'Team 03'))
+                                   & (self.seasons_df.MatchDate >= dt.datetime(1971, 1, 1))]
+
+        self.assertEqual(sorted(team_df.Id), sorted(expected.Id.astype(int)))
+        self.assertTrue(team_df.MatchDate.is_monotonic_increasing)
+
+    def test_standings(self):
+        season_df = self.seasons_df[self.seasons_df.CompetitionSeason == '7071']
+        _, table_df = xml_soccer.process_season_matches(season_df)
+        self.assertEqual(self.warehouse.upsert_standings(table_df, 'Synthetic League', '7071'), len(table_df))
+        self.warehouse.upsert_standings(table_df, 'Synthetic League', '7071')
+
+        standings_df = self.warehouse.standings('Synthetic League', '7071')
+        pd.testing.assert_frame_equal(standings_df, table_df[standings_df.columns], check_index_type=False,
+                                      check_dtype=False, check_categorical=False)
+        self.assertEqual(len(self.warehouse.standings('Synthetic League', '7071', matchday=10)), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
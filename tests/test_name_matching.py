@@ -0,0 +1,41 @@
+import unittest
+
+import pandas as pd
+
+from analytics import features
+from analytics.name_matching import normalise_name, PlayerNameResolver
+
+PLAYER_STATS = pd.DataFrame({
+    'Name': ['M. Salah', 'S. Mané', 'R. Firmino', 'H. Kane', 'K. De Bruyne', 'Sergio Agüero'],
+    'Club': ['Liverpool', 'Liverpool', 'Liverpool', 'Tottenham Hotspur', 'Manchester City', 'Manchester City'],
+    'Overall': [88, 86, 85, 89, 91, 89],
+}, index=[101, 102, 103, 104, 105, 106])
+
+
+class TestPlayerNameResolver(unittest.TestCase):
+
+    def test_normalise(self):
+        self.assertEqual(normalise_name('  Sergio  Agüero '), 'sergio aguero')
+        self.assertEqual(normalise_name("N'Golo Kanté"), 'n golo kante')
+
+    def test_resolve(self):
+        resolver = PlayerNameResolver(PLAYER_STATS, n_candidates=3)
+
+        self.assertEqual(resolver.resolve('Mohamed Salah').index, 101)
+        self.assertEqual(resolver.resolve('Sadio Mane').index, 102)
+        self.assertEqual(resolver.resolve('Sergio Aguero').index, 106)
+
+        match = resolver.resolve('Kevin De Bruyne')
+        self.assertEqual(match.index, 105)
+        self.assertGreater(match.margin, 0)
+        self.assertIs(resolver.resolve('Kevin De Bruyne'), match)
+
+    def test_lineup_ratings(self):
+        lineup_s = pd.Series([['Mohamed Salah', 'Roberto Firmino'], ['Harry Kane']], index=[7, 8])
+        ratings_s = features.get_lineup_stats_vector(lineup_s, PLAYER_STATS)
+
+        self.assertEqual(ratings_s.to_dict(), {7: [88, 85], 8: [89]})
+
+
+if __name__ == '__main__':
+    unittest.main()
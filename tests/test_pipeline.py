@@ -0,0 +1,122 @@
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+from analytics import features
+from analytics.pipeline import Pipeline, Stage, code_modules
+
+
+def doubled(df):
+    return df * 2
+
+
+def added(left_df, right_df, offset=0):
+    return left_df + right_df + offset
+
+
+def squared(df):
+    return df ** 2
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sources = {'a': pd.DataFrame({'x': [1, 2, 3]}), 'b': pd.DataFrame({'x': [10, 20, 30]})}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def pipeline(self, offset=0, squared_version='1', max_workers=1):
+        return Pipeline([
+            Stage('doubled', doubled, inputs=['a']),
+            Stage('squared', squared, inputs=['b'], version=squared_version),
+            Stage('added', added, inputs=['doubled', 'squared'], params={'offset': offset}),
+        ], cache_dir=self.tmp_dir.name, max_workers=max_workers)
+
+    def statuses(self, pipeline):
+        return {report.name: report.status for report in pipeline.report}
+
+    def test_outputs_and_second_run_from_cache(self):
+        pipeline = self.pipeline()
+        outputs = pipeline.run(self.sources)
+        self.assertEqual(outputs['added'].x.tolist(), [102, 404, 906])
+        self.assertEqual(set(self.statuses(pipeline).values()), {'computed'})
+
+        outputs = pipeline.run(self.sources, targets=['added'])
+        self.assertEqual(outputs['added'].x.tolist(), [102, 404, 906])
+        self.assertEqual(self.statuses(pipeline), {'doubled': 'skipped', 'squared': 'skipped', 'added': 'cached'})
+
+    def test_only_downstream_of_a_change_recomputes(self):
+        self.pipeline().run(self.sources)
+
+        pipeline = self.pipeline()
+        pipeline.run(dict(self.sources, a=pd.DataFrame({'x': [1, 2, 4]})))
+        self.assertEqual(self.statuses(pipeline), {'doubled': 'computed', 'squared': 'cached', 'added': 'computed'})
+
+        pipeline = self.pipeline(offset=1)
+        pipeline.run(self.sources, targets=['added'])
+        self.assertEqual(self.statuses(pipeline), {'doubled': 'cached', 'squared': 'cached', 'added': 'computed'})
+
+        pipeline = self.pipeline(squared_version='2')
+        pipeline.run(self.sources, targets=['added'])
+        self.assertEqual(self.statuses(pipeline), {'doubled': 'cached', 'squared': 'computed', 'added': 'computed'})
+
+    def test_code_modules(self):
+        modules = code_modules(features._matches_stage)
+        self.assertTrue({'analytics.features', 'api_handler.xml_soccer', 'api_handler.league_table'} <= set(modules))
+        self.assertNotIn('pandas', modules)
+        self.assertEqual(code_modules(len), [])
+
+    def test_editing_a_module_a_stage_calls_recomputes(self):
+        def write_module(name, source):
+            with open(os.path.join(self.tmp_dir.name, f'{name}.py'), 'w') as f:
+                f.write(source)
+
+        write_module('pipeline_test_offsets', 'def offset():\n    return 1\n')
+        write_module('pipeline_test_stages', 'from pipeline_test_offsets import offset\n\n\n'
+                                             'def shifted(df):\n    return df + offset()\n')
+        sys.path.insert(0, self.tmp_dir.name)
+        try:
+            import pipeline_test_stages
+
+            def run():
+                pipeline = Pipeline([Stage('shifted', pipeline_test_stages.shifted, inputs=['a'])],
+                                    cache_dir=os.path.join(self.tmp_dir.name, 'cache'), max_workers=1)
+                return pipeline.run(self.sources)['shifted'].x.tolist(), self.statuses(pipeline)['shifted']
+
+            self.assertEqual(run(), ([2, 3, 4], 'computed'))
+            self.assertEqual(run(), ([2, 3, 4], 'cached'))
+
+            write_module('pipeline_test_offsets', 'def offset():\n    return 10\n')
+            importlib.reload(sys.modules['pipeline_test_offsets'])
+            importlib.reload(pipeline_test_stages)
+            self.assertEqual(run(), ([11, 12, 13], 'computed'))
+        finally:
+            sys.path.remove(self.tmp_dir.name)
+            for name in ('pipeline_test_offsets', 'pipeline_test_stages'):
+                sys.modules.pop(name, None)
+
+    def test_independent_stages_in_processes(self):
+        serial = self.pipeline().run(self.sources)
+        parallel_pipeline = self.pipeline(max_workers=2)
+        parallel_pipeline.cache_dir = None
+        parallel = parallel_pipeline.run(self.sources)
+
+        for name in serial:
+            pd.testing.assert_frame_equal(serial[name], parallel[name])
+
+    def test_bad_graphs(self):
+        with self.assertRaises(KeyError):
+            Pipeline([Stage('doubled', doubled, inputs=['missing'])], cache_dir=None).run(self.sources)
+        with self.assertRaises(ValueError):
+            Pipeline([Stage('p', doubled, inputs=['q']), Stage('q', doubled, inputs=['p'])],
+                     cache_dir=None).run(self.sources)
+
+
+if __name__ == '__main__':
+    unittest.main()
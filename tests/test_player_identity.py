@@ -0,0 +1,60 @@
+import unittest
+
+import pandas as pd
+
+from analytics import features
+from analytics.name_matching import PlayerNameResolver
+from fpl_db.db import get_engine
+from fpl_db.player_identity import PlayerIdentityStore, source_fingerprint
+
+PLAYER_STATS = pd.DataFrame({
+    'Name': ['M. Salah', 'S. Mané', 'H. Kane', 'H. Son'],
+    'Club': ['Liverpool', 'Liverpool', 'Tottenham Hotspur', 'Tottenham Hotspur'],
+    'Overall': [88, 86, 89, 87],
+})
+
+
+class CountingResolver(PlayerNameResolver):
+    def shortlist(self, name):
+        self.n_fuzzy_matched = getattr(self, 'n_fuzzy_matched', 0) + 1
+        return super().shortlist(name)
+
+
+class TestPlayerIdentityStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = PlayerIdentityStore(get_engine(':memory:'))
+        self.lineup_s = pd.Series([['Mohamed Salah', 'Harry Kane'], ['Sadio Mane']])
+
+    def test_second_run_skips_fuzzy_matching(self):
+        first = CountingResolver(PLAYER_STATS, store=self.store)
+        first_ratings = features.get_lineup_stats_vector(self.lineup_s, PLAYER_STATS, resolver=first)
+
+        second = CountingResolver(PLAYER_STATS, store=self.store)
+        second_ratings = features.get_lineup_stats_vector(self.lineup_s, PLAYER_STATS, resolver=second)
+
+        self.assertEqual(first.n_fuzzy_matched, 3)
+        self.assertFalse(hasattr(second, 'n_fuzzy_matched'))
+        pd.testing.assert_series_equal(first_ratings, second_ratings)
+
+    def test_source_change_invalidates_all_but_pins(self):
+        features.get_lineup_stats_vector(self.lineup_s, PLAYER_STATS, store=self.store)
+        self.store.pin('Heung-Min Son', 'H. Son Tottenham Hotspur')
+
+        new_source = PLAYER_STATS.assign(Club='Free Agent')
+        new_resolver = PlayerNameResolver(new_source, store=self.store)
+
+        self.assertEqual(set(self.store.load(source_fingerprint(new_source))), {'Heung-Min Son'})
+        # the pinned row no longer exists in the new source, so it falls back to fuzzy matching
+        self.assertEqual(new_resolver.resolve('Heung-Min Son').index, 3)
+
+    def test_pin_overrides_fuzzy_match(self):
+        self.store.pin('Harry Kane', 'M. Salah Liverpool')
+        ratings_s = features.get_lineup_stats_vector(self.lineup_s, PLAYER_STATS, store=self.store)
+
+        self.assertEqual(ratings_s.iloc[0], [88, 88])
+        self.assertTrue(self.store.load(source_fingerprint(PLAYER_STATS))['Harry Kane'].pinned)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import datetime as dt
+import unittest
+
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+from fpl_db.player_timeseries import PlayerTimeSeriesStore
+
+
+class TestPlayerTimeSeriesStore(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshots = list(synthetic.fpl_snapshots(30, n_players=50, change_rate=0.2,
+                                                      interval=dt.timedelta(hours=8)))
+        self.store = PlayerTimeSeriesStore(get_engine(':memory:'))
+        self.n_written = self.store.append_snapshots(self.snapshots, batch_size=7)
+
+    def _element(self, snapshot, element_id):
+        return next(element for element in snapshot['elements'] if element['id'] == element_id)
+
+    def test_only_changes_are_stored(self):
+        n_changed = sum(old != new for (_, before), (_, after) in zip(self.snapshots, self.snapshots[1:])
+                        for old, new in zip(before['elements'], after['elements']))
+        self.assertEqual(self.n_written, 50 + n_changed)
+
+    def test_as_of_matches_every_snapshot(self):
+        for snapshot_time, snapshot in self.snapshots[::4]:
+            as_of_df = self.store.as_of(snapshot_time + dt.timedelta(minutes=5))
+            self.assertEqual(as_of_df.now_cost.to_dict(), {e['id']: e['now_cost'] for e in snapshot['elements']})
+            self.assertEqual(as_of_df.selected_by_percent.to_dict(),
+                             {e['id']: float(e['selected_by_percent']) for e in snapshot['elements']})
+
+        team_df = self.store.as_of(self.snapshots[10][0], team=3)
+        self.assertEqual(set(team_df.index), {e['id'] for e in self.snapshots[10][1]['elements'] if e['team'] == 3})
+
+    def test_history_range(self):
+        start, end = self.snapshots[5][0], self.snapshots[20][0]
+        history_df = self.store.history(element_ids=[1, 2], start=start, end=end)
+
+        self.assertEqual(set(history_df.index.get_level_values('element_id')), {1, 2})
+        for element_id in (1, 2):
+            costs = history_df.loc[element_id].now_cost
+            self.assertLessEqual(costs.index[0], start)
+            self.assertLessEqual(costs.index[-1], end)
+            expected = [self._element(snapshot, element_id)['now_cost'] for _, snapshot in self.snapshots[5:21]]
+            self.assertEqual(costs.reindex([t for t, _ in self.snapshots[5:21]], method='ffill').tolist(), expected)
+
+        event_df = self.store.history(event=2)
+        self.assertTrue((event_df.event == 2).all())
+
+    def test_out_of_order_snapshot_is_rejected(self):
+        snapshot_time, snapshot = self.snapshots[3]
+        with self.assertRaises(ValueError):
+            self.store.append_snapshot(snapshot, snapshot_time)
+
+        reopened = PlayerTimeSeriesStore(self.store.engine)
+        self.assertEqual(reopened.append_snapshot(self.snapshots[-1][1], self.snapshots[-1][0] + dt.timedelta(1)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
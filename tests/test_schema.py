@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from api_handler import xml_soccer
+from api_handler.schema import apply_dtypes, memory_report
+from benchmarks import synthetic
+
+
+class TestApplyDtypes(unittest.TestCase):
+
+    def test_conversions(self):
+        raw_df = pd.DataFrame({
+            'Team': ['A', 'B', 'A'],
+            'Goals': ['1', '', '3'],
+            'Round': ['1', '2', '38'],
+            'Date': ['2019-08-10T12:30:00+01:00', '2019-08-11T15:00:00+01:00', None],
+            'Other': ['x', 'y', 'z'],
+        })
+
+        typed_df = apply_dtypes(raw_df, {'Team': 'category', 'Goals': 'int8', 'Round': 'int8',
+                                         'Date': 'datetime64[ns]', 'Missing': 'int8'})
+
+        self.assertIsInstance(typed_df.Team.dtype, pd.CategoricalDtype)
+        self.assertEqual(typed_df.Goals.dtype, 'Int8')  # gaps need the nullable integer
+        self.assertEqual(typed_df.Goals.isna().tolist(), [False, True, False])
+        self.assertEqual(typed_df.Round.dtype, np.int8)
+        self.assertEqual(typed_df.Date.iloc[0], pd.Timestamp('2019-08-10 11:30'))  # converted to UTC
+        self.assertTrue(pd.isna(typed_df.Date.iloc[2]))
+        self.assertEqual(typed_df.Other.tolist(), ['x', 'y', 'z'])
+        self.assertIs(apply_dtypes(typed_df, {'Round': 'int8', 'Goals': 'int8'}), typed_df)
+
+    def test_season_tables_are_compact(self):
+        season_df = synthetic.xml_soccer_season(2018, n_teams=6, lineups=True)
+        season_df.loc[season_df.index[-3:], ['HomeGoals', 'AwayGoals']] = None  # unplayed
+        matches_df, table_df = xml_soccer.process_season_matches(season_df)
+
+        self.assertIsInstance(matches_df.TeamName.dtype, pd.CategoricalDtype)
+        self.assertIsInstance(matches_df.CompetitionSeason.dtype, pd.CategoricalDtype)
+        self.assertEqual(matches_df.GoalsFor.dtype, 'Int8')
+        self.assertEqual(matches_df.Points.dtype, np.int8)
+        self.assertEqual(matches_df.MatchDay.dtype, np.int8)
+        self.assertEqual(table_df.Points.dtype, np.int16)
+        self.assertEqual(table_df.GoalsFor.dtype, np.int16)
+        # unplayed matches count as played and lost, but score nothing, as before
+        final_df = table_df.xs(10, level='MatchDay')
+        self.assertEqual(final_df.GoalDiff.sum(), 0)
+
+        report_df = memory_report({'matches': matches_df, 'table': table_df})
+        self.assertEqual(report_df.loc['total', 'rows'], len(matches_df) + len(table_df))
+        self.assertGreater(report_df.loc['matches', 'MB'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
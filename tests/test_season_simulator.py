@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from analytics.season_simulator import simulate_season
+from api_handler import xml_soccer
+from api_handler.league_table import LeagueTable, XML_SOCCER_COLUMNS
+from benchmarks import synthetic
+
+
+def _standings(rows):
+    return pd.DataFrame(rows, columns=['TeamName', 'Points', 'GoalDiff', 'GoalsFor']).set_index('TeamName')
+
+
+def _fixtures(rows):
+    return pd.DataFrame(rows, columns=['HomeTeam', 'AwayTeam', 'HomeWin', 'Draw', 'AwayWin'])
+
+
+class TestSimulateSeason(unittest.TestCase):
+
+    def test_mid_season_probabilities(self):
+        season_df = synthetic.xml_soccer_season(2018, n_teams=8)
+        matches_df, _ = xml_soccer.process_season_matches(season_df)
+        played = matches_df.MatchDay <= 10
+        standings_df = LeagueTable.from_matches(matches_df[played], XML_SOCCER_COLUMNS, 'MatchDay',
+                                                'MatchId').standings()
+        remaining_df = season_df[season_df.Round.astype(float) > 10]
+        fixtures_df = remaining_df[['HomeTeam', 'AwayTeam']].assign(HomeWin=0.45, Draw=0.27, AwayWin=0.28)
+
+        positions_df = simulate_season(standings_df, fixtures_df, n_sims=12000, chunk_size=5000, max_workers=1)
+
+        self.assertEqual(positions_df.shape, (8, 8))
+        np.testing.assert_allclose(positions_df.sum(axis=0), 1)
+        np.testing.assert_allclose(positions_df.sum(axis=1), 1)
+        expected_position = positions_df.to_numpy() @ np.arange(1, 9)
+        self.assertTrue((np.diff(expected_position) >= 0).all())
+
+    def test_results_only_depend_on_seed(self):
+        standings_df = _standings([('A', 10, 3, 8), ('B', 9, 1, 6), ('C', 9, -4, 3)])
+        fixtures_df = _fixtures([('A', 'B', 0.4, 0.3, 0.3), ('B', 'C', 0.5, 0.3, 0.2), ('C', 'A', 0.3, 0.3, 0.4)])
+
+        in_process_df = simulate_season(standings_df, fixtures_df, n_sims=9000, chunk_size=2000, max_workers=1)
+        pool_df = simulate_season(standings_df, fixtures_df, n_sims=9000, chunk_size=2000, max_workers=2)
+        other_seed_df = simulate_season(standings_df, fixtures_df, n_sims=9000, chunk_size=2000, seed=1,
+                                        max_workers=1)
+
+        pd.testing.assert_frame_equal(in_process_df, pool_df)
+        self.assertFalse(in_process_df.equals(other_seed_df))
+
+    def test_certain_outcomes_and_tie_breaks(self):
+        standings_df = _standings([('A', 6, 2, 5), ('B', 6, 4, 7), ('C', 4, 0, 4), ('D', 4, 0, 4)])
+        fixtures_df = _fixtures([('C', 'A', 0, 0, 1), ('D', 'B', 0, 0, 1), ('E', 'C', 1, 0, 0)])
+
+        positions_df = simulate_season(standings_df, fixtures_df, n_sims=4000, max_workers=1)
+
+        # B and A level on points, B ahead on goal difference; C and D level on everything, split at random
+        self.assertEqual(positions_df.index.tolist()[:2], ['B', 'A'])
+        self.assertEqual(positions_df.loc['B', 1], 1)
+        self.assertEqual(positions_df.loc['A', 2], 1)
+        self.assertAlmostEqual(positions_df.loc['C', 3], 0.5, delta=0.05)
+        self.assertAlmostEqual(positions_df.loc['D', 4], 0.5, delta=0.05)
+        self.assertEqual(positions_df.loc['E', 5], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import datetime as dt
+import gzip
+import json
+import tempfile
+import unittest
+
+from benchmarks import synthetic
+from gcp.snapshot_archive import SnapshotArchive, apply_delta, diff_snapshots
+from gcp.storage_backends import LocalFileBackend, PreconditionFailed
+
+
+class RecordingBackend(LocalFileBackend):
+    """LocalFileBackend noting the calls made to it, and running before_write before the next conditional write
+    of a blob ending with its suffix."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.calls = []
+        self.before_write = None
+
+    def read_generation(self, name):
+        self.calls.append(('read', name))
+        return super().read_generation(name)
+
+    def list(self, prefix=''):
+        self.calls.append(('list', prefix))
+        return super().list(prefix)
+
+    def write(self, name, data, if_generation_match=None):
+        if self.before_write is not None and if_generation_match is not None and name.endswith(self.before_write[0]):
+            callback, self.before_write = self.before_write[1], None
+            callback()
+        super().write(name, data, if_generation_match)
+
+
+class TestSnapshotArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.backend = LocalFileBackend(self.tmp_dir.name)
+        self.archive = SnapshotArchive(self.backend, base_every=10)
+        self.snapshots = list(synthetic.fpl_snapshots(25, n_players=200))
+        for snapshot_time, snapshot in self.snapshots:
+            self.archive.write(snapshot, snapshot_time)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_point_in_time_reads(self):
+        fresh_archive = SnapshotArchive(self.backend, base_every=10)  # nothing cached from the writes
+        for snapshot_time, snapshot in self.snapshots[::-3]:
+            self.assertEqual(fresh_archive.read(snapshot_time), snapshot)
+
+        between_ticks = self.snapshots[4][0] + dt.timedelta(minutes=30)
+        self.assertEqual(fresh_archive.read(between_ticks), self.snapshots[4][1])
+        self.assertEqual(fresh_archive.read(), self.snapshots[-1][1])
+        with self.assertRaises(KeyError):
+            fresh_archive.read(self.snapshots[0][0] - dt.timedelta(hours=1))
+
+    def test_replay(self):
+        self.assertEqual(list(self.archive.replay()), self.snapshots)
+        self.assertEqual(list(self.archive.replay(self.snapshots[12][0], self.snapshots[20][0])),
+                         self.snapshots[12:21])
+
+    def test_bases_and_storage(self):
+        kinds = [entry.kind for entry in self.archive.entries()]
+        self.assertEqual([i for i, kind in enumerate(kinds) if kind == 'base'], [0, 10, 20])
+
+        raw_size = sum(len(json.dumps(snapshot)) for _, snapshot in self.snapshots)
+        self.assertLess(self.backend.size(), raw_size / 20)
+
+        with self.assertRaises(ValueError):
+            self.archive.write(self.snapshots[-1][1], self.snapshots[-1][0])
+
+    def test_write_reads_only_the_head(self):
+        backend = RecordingBackend(self.tmp_dir.name)
+        snapshot_time, snapshot = next(synthetic.fpl_snapshots(1, n_players=200, start=self.snapshots[-1][0]
+                                                               + dt.timedelta(hours=1)))
+        SnapshotArchive(backend, base_every=10).write(snapshot, snapshot_time)
+
+        self.assertEqual(backend.calls, [('read', 'fpl_archive/HEAD')])
+        self.assertEqual(SnapshotArchive(self.backend).read(snapshot_time), snapshot)
+
+    def test_overlapping_writers(self):
+        backend = RecordingBackend(self.tmp_dir.name)
+        (first_time, first), (second_time, second), (third_time, third) = synthetic.fpl_snapshots(
+            3, n_players=200, start=self.snapshots[-1][0] + dt.timedelta(hours=1))
+
+        def write_first():
+            SnapshotArchive(self.backend, base_every=10).write(first, first_time)
+
+        # first is archived between the writer of second reading the head and replacing it, so that writer retries
+        backend.before_write = ('HEAD', write_first)
+        SnapshotArchive(backend, base_every=10).write(second, second_time)
+
+        self.assertEqual(len(self.archive.entries()), 27)
+        self.assertEqual(list(self.archive.replay())[-3:], [self.snapshots[-1], (first_time, first),
+                                                             (second_time, second)])
+
+        backend.before_write = ('HEAD', lambda: SnapshotArchive(self.backend).write(third, third_time))
+        with self.assertRaises(PreconditionFailed):
+            SnapshotArchive(backend, base_every=10).write(third, third_time + dt.timedelta(minutes=1), attempts=1)
+        self.assertEqual(self.archive.entries()[-1].snapshot_time, third_time)
+        self.assertEqual(SnapshotArchive(self.backend).read(), third)
+
+    def test_deltas_a_lost_write_left_are_skipped(self):
+        orphan_time = self.snapshots[-2][0] + dt.timedelta(minutes=30)
+        orphan = dict(diff_snapshots(self.snapshots[-3][1], self.snapshots[0][1]), previous='elsewhere')
+        self.backend.write(self.archive._name(orphan_time, 'delta'), gzip.compress(json.dumps(orphan).encode()))
+
+        self.assertEqual(SnapshotArchive(self.backend).read(self.snapshots[-1][0]), self.snapshots[-1][1])
+        self.assertEqual(list(self.archive.replay()), self.snapshots)
+
+    def test_entity_deltas(self):
+        previous = self.snapshots[0][1]
+        current = json.loads(json.dumps(previous))
+        current['elements'][3]['now_cost'] += 1
+        del current['elements'][5]
+        current['elements'].insert(0, dict(current['elements'][0], id=9999))
+        current['total-players'] += 1
+
+        delta = diff_snapshots(previous, current)
+
+        upserts = delta['entities']['elements']['upserts']
+        self.assertEqual([element['id'] for element in upserts], [9999, current['elements'][4]['id']])
+        self.assertEqual(delta['entities']['elements']['deletes'], [previous['elements'][5]['id']])
+        self.assertEqual(set(delta['entities']), {'elements'})
+        self.assertEqual(delta['changed'], {'total-players': current['total-players']})
+        self.assertEqual(apply_delta(previous, delta), current)
+
+
+if __name__ == '__main__':
+    unittest.main()
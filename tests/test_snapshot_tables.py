@@ -0,0 +1,78 @@
+import unittest
+
+import pandas as pd
+
+from benchmarks import synthetic
+from fpl_db.db import get_engine
+from gcp.snapshot_tables import SnapshotWriter, SqliteTableBackend
+
+
+class TestSnapshotWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = get_engine(':memory:')
+        self.writer = SnapshotWriter(SqliteTableBackend(self.engine))
+        self.snapshots = list(synthetic.fpl_snapshots(3, n_players=100, change_rate=0.2))
+
+    def test_unchanged_snapshot_writes_nothing(self):
+        snapshot_time, snapshot = self.snapshots[0]
+        first = self.writer.write(snapshot, snapshot_time)
+        second = self.writer.write(snapshot, snapshot_time)
+
+        self.assertEqual(first, {'teams': 20, 'players': 100, 'events': 38, 'fixtures': 10})
+        self.assertEqual(set(second.values()), {0})
+
+    def test_only_changed_players_are_appended(self):
+        for snapshot_time, snapshot in self.snapshots:
+            self.writer.write(snapshot, snapshot_time)
+
+        players_df = pd.read_sql('SELECT * FROM players', self.engine)
+        n_changed = sum(old != new for (_, before), (_, after) in zip(self.snapshots, self.snapshots[1:])
+                        for old, new in zip(before['elements'], after['elements']))
+
+        self.assertEqual(len(players_df), 100 + n_changed)
+        self.assertEqual(players_df.snapshot_time.nunique(), 3)
+        latest_df = players_df.groupby('id').last()
+        pd.testing.assert_series_equal(
+            latest_df.selected_by_percent,
+            pd.Series([float(p['selected_by_percent']) for p in self.snapshots[-1][1]['elements']],
+                      index=latest_df.index, name='selected_by_percent'))
+
+    def test_field_added_between_snapshots(self):
+        (first_time, first), (second_time, second) = self.snapshots[:2]
+        self.writer.write(first, first_time)
+        for n, element in enumerate(second['elements']):
+            element['expected_goals'] = f'{n / 10:.1f}'
+
+        self.assertEqual(self.writer.write(second, second_time)['players'], 100)
+
+        players_df = pd.read_sql('SELECT * FROM players', self.engine)
+        self.assertEqual(players_df.expected_goals.isna().sum(), 100)
+        self.assertEqual(players_df.expected_goals.dropna().tolist(), [f'{n / 10:.1f}' for n in range(100)])
+
+    def test_field_removed_between_snapshots(self):
+        (first_time, first), (second_time, second) = self.snapshots[:2]
+        self.writer.write(first, first_time)
+        del second['teams'][0]['strength']
+
+        self.assertEqual(self.writer.write(second, second_time)['teams'], 1)
+
+        teams_df = pd.read_sql('SELECT * FROM teams', self.engine)
+        self.assertEqual(len(teams_df), 21)
+        self.assertEqual(teams_df.strength.isna().tolist(), [False] * 20 + [True])
+
+    def test_columns_are_typed(self):
+        snapshot_time, snapshot = self.snapshots[0]
+        self.writer.write(snapshot, snapshot_time)
+
+        players_df = pd.read_sql('SELECT * FROM players LIMIT 1', self.engine)
+        events_df = pd.read_sql('SELECT * FROM events', self.engine, parse_dates=['deadline_time'])
+
+        self.assertEqual(players_df.form.dtype, 'float64')
+        self.assertEqual(players_df.current_event.iloc[0], 1)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(events_df.deadline_time))
+        self.assertIn('bboost', events_df.chip_plays.iloc[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
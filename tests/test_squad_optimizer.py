@@ -0,0 +1,100 @@
+import datetime as dt
+import itertools
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from analytics.squad_optimizer import MAX_PER_CLUB, SQUAD_QUOTAS, STARTING_RANGES, optimise_scenarios, \
+    optimise_squad
+from benchmarks import synthetic
+from gcp.snapshot_tables import snapshot_table
+
+
+def _small_players(seed):
+    rng = np.random.RandomState(seed)
+    positions = [1] * 3 + [2] * 6 + [3] * 6 + [4] * 4
+    return pd.DataFrame({'id': np.arange(len(positions)) + 100, 'element_type': positions,
+                         'team': rng.randint(1, 8, len(positions)), 'now_cost': rng.randint(40, 100, len(positions)),
+                         'ep_next': rng.gamma(2, 2, len(positions)).round(1)})
+
+
+def _brute_force(players_df, budget, bench_weight=0.1):
+    """Best squad value by trying every squad and formation."""
+    formations = [counts for counts in itertools.product(*[range(low, high + 1) for low, high in
+                                                           STARTING_RANGES.values()]) if sum(counts) == 11]
+    groups = [players_df[players_df.element_type == position] for position in SQUAD_QUOTAS]
+    best = -np.inf
+    for squad in itertools.product(*[itertools.combinations(group.index, quota)
+                                     for group, quota in zip(groups, SQUAD_QUOTAS.values())]):
+        rows = players_df.loc[list(itertools.chain(*squad))]
+        if rows.now_cost.sum() > budget or rows.team.value_counts().max() > MAX_PER_CLUB:
+            continue
+        points = [np.sort(players_df.ep_next[list(position_squad)].to_numpy())[::-1] for position_squad in squad]
+        for formation in formations:
+            starting = np.concatenate([position_points[:n] for position_points, n in zip(points, formation)])
+            best = max(best, (1 - bench_weight) * starting.sum() + bench_weight * rows.ep_next.sum() + starting.max())
+    return best
+
+
+class TestOptimiseSquad(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        for seed in range(3):
+            players_df = _small_players(seed)
+            budget = int(players_df.now_cost.sum() * 0.85)
+            squad = optimise_squad(players_df, budget=budget)
+            self.assertAlmostEqual(squad.expected_points, _brute_force(players_df, budget))
+
+    def assertKeepsToTheRules(self, players_df, squad, budget=1000):
+        squad_df = players_df.set_index('id').loc[list(squad.players)]
+        starting_df = squad_df.loc[list(squad.starting)]
+        self.assertEqual(squad_df.element_type.value_counts().to_dict(), SQUAD_QUOTAS)
+        self.assertLessEqual(squad_df.team.value_counts().max(), MAX_PER_CLUB)
+        self.assertLessEqual(squad_df.now_cost.sum(), budget)
+        self.assertEqual(squad.cost, squad_df.now_cost.sum())
+        self.assertEqual(len(starting_df), 11)
+        for position, (low, high) in STARTING_RANGES.items():
+            self.assertTrue(low <= (starting_df.element_type == position).sum() <= high)
+        self.assertIn(squad.captain, starting_df.index)
+        self.assertEqual(starting_df.ep_next.max(), starting_df.ep_next[squad.captain])
+
+        bench = squad_df.ep_next.sum() - starting_df.ep_next.sum()
+        self.assertAlmostEqual(squad.expected_points,
+                               starting_df.ep_next.sum() + starting_df.ep_next.max() + 0.1 * bench)
+
+    def test_squad_keeps_to_the_rules(self):
+        players_df = snapshot_table(synthetic.fpl_bootstrap_static(600), 'players', dt.datetime(2019, 8, 1))
+        players_df.loc[players_df.team.isin([1, 2]), 'ep_next'] *= 2  # two clubs everyone wants four of
+
+        self.assertKeepsToTheRules(players_df, optimise_squad(players_df))
+
+    def test_time_limit(self):
+        players_df = snapshot_table(synthetic.fpl_bootstrap_static(600, seed=1), 'players', dt.datetime(2019, 8, 1))
+        players_df.loc[players_df.team.isin([1, 2, 3]), 'ep_next'] *= 1.8
+        best = optimise_squad(players_df)
+
+        # out of time from the start: the best squad ignoring the club limit, repaired to keep to it
+        squad = optimise_squad(players_df, time_limit=0)
+        self.assertKeepsToTheRules(players_df, squad)
+        self.assertLessEqual(squad.expected_points, best.expected_points)
+        self.assertEqual(optimise_squad(players_df, time_limit=60), best)
+
+    def test_no_squad_within_budget(self):
+        players_df = _small_players(0)
+        self.assertIsNone(optimise_squad(players_df, budget=500))
+
+    def test_scenarios_match_single_solves(self):
+        players_df = _small_players(1)
+        budget = int(players_df.now_cost.sum() * 0.85)
+        scenario_points = np.random.RandomState(0).gamma(2, 2, (5, len(players_df)))
+
+        squads = optimise_scenarios(players_df, scenario_points, budget=budget, max_workers=2, chunk_size=2)
+
+        self.assertEqual(len(squads), 5)
+        for points, squad in zip(scenario_points, squads):
+            self.assertEqual(squad, optimise_squad(players_df.assign(ep_next=points), budget=budget))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import gzip
+import json
+import tempfile
+import tracemalloc
+import unittest
+
+from benchmarks import synthetic
+from gcp.main import save_fpl_data
+from gcp.storage_backends import LocalFileBackend, stream_url_to_blob
+from stub_server import StubServer
+
+# ~6MB, several times a real bootstrap-static response
+PAYLOAD = json.dumps(synthetic.fpl_bootstrap_static(n_players=16000)).encode('utf-8')
+CHUNK_SIZE = 128 * 1024
+
+
+def bootstrap_route(path, params, headers):
+    return 200, {'Content-Type': 'application/json'}, PAYLOAD
+
+
+class TestStreamingUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.backend = LocalFileBackend(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_compressed_upload(self):
+        with StubServer({'/api/bootstrap-static/': bootstrap_route}) as server:
+            blob_name = save_fpl_data(self.backend, url=server.url + '/api/bootstrap-static/')
+
+        self.assertTrue(blob_name.startswith('fpl_data_') and blob_name.endswith('.json.gz'))
+        self.assertEqual(gzip.decompress(self.backend.read(blob_name)), PAYLOAD)
+        self.assertLess(self.backend.size(), len(PAYLOAD) / 4)
+
+    def test_uncompressed_upload(self):
+        with StubServer({'/': bootstrap_route}) as server:
+            blob_name = save_fpl_data(self.backend, compress=False, url=server.url + '/')
+
+        self.assertEqual(self.backend.read(blob_name), PAYLOAD)
+
+    def test_peak_memory_is_independent_of_payload_size(self):
+        with StubServer({'/': bootstrap_route}) as server:
+            tracemalloc.start()
+            stream_url_to_blob(server.url + '/', self.backend, 'blob.json.gz', chunk_size=CHUNK_SIZE)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        self.assertGreater(len(PAYLOAD), 40 * CHUNK_SIZE)
+        self.assertLess(peak, 8 * CHUNK_SIZE)
+
+    def test_error_status_writes_nothing(self):
+        with StubServer({}) as server:
+            with self.assertRaises(ConnectionError):
+                stream_url_to_blob(server.url + '/', self.backend, 'blob')
+
+        self.assertEqual(self.backend.list(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import datetime as dt
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from analytics.squad_optimizer import MAX_PER_CLUB, optimise_squad
+from analytics.transfer_planner import TransferPlanner, fixture_multipliers, lineup_points, project_points
+from benchmarks import synthetic
+from gcp.snapshot_tables import snapshot_table
+
+SNAPSHOT_TIME = dt.datetime(2019, 8, 1)
+
+
+def _teams(strengths):
+    return pd.DataFrame([{'id': team, 'strength_attack_home': attack, 'strength_attack_away': attack,
+                          'strength_defence_home': defence, 'strength_defence_away': defence}
+                         for team, (attack, defence) in strengths.items()])
+
+
+def _fpl_tables(n_events):
+    players_df = snapshot_table(synthetic.fpl_bootstrap_static(), 'players', SNAPSHOT_TIME)
+    teams_df = snapshot_table(synthetic.fpl_bootstrap_static(), 'teams', SNAPSHOT_TIME)
+    fixtures_df = pd.concat([snapshot_table(synthetic.fpl_bootstrap_static(event=event), 'fixtures', SNAPSHOT_TIME)
+                             for event in range(1, n_events + 1)])
+    return players_df, teams_df, fixtures_df
+
+
+class TestProjections(unittest.TestCase):
+
+    def test_fixture_multipliers(self):
+        teams_df = _teams({1: (1200, 1000), 2: (1000, 1200), 3: (1000, 1000)})
+        fixtures_df = pd.DataFrame({'event': [1, 2, 2], 'team_h': [1, 1, 3], 'team_a': [2, 3, 1]})
+
+        multipliers = fixture_multipliers(teams_df, fixtures_df, events=[1, 2, 3])
+
+        self.assertAlmostEqual(multipliers['attack'].loc[1, 1], 1.0)  # 1200 attack against 1200 defence
+        self.assertAlmostEqual(multipliers['defence'].loc[2, 1], 1.0)
+        self.assertAlmostEqual(multipliers['attack'].loc[1, 2], 2.4)  # a double gameweek against a weak side
+        self.assertAlmostEqual(multipliers['defence'].loc[1, 2], 2.0)
+        self.assertEqual(multipliers['attack'].loc[2, 2], 0)  # no fixture
+        self.assertTrue((multipliers['attack'][3] == 0).all())
+
+    def test_project_points(self):
+        teams_df = _teams({1: (1200, 1000), 2: (1000, 1200)})
+        fixtures_df = pd.DataFrame({'event': [1], 'team_h': [1], 'team_a': [2]})
+        players_df = pd.DataFrame({'id': [10, 11], 'team': [2, 2], 'element_type': [2, 4], 'form': ['3.0', '4.0']})
+
+        points_df = project_points(players_df, teams_df, fixtures_df, events=[1])
+
+        self.assertAlmostEqual(points_df.loc[10, 1], 3.0 * 1200 / 1200)
+        self.assertAlmostEqual(points_df.loc[11, 1], 4.0 * 1000 / 1000)
+
+    def test_lineup_points(self):
+        squad_points = np.array([[1, 2, 5, 4, 3, 2, 1, 6, 6, 1, 1, 1, 0, 0, 9]], dtype=float)
+
+        # best XI is 4-5-1: 2 + (5 + 4 + 3 + 2) + (6 + 6 + 1 + 1 + 1) + 9, with the 9 captain
+        expected = 40 + 9 + 0.1 * (squad_points.sum() - 40)
+        self.assertAlmostEqual(lineup_points(squad_points)[0], expected)
+
+
+class TestTransferPlanner(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.players_df, teams_df, fixtures_df = _fpl_tables(n_events=3)
+        cls.points_df = project_points(cls.players_df, teams_df, fixtures_df, events=range(1, 4))
+        random_points = np.random.RandomState(5).rand(len(cls.players_df))
+        cls.squad = optimise_squad(cls.players_df.assign(ep_next=random_points), budget=950)
+
+    def test_plan_keeps_to_the_rules(self):
+        planner = TransferPlanner(self.players_df, self.points_df, beam_width=4, time_budget=30)
+        plan = planner.plan(self.squad.players, bank=1000 - self.squad.cost, free_transfers=1)
+
+        self.assertEqual(plan.beam_width, 4)
+        players_df = self.players_df.set_index('id')
+        squad, bank, free_transfers, hits = set(self.squad.players), 1000 - self.squad.cost, 1, 0
+        for gameweek, transfers in enumerate(plan.transfers):
+            for out, player in transfers:
+                self.assertIn(out, squad)
+                self.assertNotIn(player, squad)
+                self.assertEqual(players_df.element_type[out], players_df.element_type[player])
+                squad = squad - {out} | {player}
+                bank += players_df.now_cost[out] - players_df.now_cost[player]
+            self.assertGreaterEqual(bank, 0)
+            self.assertLessEqual(players_df.team[list(squad)].value_counts().max(), MAX_PER_CLUB)
+            hits += 4 * max(0, len(transfers) - free_transfers)
+            free_transfers = min(2, max(0, free_transfers - len(transfers)) + 1)
+
+        self.assertEqual(plan.hit_points, hits)
+        self.assertAlmostEqual(plan.expected_points, sum(plan.gameweek_points) - hits)
+        held = TransferPlanner(self.players_df, self.points_df, time_budget=0).plan(self.squad.players, bank=0)
+        self.assertGreater(plan.expected_points, held.expected_points)
+
+    def test_out_of_time_holds(self):
+        plan = TransferPlanner(self.players_df, self.points_df, time_budget=0).plan(self.squad.players, bank=0)
+        self.assertEqual(plan.transfers, [[], [], []])
+        self.assertEqual(plan.beam_width, 0)
+
+    def test_process_pool_matches_one_process(self):
+        kwargs = dict(beam_width=2, time_budget=30)
+        serial = TransferPlanner(self.players_df, self.points_df, **kwargs).plan(self.squad.players, bank=50)
+        parallel = TransferPlanner(self.players_df, self.points_df, max_workers=2, **kwargs)\
+            .plan(self.squad.players, bank=50)
+        self.assertAlmostEqual(serial.expected_points, parallel.expected_points)
+
+    def test_rejects_incomplete_squads(self):
+        planner = TransferPlanner(self.players_df, self.points_df)
+        with self.assertRaises(ValueError):
+            planner.plan(self.squad.players[:14], bank=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import pandas as pd
+
+from api_handler.http_cache import MemoryResponseCache
+from api_handler.xml_soccer import XmlSoccerRequest
+from stub_server import StubServer
+
+FIXTURES_XML = b'''<?xml version="1.0" encoding="utf-8"?>
+<XMLSOCCER.COM>
+  <Match>
+    <Id>101</Id><Date>2017-08-11T19:45:00+00:00</Date><League>English Premier League</League><Round>1</Round>
+    <HomeTeam>Arsenal</HomeTeam><AwayTeam>Leicester</AwayTeam><HomeGoals>4</HomeGoals><AwayGoals>3</AwayGoals>
+  </Match>
+  <Match>
+    <Id>102</Id><Date>2017-08-12T12:30:00+00:00</Date><League>English Premier League</League><Round>1</Round>
+    <HomeTeam>Watford</HomeTeam><AwayTeam>Liverpool</AwayTeam>
+  </Match>
+  <Match>
+    <Id>103</Id><Date>2017-08-12T15:00:00+00:00</Date><League>English Premier League</League><Round>1</Round>
+    <HomeTeam>Chelsea</HomeTeam><AwayTeam>Burnley</AwayTeam><HomeGoals>2</HomeGoals><AwayGoals>3</AwayGoals>
+    <Referee>Craig Pawson</Referee>
+  </Match>
+</XMLSOCCER.COM>'''
+
+ERROR_XML = b'''<?xml version="1.0" encoding="utf-8"?>
+<XMLSOCCER.COM>To avoid misuse of the service, this method can only be called every 300 seconds.</XMLSOCCER.COM>'''
+
+
+def xml_route(body: bytes):
+    return lambda path, params, headers: (200, {'Content-Type': 'text/xml; charset=utf-8'}, body)
+
+
+class TestXmlSoccerStreaming(unittest.TestCase):
+
+    def request(self, server, cache=None):
+        xml_request = XmlSoccerRequest(cache=cache)
+        xml_request.api_url = server.url + '/'
+        return xml_request
+
+    def test_stream_matches_full_parse(self):
+        with StubServer({'/': xml_route(FIXTURES_XML)}) as server:
+            full = self.request(server).get('GetFixturesByLeagueAndSeason')
+            streamed = list(self.request(server).iter_records('GetFixturesByLeagueAndSeason'))
+            cached = list(self.request(server, MemoryResponseCache()).iter_records('GetFixturesByLeagueAndSeason'))
+
+        self.assertEqual(streamed, full)
+        self.assertEqual(cached, full)
+
+    def test_typed_frame(self):
+        with StubServer({'/': xml_route(FIXTURES_XML)}) as server:
+            frame = self.request(server).get_frame('GetFixturesByLeagueAndSeason')
+
+        self.assertEqual(frame.Id.tolist(), [101, 102, 103])
+        self.assertEqual(frame.Id.dtype, 'int64')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(frame.Date))
+        self.assertEqual(frame.HomeGoals.fillna(-1).tolist(), [4, -1, 2])
+        # tags missing from a record, or first seen part way through, come out as nulls
+        self.assertEqual(frame.Referee.isnull().tolist(), [True, True, False])
+
+    def test_error_message_raises(self):
+        with StubServer({'/': xml_route(ERROR_XML)}) as server:
+            with self.assertRaises(ConnectionError):
+                list(self.request(server).iter_records('GetFixturesByLeagueAndSeason'))
+
+
+if __name__ == '__main__':
+    unittest.main()